@@ -0,0 +1,195 @@
+"""Test de charge du serveur HTTP/JSON (--serve).
+
+Sans --url, démarre `main.py --serve` sur une base temporaire remplie de
+--labels entrées, puis envoie --requests lectures GET /passwords/LABEL
+depuis --concurrency clients (connexions HTTP/1.1 persistantes). Affiche
+en JSON les latences p50/p99 et le nombre de requêtes par seconde.
+
+    python benchmarks/loadtest.py [--requests 2000] [--concurrency 8] [--workers 8]
+    python benchmarks/loadtest.py --url 127.0.0.1:8765 --user svc --label api-token
+    python benchmarks/loadtest.py --url unix:/run/pm.sock --user svc --label api-token
+"""
+import argparse
+import getpass
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+USERNAME = 'loadtest'
+MASTER_PASSWORD = 'Loadtest!master-password'
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+def open_connection(address):
+    if address.startswith('unix:'):
+        return UnixHTTPConnection(address[len('unix:'):])
+    host, _, port = address.rpartition(':')
+    return http.client.HTTPConnection(host.strip('[]'), int(port), timeout=30)
+
+def call(conn, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b'{}')
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# Base temporaire et serveur lancé dans un processus séparé, comme en production
+def start_local_server(tmp_dir, labels, workers):
+    import database
+
+    db_path = os.path.join(tmp_dir, 'loadtest.sqlite')
+    database.configure_db(db_path)
+    database.init_db()
+    database.register_user(USERNAME, MASTER_PASSWORD)
+    rows = ((f'label-{i:06d}', f'pw{i:06d}!', i + 1) for i in range(labels))
+    for _ in database.bulk_add_passwords(USERNAME, rows, MASTER_PASSWORD, skip_duplicates=True):
+        pass
+    database.close_db()
+
+    port = _free_port()
+    address = f'127.0.0.1:{port}'
+    process = subprocess.Popen(
+        [sys.executable, 'main.py', '--serve', address, '--serve-workers', str(workers), '--db', db_path],
+        cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, address
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("Le serveur n'a pas démarré")
+
+def run_load(address, token, labels, requests, concurrency):
+    """Retourne (latences en secondes, erreurs, durée totale)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def client(count):
+        conn = open_connection(address)
+        local_latencies = []
+        local_errors = 0
+        try:
+            for _ in range(count):
+                path = f'/passwords/{quote(random.choice(labels), safe="")}'
+                start = time.perf_counter()
+                try:
+                    status, _ = call(conn, 'GET', path, token=token)
+                except (OSError, http.client.HTTPException, ValueError):
+                    conn.close()
+                    status = None
+                local_latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    local_errors += 1
+        finally:
+            conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=client, args=(count,)) for count in per_client]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - start
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du serveur HTTP/JSON')
+    parser.add_argument('--url', help='Serveur existant: HOST:PORT ou unix:CHEMIN (défaut: serveur temporaire)')
+    parser.add_argument('--user', default=USERNAME, help="Utilisateur du serveur existant")
+    parser.add_argument('--label', action='append', help='Label lu pendant le test (répétable, serveur existant)')
+    parser.add_argument('--labels', type=int, default=1000, help='Entrées du coffre temporaire')
+    parser.add_argument('--workers', type=int, default=8, help='Threads du serveur temporaire')
+    parser.add_argument('--requests', type=int, default=2000, help='Nombre total de requêtes')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clients simultanés')
+    parser.add_argument('--seed', type=int, default=0, help='Graine du générateur aléatoire')
+    parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    process = None
+    tmp_dir = tempfile.TemporaryDirectory()
+    try:
+        if args.url:
+            if not args.label:
+                parser.error('--label est obligatoire avec --url')
+            address, username, labels = args.url, args.user, args.label
+            master_password = os.getenv('PASSWORD_MANAGER_MASTER') or getpass.getpass('Master password: ')
+        else:
+            print(f'Serveur temporaire, coffre de {args.labels} entrées...', file=sys.stderr)
+            process, address = start_local_server(tmp_dir.name, args.labels, args.workers)
+            username, master_password = USERNAME, MASTER_PASSWORD
+            labels = [f'label-{i:06d}' for i in range(args.labels)]
+
+        conn = open_connection(address)
+        status, body = call(conn, 'POST', '/session', {'username': username, 'master_password': master_password})
+        conn.close()
+        if status != 201:
+            sys.exit(f"Ouverture de session refusée ({status}): {body.get('error')}")
+
+        latencies, errors, elapsed = run_load(address, body['token'], labels, args.requests, args.concurrency)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        tmp_dir.cleanup()
+
+    report = {
+        'requests': len(latencies),
+        'concurrency': args.concurrency,
+        'workers': None if args.url else args.workers,
+        'errors': errors,
+        'total_s': round(elapsed, 3),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
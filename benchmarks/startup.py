@@ -0,0 +1,99 @@
+"""Benchmark de démarrage de la CLI.
+
+Mesure le temps d'import de cli.py avec `python -X importtime`, vérifie que
+les commandes sans chiffrement (-h, -l) ne chargent pas cryptography, et
+échoue (code de sortie 1) si le budget d'import est dépassé.
+
+    python benchmarks/startup.py [--budget-ms 50] [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# Modules qui ne doivent pas être chargés par les commandes sans chiffrement
+FORBIDDEN_MODULES = ('cryptography',)
+
+# Commandes qui doivent démarrer sans la pile cryptographique
+LIGHT_COMMANDS = (['-h'], ['-l'])
+
+def parse_importtime(stderr):
+    """Retourne {module: temps cumulé en µs} à partir de la sortie de -X importtime"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+def measure_import(module, env, runs):
+    """Temps d'import de module (meilleur de runs, en ms), dans un interpréteur neuf à chaque fois"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        timings.append(parse_importtime(result.stderr)[module] / 1000)
+    return min(timings)
+
+def measure_command(command, env, runs):
+    """Durée médiane d'une commande main.py (ms) et modules interdits chargés"""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'main.py'] + command, cwd=SRC_DIR, env=env,
+                       capture_output=True, check=True)
+        durations.append((time.perf_counter() - start) * 1000)
+    
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'main.py'] + command, cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    loaded = parse_importtime(result.stderr)
+    forbidden = sorted(name for name in loaded if name.split('.')[0] in FORBIDDEN_MODULES)
+    return statistics.median(durations), forbidden
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de démarrage de la CLI')
+    parser.add_argument('--budget-ms', type=float, default=50.0, help="Budget du temps d'import de cli (ms)")
+    parser.add_argument('--runs', type=int, default=5, help='Nombre de mesures par point')
+    parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Bytecode mis en cache hors des sources, comme lors d'une utilisation normale
+        env = dict(os.environ, PASSWORD_MANAGER_DB=os.path.join(tmp_dir, 'data.sqlite'),
+                   PYTHONPYCACHEPREFIX=os.path.join(tmp_dir, 'pycache'))
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        
+        results = {
+            'python': sys.version.split()[0],
+            'budget_ms': args.budget_ms,
+            'import_cli_ms': round(measure_import('cli', env, args.runs), 2),
+            'commands': {},
+        }
+        
+        ok = results['import_cli_ms'] <= args.budget_ms
+        for command in LIGHT_COMMANDS:
+            median_ms, forbidden = measure_command(command, env, args.runs)
+            results['commands'][' '.join(command)] = {'median_ms': round(median_ms, 2), 'forbidden_modules': forbidden}
+            ok = ok and not forbidden
+        results['ok'] = ok
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Benchmark de l'estimateur de robustesse.
+
+Mesure le temps d'estimation de mots de passe de 64 caractères (aléatoires, mots du
+dictionnaire, chiffres seuls, dates, répétitions) et échoue (code de sortie 1) si un
+cas dépasse le budget.
+
+    python benchmarks/strength.py [--budget-ms 1] [--runs 5] [--output strength.json]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import timeit
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+from password_utils import estimate_strength  # noqa: E402
+
+PASSWORD_LENGTH = 64
+
+def build_cases(count, seed=0):
+    """Mots de passe de 64 caractères par famille ; les chiffres et les dates sont les plus coûteux"""
+    rng = random.Random(seed)
+    words = ['marie', 'soleil', 'password', 'azerty', 'dragon', '1990', '!']
+    return {
+        'random': [''.join(rng.choice(string.printable[:94]) for _ in range(PASSWORD_LENGTH)) for _ in range(count)],
+        'words': [''.join(rng.choice(words) for _ in range(PASSWORD_LENGTH))[:PASSWORD_LENGTH] for _ in range(count)],
+        'digits': [''.join(rng.choice(string.digits) for _ in range(PASSWORD_LENGTH)) for _ in range(count)],
+        'dates': [''.join(f'{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}{rng.randint(1950, 2030)}{rng.choice("/.-x")}'
+                          for _ in range(8))[:PASSWORD_LENGTH] for _ in range(count)],
+        'repeat': ['ab' * (PASSWORD_LENGTH // 2), 'a' * PASSWORD_LENGTH],
+    }
+
+def measure(passwords, runs):
+    """Durée moyenne d'une estimation (ms), meilleure de runs mesures"""
+    best = min(timeit.repeat(lambda: [estimate_strength(password) for password in passwords], number=1, repeat=runs))
+    return best / len(passwords) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'estimateur de robustesse")
+    parser.add_argument('--budget-ms', type=float, default=1.0, help="Budget par mot de passe de 64 caractères (ms)")
+    parser.add_argument('--runs', type=int, default=5, help='Nombre de mesures par cas')
+    parser.add_argument('--count', type=int, default=50, help='Mots de passe par cas')
+    parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+    args = parser.parse_args()
+    
+    # Chargement des dictionnaires hors mesure
+    estimate_strength('x')
+    
+    results = {'python': sys.version.split()[0], 'budget_ms': args.budget_ms, 'cases': {}}
+    for name, passwords in build_cases(args.count).items():
+        results['cases'][name] = round(measure(passwords, args.runs), 3)
+    results['ok'] = all(duration <= args.budget_ms for duration in results['cases'].values())
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    
+    return 0 if results['ok'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Benchmark de crypto.py et database.py sur des coffres de taille réaliste.
+
+Chaque taille de coffre est générée dans une base SQLite temporaire ; les
+résultats sont écrits en JSON pour être comparés d'un commit à l'autre.
+
+    python benchmarks/vault.py [--sizes 10,1000,10000,100000] [--output results.json]
+    python benchmarks/vault.py --compare avant.json apres.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')))
+
+import crypto
+import database
+from cli import import_passwords_from_file
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+USERNAME = 'bench'
+MASTER_PASSWORD = 'Bench!master-password'
+
+def _password(i):
+    return f'pw{i:08d}!'
+
+def _result(name, size, ops, seconds):
+    return {
+        'name': name,
+        'size': size,
+        'ops': ops,
+        'total_s': round(seconds, 6),
+        'per_op_ms': round(seconds * 1000 / ops, 4),
+        'ops_per_s': round(ops / seconds, 1) if seconds else None,
+    }
+
+def timed(name, size, func, ops):
+    """Exécute func(i) pour i dans range(ops) et retourne le résultat mesuré"""
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    return _result(name, size, ops, time.perf_counter() - start)
+
+def bench_crypto(ops):
+    results = []
+    salt = crypto.generate_salt()
+    results.append(timed('crypto.derive_aes_key', None, lambda i: crypto.derive_aes_key(MASTER_PASSWORD, salt), 5))
+    
+    aes_key = os.urandom(32)
+    encrypted = crypto.encrypt_password(_password(0), aes_key)
+    results.append(timed('crypto.encrypt_password', None, lambda i: crypto.encrypt_password(_password(i), aes_key), ops))
+    results.append(timed('crypto.decrypt_password', None, lambda i: crypto.decrypt_password(encrypted, aes_key), ops))
+    return results
+
+def bench_vault(size, tmp_dir, ops, import_rows):
+    results = []
+    database.configure_db(os.path.join(tmp_dir, f'vault-{size}.sqlite'))
+    database.clear_session_keys()
+    database.init_db()
+    database.register_user(USERNAME, MASTER_PASSWORD)
+    
+    # Génération du coffre synthétique
+    start = time.perf_counter()
+    rows = ((f'label-{i:08d}', _password(i), i + 1) for i in range(size))
+    for _ in database.bulk_add_passwords(USERNAME, rows, MASTER_PASSWORD, skip_duplicates=True, batch_size=500):
+        pass
+    results.append(_result('database.bulk_add_passwords (seed)', size, size, time.perf_counter() - start))
+    
+    # Premier accès de la session : déverrouillage (PBKDF2) compris
+    database.clear_session_keys()
+    results.append(timed('database.get_password (cold)', size, lambda i: database.get_password(USERNAME, 'label-00000000', MASTER_PASSWORD), 1))
+    
+    labels = [f'label-{random.randrange(size):08d}' for _ in range(ops)]
+    results.append(timed('database.get_password', size, lambda i: database.get_password(USERNAME, labels[i], MASTER_PASSWORD), ops))
+    results.append(timed('database.add_password', size, lambda i: database.add_password(USERNAME, f'new-{i:08d}', f'new{i:08d}!', MASTER_PASSWORD), ops))
+    results.append(timed('database.check_password_reuse', size, lambda i: database.check_password_reuse(USERNAME, _password(i), MASTER_PASSWORD), ops))
+    results.append(timed('database.get_all_users_with_labels', size, lambda i: database.get_all_users_with_labels(), 3))
+    results.append(timed('database.iter_users_with_label_counts', size, lambda i: list(database.iter_users_with_label_counts(limit=50)), 3))
+    
+    # Import d'un fichier de import_rows nouvelles lignes dans le coffre existant
+    import_file = os.path.join(tmp_dir, f'import-{size}.txt')
+    with open(import_file, 'w', encoding='utf-8') as file:
+        for i in range(import_rows):
+            file.write(f'import-{i:08d}:imp{i:08d}!\n')
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.append(timed('cli.import_passwords_from_file', size,
+                             lambda i: import_passwords_from_file(USERNAME, import_file, MASTER_PASSWORD, assume_yes=True), 1))
+    results[-1]['rows'] = import_rows
+    
+    database.close_db()
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(before_path, after_path):
+    """Affiche le rapport après/avant du temps par opération de chaque mesure"""
+    with open(before_path, encoding='utf-8') as file:
+        before = {(r['name'], r['size']): r for r in json.load(file)['results']}
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)['results']
+    
+    print(f"{'mesure':<40} {'taille':>8} {'avant (ms)':>12} {'après (ms)':>12} {'ratio':>8}")
+    for result in after:
+        previous = before.get((result['name'], result['size']))
+        if not previous:
+            continue
+        ratio = result['per_op_ms'] / previous['per_op_ms'] if previous['per_op_ms'] else float('inf')
+        size = '-' if result['size'] is None else result['size']
+        print(f"{result['name']:<40} {size:>8} {previous['per_op_ms']:>12.4f} {result['per_op_ms']:>12.4f} {ratio:>7.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de crypto.py et database.py')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='Tailles de coffre, séparées par des virgules')
+    parser.add_argument('--ops', type=int, default=100, help='Opérations mesurées par fonction et par taille')
+    parser.add_argument('--import-rows', type=int, default=1000, help="Lignes du fichier importé")
+    parser.add_argument('--seed', type=int, default=0, help='Graine du générateur aléatoire')
+    parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+    parser.add_argument('--compare', nargs=2, metavar=('AVANT', 'APRES'), help='Comparer deux fichiers de résultats')
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    
+    random.seed(args.seed)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    
+    results = bench_crypto(args.ops * 10)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            print(f'Coffre de {size} entrées...', file=sys.stderr)
+            results.extend(bench_vault(size, tmp_dir, args.ops, args.import_rows))
+    
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'ops': args.ops,
+        },
+        'results': results,
+    }
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
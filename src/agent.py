@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import hashlib
+import socket
+import struct
+
+# Durée d'inactivité avant verrouillage automatique de l'agent
+DEFAULT_IDLE_TIMEOUT_MINUTES = 15
+
+# Base choisie par --db ou $PASSWORD_MANAGER_DB (None : base par défaut) ; un agent ne sert
+# que la base avec laquelle il a été déverrouillé
+_db_path = None
+
+# Noms d'utilisateur utilisables tels quels comme nom de socket (ni séparateur, ni "..", longueur
+# compatible avec la limite des chemins de socket Unix)
+_SAFE_SOCKET_NAME = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9._-]{0,63}')
+
+# Base servie par les agents démarrés et interrogés ensuite (avant tout appel à l'agent)
+def configure_agent_db(path):
+    global _db_path
+    _db_path = os.path.abspath(path) if path else None
+
+# Chemin du socket de l'agent d'un utilisateur (répertoire accessible au seul propriétaire)
+def agent_socket_path(username):
+    path = os.getenv('PASSWORD_MANAGER_AGENT_SOCK')
+    if path:
+        return path
+
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        base_dir = os.path.join(runtime_dir, 'password-manager')
+    else:
+        import tempfile
+        base_dir = os.path.join(tempfile.gettempdir(), f'password-manager-{os.getuid()}')
+    if _db_path:
+        # Autre base : empreinte du nom et du chemin absolu de la base (longueur fixe), préfixée par
+        # un caractère exclu des noms sûrs et des empreintes de noms seuls
+        key = '\0'.join((username, _db_path)).encode()
+        return os.path.join(base_dir, f'@{hashlib.sha256(key).hexdigest()[:32]}.sock')
+    if _SAFE_SOCKET_NAME.fullmatch(username):
+        return os.path.join(base_dir, f'{username}.sock')
+    # Autres noms (/, .., caractères de contrôle...) : empreinte, préfixée par un caractère
+    # exclu des noms sûrs pour ne jamais coïncider avec l'un d'eux
+    return os.path.join(base_dir, f'={hashlib.sha256(username.encode()).hexdigest()[:32]}.sock')
+
+def _prepare_socket_dir(path):
+    socket_dir = os.path.dirname(path)
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    if os.stat(socket_dir).st_uid != os.getuid():
+        raise PermissionError(f"Le répertoire {socket_dir} n'appartient pas à l'utilisateur courant")
+    os.chmod(socket_dir, 0o700)
+
+# Refuser les connexions d'un autre utilisateur système (Linux)
+def _is_same_user(conn):
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return True
+    credentials = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid == os.getuid()
+
+def _read_message(conn):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data) if data.strip() else None
+
+def _send_message(conn, message):
+    conn.sendall(json.dumps(message).encode() + b'\n')
+
+# Traiter une requête de client avec la session déverrouillée (partagé avec le serveur HTTP)
+def handle_request(username, master_password, request):
+    """Retourne (réponse, arrêter l'agent)"""
+    from database import get_password, get_passwords, add_password, update_password, delete_password, check_password_reuse, list_user_labels
+
+    op = request.get('op')
+    label = request.get('label')
+
+    if op == 'ping':
+        return {'ok': True}, False
+
+    if op == 'show' and 'labels' in request:
+        entries = [{'label': found, 'password': password}
+                   for found, password in get_passwords(username, request['labels'], master_password)]
+        return {'ok': True, 'entries': entries}, False
+
+    if op == 'show':
+        password = get_password(username, label, master_password)
+        if password is None:
+            return {'ok': False, 'error': 'not_found'}, False
+        return {'ok': True, 'password': password}, False
+
+    if op in ('add', 'modify'):
+        password = request.get('password')
+        if not request.get('force'):
+            exclude_label = label if op == 'modify' else None
+            duplicate_labels = check_password_reuse(username, password, master_password, exclude_label)
+            if duplicate_labels:
+                return {'ok': False, 'error': 'reused', 'labels': duplicate_labels}, False
+
+        if op == 'add':
+            if not add_password(username, label, password, master_password):
+                return {'ok': False, 'error': 'exists'}, False
+        elif not update_password(username, label, password, master_password):
+            return {'ok': False, 'error': 'not_found'}, False
+        return {'ok': True}, False
+
+    if op == 'delete':
+        if not delete_password(username, label):
+            return {'ok': False, 'error': 'not_found'}, False
+        return {'ok': True}, False
+
+    if op == 'list-labels':
+        return {'ok': True, 'labels': list_user_labels(username)}, False
+
+    if op == 'lock':
+        return {'ok': True}, True
+
+    return {'ok': False, 'error': 'unknown_op'}, False
+
+# Boucle principale de l'agent : garde la session déverrouillée en mémoire
+def run_agent(username, master_password, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES, on_ready=None):
+    """Sert les requêtes sur le socket Unix jusqu'au verrouillage ou à l'expiration du délai d'inactivité"""
+    from database import clear_session_keys
+
+    path = agent_socket_path(username)
+    _prepare_socket_dir(path)
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    server.settimeout(idle_timeout_minutes * 60)
+    if on_ready:
+        on_ready()
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+
+            stop = False
+            with conn:
+                conn.settimeout(10)
+                try:
+                    if not _is_same_user(conn):
+                        continue
+                    request = _read_message(conn)
+                    if request is None:
+                        continue
+                    try:
+                        response, stop = handle_request(username, master_password, request)
+                    except Exception as e:
+                        response = {'ok': False, 'error': 'internal', 'message': str(e)}
+                    _send_message(conn, response)
+                except (OSError, ValueError):
+                    continue
+
+            if stop:
+                break
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        master_password = None
+        clear_session_keys()
+
+# Démarrer l'agent en arrière-plan (comme ssh-agent)
+def start_agent(username, master_password, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES):
+    """Détache l'agent du terminal ; retourne le chemin du socket dans le processus parent,
+    ou None si l'agent n'a pas pu démarrer"""
+    from database import close_db
+
+    # La connexion SQLite ne doit pas être partagée entre les deux processus
+    close_db()
+
+    # Le parent attend que le socket soit prêt avant de rendre la main
+    read_fd, write_fd = os.pipe()
+    if os.fork() > 0:
+        os.close(write_fd)
+        ready = os.read(read_fd, 1)
+        os.close(read_fd)
+        return agent_socket_path(username) if ready else None
+
+    os.close(read_fd)
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    try:
+        run_agent(username, master_password, idle_timeout_minutes, on_ready=lambda: os.write(write_fd, b'1'))
+    finally:
+        os._exit(0)
+
+# Envoyer une requête à l'agent ; None si aucun agent n'est actif
+def agent_request(username, request):
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    path = agent_socket_path(username)
+    if not os.path.exists(path):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(30)
+        client.connect(path)
+        _send_message(client, request)
+        return _read_message(client)
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
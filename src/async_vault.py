@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import database
+
+# Lectures simultanées autorisées par défaut
+DEFAULT_MAX_CONCURRENT_READS = 8
+
+class AsyncVault:
+    """API asyncio du gestionnaire de mots de passe, pour l'intégrer à un service.
+
+    Les écritures SQLite passent par un unique thread d'écriture ; la dérivation de clé
+    (KDF) et les lectures tournent sur un exécuteur configurable, les lectures étant
+    limitées par un sémaphore. Chaque thread a sa propre connexion (mode WAL), et la
+    clé de données déverrouillée est gardée pour la session : après le premier appel
+    d'un utilisateur, ses opérations ne coûtent plus de KDF. Les lectures n'écrivent jamais :
+    la migration des entrées héritées et la re-dérivation de l'enveloppe sont laissées aux
+    écritures. Le blocage après plusieurs tentatives échouées est celui de la CLI.
+
+    Usage :
+        async with AsyncVault('vault.sqlite') as vault:
+            await vault.add('alice', 'github', 'secret', master_password)
+            password = await vault.get('alice', 'github', master_password)
+    """
+
+    def __init__(self, db_path=None, executor=None, max_workers=None, max_concurrent_reads=DEFAULT_MAX_CONCURRENT_READS):
+        if db_path:
+            database.configure_db(db_path)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vault-writer')
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vault-worker')
+        self._read_semaphore = asyncio.Semaphore(max_concurrent_reads)
+        # Threads ayant ouvert des connexions, fermées par close()
+        self._thread_ids = set()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _call(self, func, *args):
+        self._thread_ids.add(threading.get_ident())
+        return func(*args)
+
+    async def _run(self, executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(self._call, func, *args))
+
+    async def _write(self, func, *args):
+        return await self._run(self._writer, func, *args)
+
+    async def _read(self, func, *args):
+        async with self._read_semaphore:
+            return await self._run(self._executor, func, *args)
+
+    # Déverrouiller la clé de données hors du thread d'écriture (KDF seulement au premier appel)
+    async def _unlock(self, username, master_password):
+        is_locked, remaining, _ = await self._run(self._executor, database.get_lockout_status, username)
+        if is_locked:
+            return False
+        is_valid = await self._run(self._executor, database.verify_user, username, master_password, False)
+        # Seuls un échec, ou un succès qui efface des échecs récents, sont enregistrés (thread d'écriture)
+        if not is_valid or remaining < database.MAX_LOGIN_ATTEMPTS:
+            await self._write(database.record_login_result, username, is_valid)
+        return is_valid
+
+    async def open(self):
+        await self._write(database.init_db)
+
+    async def close(self):
+        """Ferme les connexions ouvertes par le thread d'écriture et par les threads de l'exécuteur"""
+        self._writer.shutdown(wait=True)
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+        database.close_db(self._thread_ids)
+        self._thread_ids.clear()
+
+    async def register(self, username, master_password):
+        user_columns = await self._run(self._executor, database.prepare_user_keys, master_password)
+        return await self._write(database.insert_user, username, user_columns)
+
+    async def verify(self, username, master_password):
+        return await self._unlock(username, master_password)
+
+    async def add(self, username, label, password, master_password):
+        if not await self._unlock(username, master_password):
+            return False
+        return await self._write(database.add_password, username, label, password, master_password)
+
+    async def get(self, username, label, master_password):
+        if not await self._unlock(username, master_password):
+            return None
+        return await self._read(database.get_password, username, label, master_password, False)
+
+    async def update(self, username, label, new_password, master_password):
+        if not await self._unlock(username, master_password):
+            return False
+        return await self._write(database.update_password, username, label, new_password, master_password)
+
+    async def delete(self, username, label, master_password):
+        if not await self._unlock(username, master_password):
+            return False
+        return await self._write(database.delete_password, username, label)
+
+    async def list(self, username, master_password):
+        """Labels de l'utilisateur, None si le master password est invalide"""
+        if not await self._unlock(username, master_password):
+            return None
+        return await self._read(database.list_user_labels, username)
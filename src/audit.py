@@ -0,0 +1,62 @@
+"""Audit de sécurité d'un coffre (--audit) en une seule lecture.
+
+Toutes les entrées sont lues et déchiffrées une fois (par blocs, en parallèle avec --workers),
+les réutilisations sont regroupées par table de hachage au fil de la lecture, puis chaque mot
+de passe distinct est évalué une seule fois (robustesse et liste des mots de passe compromis).
+Le rapport ne contient que des labels, jamais de mot de passe.
+"""
+import heapq
+from datetime import datetime
+
+from breach import get_breach_index
+from database import iter_vault_entries
+from password_utils import estimate_strength_batch, MIN_PASSWORD_SCORE
+
+# Nombre d'entrées les plus anciennes listées dans le rapport
+DEFAULT_OLDEST_COUNT = 10
+
+def audit_vault(username, master_password, oldest_count=DEFAULT_OLDEST_COUNT, chunk_size=500):
+    """Retourne le rapport d'audit (dictionnaire sérialisable en JSON)"""
+    labels_by_password = {}
+    last_changes = []
+    for label, password, updated_at in iter_vault_entries(username, master_password, chunk_size):
+        labels_by_password.setdefault(password, []).append(label)
+        last_changes.append((label, updated_at))
+
+    # Un mot de passe partagé par plusieurs labels n'est évalué qu'une fois
+    passwords = list(labels_by_password)
+    weak = []
+    for password, strength in zip(passwords, estimate_strength_batch(passwords, user_inputs=(username,))):
+        if strength['score'] < MIN_PASSWORD_SCORE:
+            weak.extend({'label': label, 'score': strength['score'], 'warning': strength['warning']}
+                        for label in labels_by_password[password])
+    weak.sort(key=lambda entry: (entry['score'], entry['label']))
+
+    breach_index = get_breach_index()
+    breached = None
+    if breach_index is not None:
+        breached = sorted(label for password in passwords if password in breach_index
+                          for label in labels_by_password[password])
+
+    reused = sorted((sorted(labels) for labels in labels_by_password.values() if len(labels) > 1),
+                    key=lambda labels: (-len(labels), labels))
+
+    # Date inconnue (entrée antérieure à la colonne updated_at) : considérée comme la plus ancienne
+    oldest = heapq.nsmallest(oldest_count, last_changes, key=lambda entry: (entry[1] is not None, entry[1] or '', entry[0]))
+
+    return {
+        'username': username,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'summary': {
+            'entries': len(last_changes),
+            'unique_passwords': len(passwords),
+            'reused_groups': len(reused),
+            'reused_entries': sum(len(labels) for labels in reused),
+            'weak': len(weak),
+            'breached': None if breached is None else len(breached),
+        },
+        'reused': reused,
+        'weak': weak,
+        'breached': breached,
+        'oldest': [{'label': label, 'updated_at': updated_at} for label, updated_at in oldest],
+    }
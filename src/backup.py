@@ -0,0 +1,152 @@
+import csv
+import json
+import struct
+from crypto import generate_salt, derive_aes_key, aead_encrypt, aead_decrypt
+
+# Format d'archive chiffrée :
+#   en-tête  = MAGIC (4 octets) | version (1 octet) | sel PBKDF2 (16 octets)
+#   bloc     = longueur du bloc chiffré (4 octets, big-endian) | bloc AES-256-GCM
+# Chaque bloc contient des lignes JSON {"label", "password"}. Le nonce d'un bloc est
+# son numéro (11 octets) suivi d'un octet "dernier bloc", l'en-tête est authentifié
+# avec chaque bloc : un bloc modifié, déplacé ou une archive tronquée est détecté.
+ARCHIVE_MAGIC = b'PMBK'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER_SIZE = len(ARCHIVE_MAGIC) + 1 + 16
+
+# Nombre d'entrées par bloc chiffré
+DEFAULT_CHUNK_ENTRIES = 1000
+# Taille maximale d'un bloc en clair : un bloc est écrit dès qu'il l'atteindrait. À la lecture,
+# une longueur annoncée supérieure (plus le tag GCM) est rejetée avant toute allocation
+ARCHIVE_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+GCM_TAG_SIZE = 16
+
+class ArchiveError(Exception):
+    """Archive corrompue, tronquée ou mot de passe incorrect"""
+
+# Lire l'en-tête d'un fichier binaire ouvert
+def read_archive_header(file):
+    """Retourne l'en-tête (à passer à iter_archive), ou None si le fichier n'est pas une archive :
+    il est alors remis au début pour être lu dans un autre format"""
+    header = file.read(ARCHIVE_HEADER_SIZE)
+    if not header.startswith(ARCHIVE_MAGIC):
+        file.seek(0)
+        return None
+    return header
+
+def _chunk_nonce(index, final):
+    return index.to_bytes(11, 'big') + (b'\x01' if final else b'\x00')
+
+def _iter_chunks(entries, chunk_entries):
+    chunk = []
+    size = 0
+    for label, password in entries:
+        line = (json.dumps({'label': label, 'password': password}, ensure_ascii=False) + '\n').encode()
+        if len(line) > ARCHIVE_MAX_CHUNK_SIZE:
+            raise ArchiveError(f"Entrée '{label}' trop grande pour une archive")
+        if chunk and size + len(line) > ARCHIVE_MAX_CHUNK_SIZE:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+        chunk.append(line)
+        size += len(line)
+        if len(chunk) >= chunk_entries:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+# Écrire une archive chiffrée bloc par bloc (mémoire constante)
+def write_archive(entries, file, passphrase, chunk_entries=DEFAULT_CHUNK_ENTRIES):
+    """entries : itérable de (label, password) ; file : fichier binaire ouvert en écriture.
+    Retourne le nombre d'entrées écrites"""
+    salt = generate_salt()
+    key = derive_aes_key(passphrase, salt)
+    header = ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION]) + salt
+    file.write(header)
+    
+    count = 0
+    index = 0
+    pending = None
+    # Un bloc d'avance : le dernier bloc doit porter l'indicateur de fin
+    for chunk in _iter_chunks(entries, chunk_entries):
+        if pending is not None:
+            _write_chunk(file, key, header, index, pending, final=False)
+            index += 1
+        pending = chunk
+        count += chunk.count(b'\n')
+    _write_chunk(file, key, header, index, pending or b'', final=True)
+    return count
+
+def _write_chunk(file, key, header, index, chunk, final):
+    encrypted = aead_encrypt(key, _chunk_nonce(index, final), chunk, header)
+    file.write(struct.pack('>I', len(encrypted)))
+    file.write(encrypted)
+    file.flush()
+
+# Lire une archive chiffrée bloc par bloc
+def iter_archive(file, passphrase, header=None):
+    """Génère les tuples (label, password, numéro d'entrée) ; lève ArchiveError si l'archive
+    est altérée, tronquée ou si le mot de passe est incorrect.
+    header : en-tête déjà lu par read_archive_header (sinon il est lu ici)"""
+    if header is None:
+        header = file.read(ARCHIVE_HEADER_SIZE)
+    if len(header) != ARCHIVE_HEADER_SIZE or not header.startswith(ARCHIVE_MAGIC):
+        raise ArchiveError("Ce fichier n'est pas une archive du gestionnaire de mots de passe")
+    if header[len(ARCHIVE_MAGIC)] != ARCHIVE_VERSION:
+        raise ArchiveError(f"Version d'archive non supportée: {header[len(ARCHIVE_MAGIC)]}")
+    
+    key = derive_aes_key(passphrase, header[len(ARCHIVE_MAGIC) + 1:])
+    entry_num = 0
+    index = 0
+    while True:
+        size = file.read(4)
+        if len(size) != 4:
+            raise ArchiveError("Archive tronquée (bloc final manquant)")
+        size = struct.unpack('>I', size)[0]
+        if size > ARCHIVE_MAX_CHUNK_SIZE + GCM_TAG_SIZE:
+            raise ArchiveError("Archive corrompue (taille de bloc invalide)")
+        encrypted = file.read(size)
+        
+        final = False
+        chunk = aead_decrypt(key, _chunk_nonce(index, False), encrypted, header)
+        if chunk is None:
+            chunk = aead_decrypt(key, _chunk_nonce(index, True), encrypted, header)
+            final = True
+        if chunk is None:
+            raise ArchiveError("Archive corrompue ou mot de passe incorrect")
+        
+        # Découpage sur b'\n' seulement : json.dumps(ensure_ascii=False) laisse tels quels U+0085,
+        # U+2028 et U+2029, que str.splitlines prendrait pour des fins de ligne
+        for line in chunk.split(b'\n')[:-1]:
+            entry_num += 1
+            entry = json.loads(line)
+            yield entry['label'], entry['password'], entry_num
+        
+        if final:
+            if file.read(1):
+                raise ArchiveError("Données inattendues après le bloc final")
+            return
+        index += 1
+
+# Exports en clair : CSV (compatible avec l'import) ou JSON Lines
+def write_csv(entries, file):
+    writer = csv.writer(file)
+    count = 0
+    for label, password in entries:
+        writer.writerow([label, password])
+        count += 1
+    return count
+
+def write_jsonl(entries, file):
+    count = 0
+    for label, password in entries:
+        file.write(json.dumps({'label': label, 'password': password}, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+def iter_jsonl(file):
+    for line_num, line in enumerate(file, 1):
+        if line.strip():
+            entry = json.loads(line)
+            yield entry['label'], entry['password'], line_num
@@ -0,0 +1,221 @@
+"""Vérification hors ligne des mots de passe compromis (liste HIBP ou équivalent).
+
+Le fichier d'index est un tableau trié d'empreintes SHA-1 (éventuellement tronquées)
+de taille fixe : il est projeté en mémoire (mmap) et interrogé par recherche
+dichotomique, sans jamais être chargé. Un filtre de Bloom optionnel, à la fin du
+fichier, écarte la plupart des mots de passe absents en quelques accès.
+
+Construction à partir d'un dump local (lignes "SHA1:COUNT" de HIBP, ou mots de passe
+en clair avec --plaintext) :
+
+    python breach.py pwned-passwords-sha1-ordered-by-hash-v8.txt -o breach.idx --bloom-bits 10
+    python main.py -r alice --breach-file breach.idx
+"""
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+# Format du fichier d'index :
+#   en-tête = MAGIC (4 octets) | version (1) | octets par empreinte (1) | fonctions du filtre de Bloom (1)
+#             | réservé (1) | nombre d'empreintes (8, big-endian)
+#   corps   = empreintes triées et dédoublonnées, puis filtre de Bloom (absent si 0 fonction)
+INDEX_MAGIC = b'PMBH'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('>4sBBBxQ')
+
+SHA1_SIZE = 20
+# 8 octets suffisent pour quelques milliards d'empreintes (faux positifs ~ n / 2^64)
+DEFAULT_HASH_BYTES = 8
+# Empreintes triées en mémoire avant d'être écrites dans un fichier temporaire (tri externe)
+DEFAULT_RUN_RECORDS = 2_000_000
+
+# Fichier d'index utilisé par is_breached_password (aucune vérification si non configuré)
+BREACH_FILE = os.getenv('PASSWORD_MANAGER_BREACH_FILE')
+
+_index = None
+
+class BreachIndexError(Exception):
+    """Fichier d'index absent ou invalide"""
+
+class BreachIndex:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            header = file.read(INDEX_HEADER.size)
+            if len(header) < INDEX_HEADER.size:
+                raise BreachIndexError(f"{path}: fichier d'index tronqué")
+            magic, version, self.hash_bytes, self.bloom_hashes, self.count = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise BreachIndexError(f"{path}: ce n'est pas un fichier d'index de mots de passe compromis")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # L'en-tête doit décrire exactement le fichier : sinon la recherche lirait hors des empreintes
+        self._records_end = INDEX_HEADER.size + self.count * self.hash_bytes
+        size = len(self._mmap)
+        if (not 1 <= self.hash_bytes <= SHA1_SIZE or self._records_end > size
+                or (self.bloom_hashes and self._records_end == size) or (not self.bloom_hashes and self._records_end != size)):
+            self._mmap.close()
+            raise BreachIndexError(f"{path}: fichier d'index corrompu ou tronqué")
+        self.bloom_bits = (size - self._records_end) * 8 if self.bloom_hashes else 0
+
+    def close(self):
+        self._mmap.close()
+
+    def __contains__(self, password):
+        return self.contains_digest(hashlib.sha1(password.encode()).digest())
+
+    def contains_digest(self, digest):
+        record = digest[:self.hash_bytes]
+        if self.bloom_bits and not _bloom_contains(self._mmap, self._records_end, self.bloom_bits, self.bloom_hashes, record):
+            return False
+
+        # Recherche dichotomique directement dans le fichier projeté en mémoire
+        data, size = self._mmap, self.hash_bytes
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = INDEX_HEADER.size + middle * size
+            if data[offset:offset + size] < record:
+                low = middle + 1
+            else:
+                high = middle
+        offset = INDEX_HEADER.size + low * size
+        return low < self.count and data[offset:offset + size] == record
+
+# Positions du filtre de Bloom (double hachage) ; une empreinte tronquée est re-hachée
+def _bloom_positions(record, bits, hashes):
+    digest = record if len(record) >= 16 else hashlib.blake2b(record, digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'big')
+    h2 = int.from_bytes(digest[8:16], 'big') | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+def _bloom_contains(data, start, bits, hashes, record):
+    # Arrêt au premier bit nul : un mot de passe absent coûte en général un ou deux accès
+    for position in _bloom_positions(record, bits, hashes):
+        if not data[start + (position >> 3)] & (1 << (position & 7)):
+            return False
+    return True
+
+# Changer de fichier d'index (None pour désactiver la vérification)
+def configure_breach_file(path):
+    global BREACH_FILE, _index
+    if _index is not None:
+        _index.close()
+    BREACH_FILE = path
+    _index = None
+
+def get_breach_index():
+    """Index ouvert une seule fois par processus, None si aucun fichier n'est configuré"""
+    global _index
+    if _index is None and BREACH_FILE:
+        _index = BreachIndex(BREACH_FILE)
+    return _index
+
+def is_breached_password(password):
+    index = get_breach_index()
+    return index is not None and password in index
+
+# Empreintes d'un dump : "SHA1[:COUNT]" (format HIBP) ou mots de passe en clair
+def _iter_digests(lines, plaintext):
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if plaintext:
+            if line:
+                yield hashlib.sha1(line.encode()).digest()
+            continue
+
+        sha1_hex = line.split(':', 1)[0].strip()
+        if len(sha1_hex) != 2 * SHA1_SIZE:
+            continue
+        try:
+            yield bytes.fromhex(sha1_hex)
+        except ValueError:
+            continue
+
+def _write_run(records, directory):
+    records.sort()
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.run', delete=False) as file:
+        file.write(b''.join(records))
+        return file.name
+
+def _iter_run(path, hash_bytes, block_records=65536):
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(hash_bytes * block_records)
+            if not block:
+                break
+            for offset in range(0, len(block), hash_bytes):
+                yield block[offset:offset + hash_bytes]
+
+# Construire l'index : tri externe par blocs puis fusion, mémoire bornée quelle que soit la taille du dump
+def build_breach_index(lines, output_path, hash_bytes=DEFAULT_HASH_BYTES, bloom_bits_per_entry=0,
+                       plaintext=False, run_records=DEFAULT_RUN_RECORDS):
+    """Retourne le nombre d'empreintes distinctes écrites"""
+    if not 1 <= hash_bytes <= SHA1_SIZE:
+        raise ValueError(f"hash_bytes doit être compris entre 1 et {SHA1_SIZE}")
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+        runs = []
+        records = []
+        total = 0
+        for digest in _iter_digests(lines, plaintext):
+            records.append(digest[:hash_bytes])
+            if len(records) >= run_records:
+                runs.append(_write_run(records, tmp_dir))
+                total += len(records)
+                records = []
+        if records:
+            runs.append(_write_run(records, tmp_dir))
+            total += len(records)
+
+        # Filtre dimensionné sur le nombre d'empreintes lues (doublons compris)
+        bloom_hashes = max(1, round(bloom_bits_per_entry * 0.693)) if bloom_bits_per_entry else 0
+        bloom = bytearray(max(1, total * bloom_bits_per_entry // 8) if bloom_hashes else 0)
+        bloom_bits = len(bloom) * 8
+
+        count = 0
+        previous = None
+        with open(output_path, 'wb') as output:
+            output.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, hash_bytes, bloom_hashes, 0))
+            for record in heapq.merge(*(_iter_run(run, hash_bytes) for run in runs)):
+                if record == previous:
+                    continue
+                output.write(record)
+                if bloom_hashes:
+                    for position in _bloom_positions(record, bloom_bits, bloom_hashes):
+                        bloom[position >> 3] |= 1 << (position & 7)
+                previous = record
+                count += 1
+
+            output.write(bloom)
+            output.seek(0)
+            output.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, hash_bytes, bloom_hashes, count))
+
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Construire l'index des mots de passe compromis")
+    parser.add_argument('dump', help="Dump local : lignes SHA1[:COUNT] (HIBP) ou mots de passe en clair ('-' pour stdin)")
+    parser.add_argument('-o', '--output', required=True, help="Fichier d'index à créer")
+    parser.add_argument('--plaintext', action='store_true', help='Le dump contient des mots de passe en clair')
+    parser.add_argument('--hash-bytes', type=int, default=DEFAULT_HASH_BYTES, metavar='N', help=f"Octets conservés par empreinte SHA-1 (défaut: {DEFAULT_HASH_BYTES})")
+    parser.add_argument('--bloom-bits', type=int, default=0, metavar='N', help="Bits par empreinte du filtre de Bloom (0 = pas de filtre, 10 ~ 1%% de faux positifs)")
+    parser.add_argument('--run-records', type=int, default=DEFAULT_RUN_RECORDS, metavar='N', help='Empreintes triées en mémoire par bloc du tri externe')
+    args = parser.parse_args()
+
+    file = sys.stdin if args.dump == '-' else open(args.dump, encoding='utf-8', errors='replace')
+    try:
+        count = build_breach_index(file, args.output, args.hash_bytes, args.bloom_bits, args.plaintext, args.run_records)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    print(f"{count} empreintes écrites dans {args.output} ({os.path.getsize(args.output)} octets)")
+
+if __name__ == '__main__':
+    main()
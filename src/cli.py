@@ -2,9 +2,16 @@ import argparse
 import getpass
 import sys
 import csv
+import io
+import os
+import atexit
+import json
+import time
+from fnmatch import fnmatchcase
+from itertools import tee
 from datetime import datetime
-from database import init_db, register_user, verify_user, add_password, get_password, update_password, check_password_reuse, is_user_locked, record_login_attempt, reset_login_attempts, delete_password, delete_user, get_all_users_with_labels
 from password_utils import validate_password_strength
+from agent import agent_request, start_agent, configure_agent_db, DEFAULT_IDLE_TIMEOUT_MINUTES
 
 class Colors:
     RED = '\033[91m'
@@ -47,58 +54,77 @@ def print_password(label, password):
     print(f"{Colors.CYAN}Label: {Colors.BOLD}{label}{Colors.END}")
     print(f"{Colors.GREEN}Mot de passe: {Colors.BOLD}{password}{Colors.END}\n")
 
-def print_users_table(users_data):
-    """Affiche un tableau formaté de tous les utilisateurs et leurs labels"""
-    if not users_data:
-        print_warning("Aucun utilisateur enregistré dans le système.")
-        return
+# Afficher les mots de passe au fil de l'eau et signaler les labels/motifs sans résultat
+def print_passwords(requested, entries):
+    from database import is_label_pattern
     
-    print(f"\n{Colors.CYAN}{Colors.BOLD}📋 LISTE DES UTILISATEURS ET LEURS LABELS{Colors.END}\n")
+    found = set()
+    for label, password in entries:
+        print_password(label, password)
+        found.add(label)
     
-    # Calculer les largeurs des colonnes
-    max_username_length = max(len(user[0]) for user in users_data)
-    max_username_length = max(max_username_length, len("UTILISATEUR"))
+    for label in requested:
+        if is_label_pattern(label):
+            if not any(name == label or fnmatchcase(name, label) for name in found):
+                print_warning(f"Aucun label ne correspond au motif '{label}'.")
+        elif label not in found:
+            print_error(f"Erreur: Aucun mot de passe trouvé pour le label '{label}'!")
+
+def print_search_results(query, results):
+    if not results:
+        print_warning(f"Aucun label ne correspond à '{query}'.")
+        return
     
-    max_labels_length = max(len(user[1] if user[1] else "Aucun") for user in users_data)
-    max_labels_length = max(max_labels_length, len("LABELS"))
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🔎 RÉSULTATS POUR '{query}'{Colors.END}\n")
+    for username, label in results:
+        print(f"  • {Colors.GREEN}{label}{Colors.END} {Colors.WHITE}({username}){Colors.END}")
+    print()
+
+# Largeurs fixes : le tableau est affiché au fil de la lecture, sans tout charger en mémoire
+USERNAME_COLUMN_WIDTH = 20
+LABELS_COLUMN_WIDTH = 60
+
+def _fit(text, width):
+    return text if len(text) <= width else text[:width - 1] + '…'
+
+def print_users_table(users_rows, summary, limit=None):
+    """Affiche un tableau des utilisateurs (username, nombre de labels, premiers labels) ligne par ligne"""
+    from database import LABELS_PREVIEW_SIZE
     
-    # Limiter la largeur maximale pour les labels
-    max_labels_length = min(max_labels_length, 80)
+    total_users, users_with_labels, total_labels = summary
+    if not total_users:
+        print_warning("Aucun utilisateur enregistré dans le système.")
+        return
     
-    # En-tête du tableau
-    header_separator = "+" + "-" * (max_username_length + 2) + "+" + "-" * (max_labels_length + 2) + "+"
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📋 LISTE DES UTILISATEURS ET LEURS LABELS{Colors.END}\n")
     
+    header_separator = "+" + "-" * (USERNAME_COLUMN_WIDTH + 2) + "+" + "-" * 10 + "+" + "-" * (LABELS_COLUMN_WIDTH + 2) + "+"
     print(f"{Colors.BOLD}{header_separator}{Colors.END}")
-    print(f"{Colors.BOLD}| {'UTILISATEUR'.ljust(max_username_length)} | {'LABELS'.ljust(max_labels_length)} |{Colors.END}")
+    print(f"{Colors.BOLD}| {'UTILISATEUR'.ljust(USERNAME_COLUMN_WIDTH)} | {'LABELS':>8} | {'APERÇU'.ljust(LABELS_COLUMN_WIDTH)} |{Colors.END}")
     print(f"{Colors.BOLD}{header_separator}{Colors.END}")
     
-    # Lignes de données
-    for username, labels in users_data:
-        labels_display = labels if labels else "Aucun"
-        
-        # Si les labels sont trop longs, les couper sur plusieurs lignes
-        if len(labels_display) > max_labels_length:
-            # Première ligne
-            print(f"| {Colors.CYAN}{username.ljust(max_username_length)}{Colors.END} | {Colors.GREEN}{labels_display[:max_labels_length]}{Colors.END} |")
-            
-            # Lignes suivantes
-            remaining = labels_display[max_labels_length:]
-            while remaining:
-                chunk = remaining[:max_labels_length]
-                remaining = remaining[max_labels_length:]
-                print(f"| {' '.ljust(max_username_length)} | {Colors.GREEN}{chunk.ljust(max_labels_length)}{Colors.END} |")
-        else:
-            print(f"| {Colors.CYAN}{username.ljust(max_username_length)}{Colors.END} | {Colors.GREEN}{labels_display.ljust(max_labels_length)}{Colors.END} |")
+    shown = 0
+    last_username = None
+    for username, label_count, preview in users_rows:
+        preview_display = preview if preview else "Aucun"
+        if label_count > LABELS_PREVIEW_SIZE:
+            preview_display += f", … (+{label_count - LABELS_PREVIEW_SIZE})"
+        print(f"| {Colors.CYAN}{_fit(username, USERNAME_COLUMN_WIDTH).ljust(USERNAME_COLUMN_WIDTH)}{Colors.END} "
+              f"| {label_count:>8} "
+              f"| {Colors.GREEN}{_fit(preview_display, LABELS_COLUMN_WIDTH).ljust(LABELS_COLUMN_WIDTH)}{Colors.END} |")
+        shown += 1
+        last_username = username
     
     print(f"{Colors.BOLD}{header_separator}{Colors.END}")
     
-    # Statistiques
-    total_users = len(users_data)
-    total_labels = sum(1 if user[1] else 0 for user in users_data)
+    if limit is not None and shown == limit:
+        print_info(f"Page suivante: --after {last_username} --limit {limit}")
     
+    # Statistiques
     print(f"\n{Colors.BLUE}📊 Statistiques:{Colors.END}")
     print(f"  • Total d'utilisateurs: {Colors.BOLD}{total_users}{Colors.END}")
-    print(f"  • Utilisateurs avec au moins un label: {Colors.BOLD}{total_labels}{Colors.END}\n")
+    print(f"  • Utilisateurs avec au moins un label: {Colors.BOLD}{users_with_labels}{Colors.END}")
+    print(f"  • Total de labels: {Colors.BOLD}{total_labels}{Colors.END}\n")
 
 def print_usage():
     usage = f"""
@@ -113,12 +139,19 @@ def print_usage():
 {Colors.CYAN}Importer des mots de passe depuis un fichier:{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -i {Colors.BOLD}fichier.csv{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --import {Colors.BOLD}fichier.txt{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -i {Colors.BOLD}fichier.csv{Colors.END} --resume --batch-size {Colors.BOLD}1000{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -i {Colors.BOLD}fichier.csv{Colors.END} --workers {Colors.BOLD}8{Colors.END}
+
+{Colors.CYAN}Exporter / restaurer le coffre:{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --export {Colors.BOLD}sauvegarde.pmbk{Colors.END} [--format archive|csv|jsonl]{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --restore {Colors.BOLD}sauvegarde.pmbk{Colors.END} [--archive-password] [--resume]{Colors.END}
 
 {Colors.CYAN}Modifier un mot de passe existant:{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -m {Colors.BOLD}label{Colors.END}
 
 {Colors.CYAN}Afficher le mot de passe associé à un label quelconque:{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -s {Colors.BOLD}label{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -s {Colors.BOLD}label1 label2 'prod-*'{Colors.END}
 
 {Colors.CYAN}Supprimer un mot de passe (label):{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -d {Colors.BOLD}label{Colors.END}
@@ -126,8 +159,46 @@ def print_usage():
 {Colors.CYAN}Supprimer un utilisateur et tous ses mots de passe:{Colors.END}
   {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --delete-user{Colors.END}
 
+{Colors.CYAN}Exécuter un script de commandes JSONL (une seule authentification):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --batch {Colors.BOLD}commandes.jsonl{Colors.END} [--batch-size {Colors.BOLD}500{Colors.END}]{Colors.END}
+  {Colors.WHITE}... | python main.py -u {Colors.BOLD}username{Colors.END} --batch -{Colors.END}
+  {Colors.WHITE}{{"op": "add", "label": "github", "password": "..."}}  ops: add, modify, show, delete, import-row{Colors.END}
+
+{Colors.CYAN}Changer le master password (re-chiffre toutes les entrées):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --change-master [--batch-size {Colors.BOLD}500{Colors.END}] [--workers {Colors.BOLD}4{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Lister les labels d'un utilisateur:{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --list-labels{Colors.END}
+
+{Colors.CYAN}Agent (session déverrouillée en mémoire, comme ssh-agent):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --agent [--agent-timeout {Colors.BOLD}15{Colors.END}]{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --lock{Colors.END}
+
+{Colors.CYAN}Shell interactif (show/add/modify/delete/search, complétion des labels avec Tab):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --shell [--agent-timeout {Colors.BOLD}15{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Rechercher des labels:{Colors.END}
+  {Colors.WHITE}python main.py --search {Colors.BOLD}git{Colors.END} [-u {Colors.BOLD}username{Colors.END}] [--limit {Colors.BOLD}20{Colors.END}]{Colors.END}
+
 {Colors.CYAN}Lister tous les utilisateurs et leurs labels:{Colors.END}
   {Colors.WHITE}python main.py -l{Colors.END} ou {Colors.WHITE}python main.py --list{Colors.END}
+  {Colors.WHITE}python main.py -l --limit {Colors.BOLD}50{Colors.END} [--offset {Colors.BOLD}100{Colors.END} | --after {Colors.BOLD}username{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Servir les mots de passe aux autres processus (API HTTP/JSON locale):{Colors.END}
+  {Colors.WHITE}python main.py --serve [{Colors.BOLD}127.0.0.1:8765{Colors.END} | {Colors.BOLD}unix:/chemin.sock{Colors.END}] [--serve-workers {Colors.BOLD}8{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Calibrer la dérivation du master password (latence visée en ms):{Colors.END}
+  {Colors.WHITE}python main.py --calibrate [{Colors.BOLD}250{Colors.END}] [--kdf {Colors.BOLD}pbkdf2|scrypt|argon2id{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Vérifier les mots de passe dans une liste de mots de passe compromis (hors ligne):{Colors.END}
+  {Colors.WHITE}python breach.py {Colors.BOLD}pwned-passwords-sha1.txt{Colors.END} -o {Colors.BOLD}breach.idx{Colors.END} [--bloom-bits 10]{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -a {Colors.BOLD}label mot_de_passe{Colors.END} --breach-file {Colors.BOLD}breach.idx{Colors.END}{Colors.END}
+
+{Colors.CYAN}Auditer le coffre (réutilisations, mots de passe faibles, compromis, anciens):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} --audit [{Colors.BOLD}rapport.json{Colors.END}] [--workers {Colors.BOLD}4{Colors.END}]{Colors.END}
+
+{Colors.CYAN}Mesurer le temps passé par phase (KDF, SQL, connexion...):{Colors.END}
+  {Colors.WHITE}python main.py -u {Colors.BOLD}username{Colors.END} -a {Colors.BOLD}label mot_de_passe{Colors.END} --timings [table|json]{Colors.END}
 
 {Colors.CYAN}Format des fichiers d'import:{Colors.END}
   {Colors.WHITE}CSV: label,password (une ligne par mot de passe)
@@ -171,6 +242,8 @@ def confirm_password_input(prompt_text, validate_strength=False):
 
 def check_and_warn_password_reuse(username, password, master_password, exclude_label=None):
     """Vérifie la réutilisation du mot de passe et demande confirmation"""
+    from database import check_password_reuse
+    
     duplicate_labels = check_password_reuse(username, password, master_password, exclude_label)
     
     if duplicate_labels:
@@ -182,100 +255,181 @@ def check_and_warn_password_reuse(username, password, master_password, exclude_l
     
     return True
 
+def check_and_warn_breached_password(password):
+    """Vérifie le mot de passe dans la liste des mots de passe compromis et demande confirmation"""
+    from breach import is_breached_password
+    
+    if is_breached_password(password):
+        print_warning("ATTENTION: Ce mot de passe figure dans une liste de mots de passe compromis!")
+        print_info("Il est probablement déjà essayé par les attaques par dictionnaire.")
+        
+        response = input(f"{Colors.YELLOW}Voulez-vous continuer quand même? (y/n): {Colors.END}").lower().strip()
+        return response == 'y' or response == 'yes'
+    
+    return True
+
 # Vérification de l'utilisateur avec protection contre les tentatives multiples
 def verify_user_with_lockout(username, master_password):
-    """Vérifie l'utilisateur avec protection contre les tentatives multiples"""
-    # Vérifier si l'utilisateur est bloqué
-    is_locked, remaining_minutes = is_user_locked(username)
+    """Vérifie l'utilisateur avec protection contre les tentatives multiples (politique de database)"""
+    from database import verify_user_with_lockout as verify_with_lockout
     
-    if is_locked:
+    is_valid, remaining, remaining_minutes = verify_with_lockout(username, master_password)
+    if is_valid:
+        return True
+    
+    if remaining_minutes:
         print_error(f"Compte temporairement bloqué! Réessayez dans {remaining_minutes} minute(s).")
         print_warning("Trop de tentatives de connexion échouées.")
+    elif remaining > 0:
+        print_warning(f"Il vous reste {remaining} tentative(s) avant le blocage du compte.")
+    
+    return False
+
+def print_labels(username, labels):
+    if not labels:
+        print_warning(f"Aucun label enregistré pour {username}.")
+        return
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🏷️  LABELS DE {username}{Colors.END}")
+    for label in labels:
+        print(f"  • {Colors.GREEN}{label}{Colors.END}")
+    print()
+
+# Envoyer un ajout/modification à l'agent, avec confirmation en cas de réutilisation
+def agent_save_password(username, op, label, password):
+    """Retourne la réponse de l'agent, ou None si l'utilisateur annule"""
+    response = agent_request(username, {'op': op, 'label': label, 'password': password}) or {}
+    if response.get('error') == 'reused':
+        print_warning(f"ATTENTION: Ce mot de passe est déjà utilisé pour le(s) label(s): {', '.join(response['labels'])}")
+        print_info("Réutiliser le même mot de passe pour plusieurs services diminue votre sécurité.")
+        
+        confirmation = input(f"{Colors.YELLOW}Voulez-vous continuer quand même? (y/n): {Colors.END}").lower().strip()
+        if confirmation != 'y' and confirmation != 'yes':
+            return None
+        response = agent_request(username, {'op': op, 'label': label, 'password': password, 'force': True}) or {}
+    return response
+
+# Exécuter la commande via l'agent s'il est actif pour cet utilisateur
+def handle_with_agent(args):
+    """Retourne True si la commande a été traitée par l'agent (aucun master password demandé)"""
+    if args.lock:
+        if agent_request(args.user, {'op': 'lock'}):
+            print_success(f"Agent de {args.user} verrouillé.")
+        else:
+            print_info(f"Aucun agent actif pour {args.user}.")
+        return True
+    
+    if not (args.show or args.list_labels or args.add or args.modify or args.delete):
+        return False
+    if agent_request(args.user, {'op': 'ping'}) is None:
         return False
     
-    # Vérifier les credentials
-    is_valid = verify_user(username, master_password)
+    if args.show:
+        response = agent_request(args.user, {'op': 'show', 'labels': args.show}) or {}
+        entries = ((entry['label'], entry['password']) for entry in response.get('entries', []))
+        print_passwords(args.show, entries)
+        return True
     
-    # Enregistrer la tentative
-    record_login_attempt(username, is_valid)
+    if args.list_labels:
+        response = agent_request(args.user, {'op': 'list-labels'}) or {}
+        print_labels(args.user, response.get('labels', []))
+        return True
     
-    if is_valid:
-        # Réinitialiser les tentatives échouées
-        reset_login_attempts(username)
+    if args.add:
+        label, password = args.add
+        if not check_and_warn_breached_password(password):
+            print_info("Opération annulée.")
+            return True
+        response = agent_save_password(args.user, 'add', label, password)
+        if response is None:
+            print_info("Opération annulée.")
+        elif response.get('ok'):
+            print_success(f"Mot de passe '{label}' sauvegardé avec succès!")
+        else:
+            print_error("Erreur: Impossible de sauvegarder le mot de passe (label peut-être déjà utilisé)!")
         return True
-    else:
-        # Compter combien de tentatives restent
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        from datetime import datetime, timedelta
-        lockout_time = datetime.now() - timedelta(minutes=15)
-        
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM login_attempts 
-            WHERE username = ? 
-            AND success = 0 
-            AND attempt_time > ?
-        ''', (username, lockout_time))
-        
-        failed_attempts = cursor.fetchone()[0]
-        conn.close()
-        
-        remaining = 3 - failed_attempts
-        if remaining > 0:
-            print_warning(f"Il vous reste {remaining} tentative(s) avant le blocage du compte.")
+    
+    if args.modify or args.delete:
+        label = args.modify or args.delete
+        response = agent_request(args.user, {'op': 'show', 'label': label}) or {}
+        if not response.get('ok'):
+            print_error("Erreur: Aucun mot de passe trouvé pour ce label!")
+            return True
         
-        return False
-
-# Obtenir la connexion à la base de données
-def get_db_connection():
-    """Importe la fonction depuis database.py"""
-    import sqlite3
-    conn = sqlite3.connect('../db/data.sqlite')
-    return conn
+        if args.modify:
+            print_info(f"Mot de passe actuel trouvé pour '{label}'")
+            new_password = confirm_password_input('Entrez le nouveau mot de passe')
+            if not check_and_warn_breached_password(new_password):
+                response = None
+            else:
+                response = agent_save_password(args.user, 'modify', label, new_password)
+            if response is None:
+                print_info("Opération annulée.")
+            elif response.get('ok'):
+                print_success(f"Mot de passe du label '{label}' modifié avec succès!")
+            else:
+                print_error("Erreur: Impossible de modifier le mot de passe!")
+        else:
+            print_warning(f"Vous êtes sur le point de supprimer le mot de passe pour '{label}'")
+            confirmation = input(f"{Colors.YELLOW}Êtes-vous sûr? (y/n): {Colors.END}").lower().strip()
+            if confirmation != 'y' and confirmation != 'yes':
+                print_info("Opération annulée.")
+            elif (agent_request(args.user, {'op': 'delete', 'label': label}) or {}).get('ok'):
+                print_success(f"LE mot de passe et le label '{label}' ont été supprimés avec succès!")
+            else:
+                print_error("Erreur: Impossible de supprimer ce label!")
+        return True
+    
+    return False
 
-def parse_import_file(filepath):
-    """Parse un fichier CSV ou TXT et retourne une liste de tuples (label, password)"""
-    passwords_data = []
+def iter_import_file(filepath, file=None):
+    """Lit un fichier CSV ou TXT ligne par ligne et génère des tuples (label, password, line_num).
+    file : fichier texte déjà ouvert sur filepath (sinon il est ouvert ici)"""
+    if file is None:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            yield from iter_import_file(filepath, file)
+        return
+    
     file_extension = filepath.lower().split('.')[-1]
     
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            if file_extension == 'csv':
-                # Format CSV: label,password
-                csv_reader = csv.reader(file)
-                for line_num, row in enumerate(csv_reader, 1):
-                    if len(row) >= 2:
-                        label = row[0].strip()
-                        password = row[1].strip()
-                        if label and password:
-                            passwords_data.append((label, password, line_num))
-                    elif len(row) == 1 and row[0].strip():
-                        print_warning(f"Ligne {line_num}: Format invalide (mot de passe manquant)")
-            
-            elif file_extension == 'txt':
-                # Format TXT: label:password
-                for line_num, line in enumerate(file, 1):
-                    line = line.strip()
-                    if not line or line.startswith('#'):  # Ignorer lignes vides et commentaires
-                        continue
-                    
-                    if ':' in line:
-                        parts = line.split(':', 1)
-                        label = parts[0].strip()
-                        password = parts[1].strip()
-                        if label and password:
-                            passwords_data.append((label, password, line_num))
-                    else:
-                        print_warning(f"Ligne {line_num}: Format invalide (séparateur ':' manquant)")
+    if file_extension == 'csv':
+        # Format CSV: label,password
+        csv_reader = csv.reader(file)
+        for line_num, row in enumerate(csv_reader, 1):
+            if len(row) >= 2:
+                label = row[0].strip()
+                password = row[1].strip()
+                if label and password:
+                    yield label, password, line_num
+            elif len(row) == 1 and row[0].strip():
+                print_warning(f"Ligne {line_num}: Format invalide (mot de passe manquant)")
+    
+    else:
+        # Format TXT: label:password
+        for line_num, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):  # Ignorer lignes vides et commentaires
+                continue
             
+            if ':' in line:
+                parts = line.split(':', 1)
+                label = parts[0].strip()
+                password = parts[1].strip()
+                if label and password:
+                    yield label, password, line_num
             else:
-                print_error(f"Format de fichier non supporté: .{file_extension}")
-                print_info("Formats acceptés: .csv, .txt")
-                return None
-        
-        return passwords_data
+                print_warning(f"Ligne {line_num}: Format invalide (séparateur ':' manquant)")
+
+def parse_import_file(filepath):
+    """Parse un fichier CSV ou TXT et retourne une liste de tuples (label, password, line_num)"""
+    file_extension = filepath.lower().split('.')[-1]
+    if file_extension not in ('csv', 'txt'):
+        print_error(f"Format de fichier non supporté: .{file_extension}")
+        print_info("Formats acceptés: .csv, .txt")
+        return None
     
+    try:
+        return list(iter_import_file(filepath))
     except FileNotFoundError:
         print_error(f"Fichier non trouvé: {filepath}")
         return None
@@ -284,57 +438,88 @@ def parse_import_file(filepath):
         return None
     
 # Importer des mots de passe depuis un fichier 'CSV ou TXT'
-def import_passwords_from_file(username, filepath, master_password, skip_duplicates=False):
-    """Importe des mots de passe depuis un fichier CSV ou TXT"""
+def import_passwords_from_file(username, filepath, master_password, skip_duplicates=False, resume=False, batch_size=500, assume_yes=False):
+    """Importe des mots de passe depuis un fichier CSV ou TXT, en flux et par lots transactionnels"""
+    from database import get_import_checkpoint, bulk_add_passwords
+    from breach import get_breach_index
+    from password_utils import estimate_strength_batch, MIN_PASSWORD_SCORE
+    
     print(f"\n{Colors.CYAN}{Colors.BOLD}📥 IMPORT DE MOTS DE PASSE{Colors.END}")
     print(f"{Colors.WHITE}Fichier: {Colors.BOLD}{filepath}{Colors.END}")
     print(f"{Colors.WHITE}Utilisateur: {Colors.BOLD}{username}{Colors.END}\n")
     
-    # Parser le fichier
-    passwords_data = parse_import_file(filepath)
-    
-    if passwords_data is None:
+    file_extension = filepath.lower().split('.')[-1]
+    if file_extension not in ('csv', 'txt'):
+        print_error(f"Format de fichier non supporté: .{file_extension}")
+        print_info("Formats acceptés: .csv, .txt")
         return
     
-    if not passwords_data:
-        print_warning("Aucun mot de passe valide trouvé dans le fichier.")
+    if not os.path.isfile(filepath):
+        print_error(f"Fichier non trouvé: {filepath}")
         return
     
-    print_info(f"Trouvé {len(passwords_data)} mot(s) de passe à importer.")
+    # Le point de reprise est associé au chemin absolu du fichier
+    source = os.path.abspath(filepath)
+    if resume:
+        last_line = get_import_checkpoint(username, source)
+        if last_line:
+            print_info(f"Reprise de l'import après la ligne {last_line}.")
+        else:
+            print_info("Aucun import interrompu pour ce fichier, import complet.")
     
     # Demander confirmation
-    response = input(f"{Colors.YELLOW}Voulez-vous continuer l'import? (y/n): {Colors.END}").lower().strip()
-    if response != 'y' and response != 'yes':
-        print_info("Import annulé.")
-        return
+    if not assume_yes:
+        response = input(f"{Colors.YELLOW}Voulez-vous continuer l'import? (y/n): {Colors.END}").lower().strip()
+        if response != 'y' and response != 'yes':
+            print_info("Import annulé.")
+            return
     
     # Statistiques
     success_count = 0
     failed_count = 0
     skipped_count = 0
+    breached_count = 0
+    weak_count = 0
     
-    # Importer chaque mot de passe
-    for label, password, line_num in passwords_data:
-        try:
-            # Vérifier la réutilisation si demandé
-            if not skip_duplicates:
-                duplicate_labels = check_password_reuse(username, password, master_password)
-                if duplicate_labels:
-                    print_warning(f"Ligne {line_num} - '{label}': Mot de passe déjà utilisé pour {', '.join(duplicate_labels)}")
-                    skipped_count += 1
-                    continue
-            
-            # Ajouter le mot de passe
-            if add_password(username, label, password, master_password):
+    # Lignes dont le mot de passe est compromis ou trop facile à deviner : importées, mais signalées
+    breach_index = get_breach_index()
+    breached_lines = set()
+    weak_lines = set()
+    def screened_rows(rows):
+        rows, passwords = tee(rows)
+        strengths = estimate_strength_batch((password for _, password, _ in passwords), user_inputs=(username,))
+        for (label, password, line_num), strength in zip(rows, strengths):
+            if breach_index is not None and password in breach_index:
+                breached_lines.add(line_num)
+            elif strength['score'] < MIN_PASSWORD_SCORE:
+                weak_lines.add(line_num)
+            yield label, password, line_num
+    
+    try:
+        results = bulk_add_passwords(username, screened_rows(iter_import_file(filepath)), master_password,
+                                     skip_duplicates=skip_duplicates, batch_size=batch_size,
+                                     source=source, resume=resume)
+        for line_num, label, status, duplicate_labels in results:
+            if status == 'added' and line_num in breached_lines:
+                print_warning(f"Ligne {line_num} - '{label}': Importé, mais le mot de passe est compromis")
+                success_count += 1
+                breached_count += 1
+            elif status == 'added' and line_num in weak_lines:
+                print_warning(f"Ligne {line_num} - '{label}': Importé, mais le mot de passe est faible")
+                success_count += 1
+                weak_count += 1
+            elif status == 'added':
                 print_success(f"Ligne {line_num} - '{label}': Importé avec succès")
                 success_count += 1
+            elif status == 'reused':
+                print_warning(f"Ligne {line_num} - '{label}': Mot de passe déjà utilisé pour {', '.join(duplicate_labels)}")
+                skipped_count += 1
             else:
-                print_error(f"Ligne {line_num} - '{label}': Échec (label peut-être déjà existant)")
+                print_error(f"Ligne {line_num} - '{label}': Échec (label déjà existant)")
                 failed_count += 1
-        
-        except Exception as e:
-            print_error(f"Ligne {line_num} - '{label}': Erreur - {str(e)}")
-            failed_count += 1
+    except Exception as e:
+        print_error(f"Erreur lors de l'import: {str(e)}")
+        print_info("Les lots déjà validés sont conservés, relancez avec --resume pour continuer.")
     
     # Résumé
     print(f"\n{Colors.CYAN}{Colors.BOLD}📊 RÉSUMÉ DE L'IMPORT{Colors.END}")
@@ -343,12 +528,274 @@ def import_passwords_from_file(username, filepath, master_password, skip_duplica
         print(f"{Colors.RED}❌ Échecs: {failed_count}{Colors.END}")
     if skipped_count > 0:
         print(f"{Colors.YELLOW}⏭️  Ignorés (réutilisation): {skipped_count}{Colors.END}")
-    print(f"{Colors.BOLD}Total: {len(passwords_data)}{Colors.END}\n")
+    if breached_count > 0:
+        print(f"{Colors.YELLOW}⚠️  Mots de passe compromis à changer: {breached_count}{Colors.END}")
+    if weak_count > 0:
+        print(f"{Colors.YELLOW}⚠️  Mots de passe faibles à changer: {weak_count}{Colors.END}")
+    print(f"{Colors.BOLD}Total: {success_count + failed_count + skipped_count}{Colors.END}\n")
+
+# Lire les commandes JSONL de --batch (fichier ou '-' pour l'entrée standard)
+def iter_batch_commands(file):
+    """Génère (numéro de ligne, commande), la commande valant None si la ligne n'est pas du JSON"""
+    for line_num, line in enumerate(file, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError:
+            yield line_num, None
+
+# Exécuter un script de commandes avec une seule authentification, résultats en JSONL sur stdout
+def run_batch(username, filepath, master_password, batch_size=500, skip_duplicates=False):
+    """Retourne True si toutes les commandes ont réussi"""
+    from database import execute_batch
+    
+    if filepath != '-' and not os.path.isfile(filepath):
+        print_error(f"Fichier non trouvé: {filepath}")
+        return False
+    
+    succeeded = failed = 0
+    file = sys.stdin if filepath == '-' else open(filepath, encoding='utf-8')
+    try:
+        for line_num, response in execute_batch(username, iter_batch_commands(file), master_password,
+                                                batch_size=batch_size, skip_duplicates=skip_duplicates):
+            print(json.dumps({'line': line_num, **response}, ensure_ascii=False))
+            if response['ok']:
+                succeeded += 1
+            else:
+                failed += 1
+    finally:
+        sys.stdout.flush()
+        if file is not sys.stdin:
+            file.close()
+    
+    # Le résumé va sur stderr : stdout ne contient que les résultats JSONL
+    print(f"{Colors.CYAN}📊 Batch: {succeeded} réussie(s), {failed} en erreur{Colors.END}", file=sys.stderr)
+    return failed == 0
+
+# Ouvrir un fichier d'export lisible par le seul propriétaire
+def open_private_file(filepath, binary=False):
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # Le mode de os.open ne s'applique qu'à la création : un fichier existant (0644...) est
+    # restreint avant d'y écrire quoi que ce soit
+    try:
+        os.fchmod(fd, 0o600)
+    except OSError:
+        os.close(fd)
+        raise
+    if binary:
+        return os.fdopen(fd, 'wb')
+    return os.fdopen(fd, 'w', encoding='utf-8', newline='')
+
+# Servir les opérations du coffre sur une API HTTP/JSON locale
+def serve_vault(address=None, workers=None, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES):
+    from server import create_server, run_server, DEFAULT_SERVE_ADDRESS, DEFAULT_SERVE_WORKERS
+    
+    address = address or DEFAULT_SERVE_ADDRESS
+    try:
+        server = create_server(address, workers or DEFAULT_SERVE_WORKERS, idle_timeout_minutes)
+    except (ValueError, OSError) as e:
+        print_error(f"Impossible de démarrer le serveur: {str(e)}")
+        return
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🌐 SERVEUR HTTP/JSON{Colors.END}")
+    print(f"{Colors.WHITE}Adresse: {Colors.BOLD}{address}{Colors.END}")
+    print(f"{Colors.WHITE}Threads: {Colors.BOLD}{workers or DEFAULT_SERVE_WORKERS}{Colors.END}\n")
+    print_info("Ouvrez une session avec POST /session, puis utilisez le jeton (Authorization: Bearer ...).")
+    print_info("Ctrl+C pour arrêter le serveur.")
+    
+    run_server(server)
+
+# Barre de progression sur une seule ligne, avec le débit et le temps restant estimé
+def print_progress(done, total, started_at, width=30):
+    elapsed = time.monotonic() - started_at
+    rate = done / elapsed if elapsed > 0 else 0
+    filled = width * done // total if total else width
+    remaining = f"{(total - done) / rate:.0f}s" if rate and done < total else '-'
+    bar = '█' * filled + '░' * (width - filled)
+    sys.stdout.write(f"\r  {Colors.CYAN}{bar}{Colors.END} {done}/{total} ({rate:.0f} entrées/s, reste {remaining})\033[K")
+    sys.stdout.flush()
+
+# Changer le master password en re-chiffrant le coffre par lots (reprise possible après interruption)
+def change_master_password_interactive(username, old_master_password, batch_size=500):
+    from database import change_master_password, has_pending_master_change
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🔐 CHANGEMENT DU MASTER PASSWORD{Colors.END}")
+    print(f"{Colors.WHITE}Utilisateur: {Colors.BOLD}{username}{Colors.END}\n")
+    if has_pending_master_change(username):
+        print_info("Changement interrompu trouvé : les lots déjà re-chiffrés sont conservés.")
+    
+    new_master_password = confirm_password_input(f'Entrez le nouveau master password pour {username}', validate_strength=True)
+    if new_master_password is None:
+        print_info("Opération annulée.")
+        return
+    
+    started_at = time.monotonic()
+    done = total = 0
+    try:
+        for done, total in change_master_password(username, old_master_password, new_master_password, batch_size):
+            print_progress(done, total, started_at)
+        print()
+    except Exception as e:
+        print()
+        print_error(f"Erreur lors du re-chiffrement: {str(e)}")
+        print_info("Les lots déjà validés sont conservés, relancez --change-master avec l'ancien master password pour continuer.")
+        return
+    
+    # Un agent actif garde l'ancienne clé de données en mémoire
+    if agent_request(username, {'op': 'lock'}):
+        print_info(f"Agent de {username} verrouillé.")
+    print_success(f"Master password modifié, {total} entrée(s) re-chiffrée(s) en {time.monotonic() - started_at:.1f}s!")
+
+# Audit de sécurité du coffre : résumé à l'écran et rapport JSON (labels seulement)
+def audit_vault_report(username, master_password, report_path=None):
+    from audit import audit_vault
+    
+    report_path = report_path or f"audit-{username}.json"
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🛡️  AUDIT DU COFFRE{Colors.END}")
+    print(f"{Colors.WHITE}Utilisateur: {Colors.BOLD}{username}{Colors.END}\n")
+    
+    started_at = time.monotonic()
+    report = audit_vault(username, master_password)
+    summary = report['summary']
+    
+    for labels in report['reused']:
+        print_warning(f"Mot de passe partagé par: {', '.join(labels)}")
+    for entry in report['weak']:
+        print_warning(f"'{entry['label']}': mot de passe faible (score {entry['score']}/4) {entry['warning']}".rstrip())
+    for label in report['breached'] or []:
+        print_warning(f"'{label}': mot de passe compromis")
+    if report['oldest']:
+        print(f"\n{Colors.CYAN}Mots de passe les plus anciens:{Colors.END}")
+        for entry in report['oldest']:
+            print(f"  • {Colors.WHITE}{entry['label']}{Colors.END}: {entry['updated_at'] or 'date inconnue'}")
+    
+    # Résumé
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📊 RÉSUMÉ DE L'AUDIT{Colors.END}")
+    print(f"{Colors.WHITE}Entrées: {summary['entries']} ({summary['unique_passwords']} mot(s) de passe distinct(s)){Colors.END}")
+    color = Colors.YELLOW if summary['reused_groups'] else Colors.GREEN
+    print(f"{color}Réutilisés: {summary['reused_entries']} entrée(s) en {summary['reused_groups']} groupe(s){Colors.END}")
+    print(f"{Colors.YELLOW if summary['weak'] else Colors.GREEN}Faibles: {summary['weak']}{Colors.END}")
+    if summary['breached'] is None:
+        print_info("Compromis: non vérifié (aucun index --breach-file)")
+    else:
+        print(f"{Colors.YELLOW if summary['breached'] else Colors.GREEN}Compromis: {summary['breached']}{Colors.END}")
+    print(f"{Colors.BOLD}Durée: {time.monotonic() - started_at:.1f}s{Colors.END}\n")
+    
+    try:
+        with open_private_file(report_path) as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print_error(f"Erreur lors de l'écriture du rapport: {str(e)}")
+        return
+    print_success(f"Rapport JSON écrit dans {report_path}")
+
+# Mesurer la machine et enregistrer les paramètres de dérivation du master password
+def calibrate_kdf_settings(target_ms=None, algorithm=None):
+    from crypto import calibrate_kdf, DEFAULT_UNLOCK_TARGET_MS
+    from database import get_kdf_params, set_kdf_params
+    
+    target_ms = target_ms or DEFAULT_UNLOCK_TARGET_MS
+    print(f"\n{Colors.CYAN}{Colors.BOLD}⚙️  CALIBRAGE DE LA DÉRIVATION DE CLÉ{Colors.END}")
+    print(f"{Colors.WHITE}Latence visée: {Colors.BOLD}{target_ms} ms{Colors.END}\n")
+    
+    previous_params = get_kdf_params()
+    params, elapsed_ms = calibrate_kdf(algorithm, target_ms)
+    set_kdf_params(params)
+    
+    details = ', '.join(f"{key}={value}" for key, value in params.items() if key != 'algorithm')
+    print(f"  • Précédent: {Colors.WHITE}{previous_params['algorithm']}{Colors.END}")
+    print(f"  • Choisi: {Colors.BOLD}{params['algorithm']}{Colors.END} ({details})")
+    print(f"  • Durée mesurée: {Colors.BOLD}{elapsed_ms:.0f} ms{Colors.END}\n")
+    print_success("Paramètres de dérivation enregistrés!")
+    print_info("Chaque compte sera re-dérivé avec ces paramètres à sa prochaine connexion.")
+
+# Exporter le coffre d'un utilisateur en flux (archive chiffrée, CSV ou JSONL)
+def export_vault(username, filepath, master_password, output_format='archive'):
+    """Les entrées sont lues par blocs et écrites au fur et à mesure : mémoire constante"""
+    from database import get_passwords
+    from backup import write_archive, write_csv, write_jsonl
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📤 EXPORT DU COFFRE{Colors.END}")
+    print(f"{Colors.WHITE}Fichier: {Colors.BOLD}{filepath}{Colors.END}")
+    print(f"{Colors.WHITE}Format: {Colors.BOLD}{output_format}{Colors.END}\n")
+    
+    if output_format != 'archive':
+        print_warning("Les mots de passe seront écrits EN CLAIR dans le fichier d'export!")
+    
+    entries = get_passwords(username, ['*'], master_password)
+    try:
+        if output_format == 'archive':
+            with open_private_file(filepath, binary=True) as file:
+                count = write_archive(entries, file, master_password)
+        else:
+            writer = write_csv if output_format == 'csv' else write_jsonl
+            with open_private_file(filepath) as file:
+                count = writer(entries, file)
+    except OSError as e:
+        print_error(f"Erreur lors de l'écriture du fichier: {str(e)}")
+        return
+    
+    print_success(f"{count} mot(s) de passe exporté(s) dans {filepath}")
+    if output_format == 'archive':
+        print_info("L'archive est chiffrée avec votre master password actuel.")
+
+# Restaurer une archive ou un export en clair via l'import en masse
+def restore_vault(username, filepath, master_password, archive_password=None, resume=False, batch_size=500):
+    from database import bulk_add_passwords
+    from backup import ArchiveError, read_archive_header, iter_archive, iter_jsonl
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}♻️  RESTAURATION DU COFFRE{Colors.END}")
+    print(f"{Colors.WHITE}Fichier: {Colors.BOLD}{filepath}{Colors.END}\n")
+    
+    if not os.path.isfile(filepath):
+        print_error(f"Fichier non trouvé: {filepath}")
+        return
+    
+    file_extension = filepath.lower().split('.')[-1]
+    restored_count = 0
+    existing_count = 0
+    try:
+        # Une seule ouverture : l'en-tête lu pour reconnaître une archive sert aussi à la lire
+        with open(filepath, 'rb') as file:
+            header = read_archive_header(file)
+            if header is not None:
+                rows = iter_archive(file, archive_password or master_password, header)
+            elif file_extension not in ('csv', 'txt', 'jsonl'):
+                print_error(f"Format de fichier non supporté: .{file_extension}")
+                print_info("Formats acceptés: archive chiffrée, .csv, .txt, .jsonl")
+                return
+            else:
+                text_file = io.TextIOWrapper(file, encoding='utf-8')
+                rows = iter_jsonl(text_file) if file_extension == 'jsonl' else iter_import_file(filepath, text_file)
+            
+            # Une sauvegarde peut légitimement contenir des mots de passe réutilisés
+            results = bulk_add_passwords(username, rows, master_password, skip_duplicates=True,
+                                         batch_size=batch_size, source=os.path.abspath(filepath), resume=resume)
+            for line_num, label, status, _ in results:
+                if status == 'added':
+                    restored_count += 1
+                else:
+                    print_warning(f"Entrée {line_num} - '{label}': label déjà existant, ignoré")
+                    existing_count += 1
+    except ArchiveError as e:
+        print_error(f"Erreur: {str(e)}")
+    except Exception as e:
+        print_error(f"Erreur lors de la restauration: {str(e)}")
+        print_info("Les lots déjà validés sont conservés, relancez avec --resume pour continuer.")
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📊 RÉSUMÉ DE LA RESTAURATION{Colors.END}")
+    print(f"{Colors.GREEN}✅ Restaurés: {restored_count}{Colors.END}")
+    if existing_count > 0:
+        print(f"{Colors.YELLOW}⏭️  Ignorés (label existant): {existing_count}{Colors.END}")
+    print()
 
 # Fonction principale
 def main():
-    print_banner()
-    init_db()
+    # La bannière n'est affichée qu'en session interactive
+    if sys.stdout.isatty():
+        print_banner()
     
     parser = argparse.ArgumentParser(description='Password Manager - Gestion sécurisée des mots de passe', add_help=False)
     
@@ -357,11 +804,38 @@ def main():
     parser.add_argument('-a', '--add', nargs=2, metavar=('LABEL', 'PASSWORD'), help='Ajouter un mot de passe: -a label mot_de_passe')
     parser.add_argument('-i', '--import', dest='import_file', metavar='FILE', help='Importer des mots de passe depuis un fichier CSV ou TXT')
     parser.add_argument('--skip-duplicates', action='store_true', help="Ignorer l'avertissement de réutilisation lors de l'import")
+    parser.add_argument('--resume', action='store_true', help="Reprendre un import interrompu après la dernière ligne validée")
+    parser.add_argument('--batch-size', type=int, default=500, metavar='N', help="Nombre de lignes par transaction lors de l'import, de --batch et de --change-master (défaut: 500)")
+    parser.add_argument('--export', metavar='FILE', help='Exporter le coffre (archive chiffrée par défaut)')
+    parser.add_argument('--format', choices=['archive', 'csv', 'jsonl'], default='archive', help="Format d'export: archive (chiffrée), csv ou jsonl (en clair)")
+    parser.add_argument('--restore', metavar='FILE', help='Restaurer une archive ou un export CSV/TXT/JSONL')
+    parser.add_argument('--archive-password', action='store_true', help="Demander le mot de passe de l'archive s'il diffère du master password")
     parser.add_argument('-m', '--modify', metavar='LABEL', help='Modifier un mot de passe existant: -m label')
-    parser.add_argument('-s', '--show', metavar='LABEL', help='Afficher un mot de passe: -s label')
+    parser.add_argument('-s', '--show', nargs='+', metavar='LABEL', help='Afficher un ou plusieurs mots de passe: -s label [label2 \'prod-*\' ...]')
     parser.add_argument('-d', '--delete', metavar='LABEL', help='Supprimer un mot de passe: -d label')
     parser.add_argument('--delete-user', action='store_true', help='Supprimer un utilisateur et tous ses mots de passe')
+    parser.add_argument('--batch', metavar='FILE', help="Exécuter les commandes JSONL de FILE ('-' pour stdin) avec une seule authentification")
+    parser.add_argument('--change-master', action='store_true', help="Changer le master password et re-chiffrer toutes les entrées (reprise avec l'ancien master password)")
+    parser.add_argument('--audit', nargs='?', const='', metavar='FILE', help="Auditer le coffre (réutilisations, mots de passe faibles, compromis, anciens) et écrire le rapport JSON (défaut: audit-USERNAME.json)")
     parser.add_argument('-l', '--list', action='store_true', help='Lister tous les utilisateurs et leurs labels')
+    parser.add_argument('--search', metavar='QUERY', help='Rechercher des labels (sous-chaîne, préfixe, approché), avec -u pour un seul utilisateur')
+    parser.add_argument('--limit', type=int, metavar='N', help='Nombre maximal de résultats')
+    parser.add_argument('--offset', type=int, default=0, metavar='N', help='Nombre d\'utilisateurs à sauter avec -l')
+    parser.add_argument('--after', metavar='USERNAME', help='Reprendre la liste -l après cet utilisateur (pagination par curseur)')
+    parser.add_argument('--list-labels', action='store_true', help="Lister les labels de l'utilisateur")
+    parser.add_argument('--agent', action='store_true', help="Démarrer un agent qui garde la session déverrouillée en mémoire")
+    parser.add_argument('--agent-timeout', type=int, default=DEFAULT_IDLE_TIMEOUT_MINUTES, metavar='MINUTES', help=f"Délai d'inactivité avant verrouillage de l'agent, du shell ou d'une session HTTP (défaut: {DEFAULT_IDLE_TIMEOUT_MINUTES})")
+    parser.add_argument('--shell', action='store_true', help="Ouvrir un shell interactif (une seule authentification, complétion des labels)")
+    parser.add_argument('--lock', action='store_true', help="Verrouiller (arrêter) l'agent de l'utilisateur")
+    parser.add_argument('--serve', nargs='?', const='', metavar='ADRESSE', help="Servir l'API HTTP/JSON sur HOST:PORT local ou unix:CHEMIN (défaut: 127.0.0.1:8765)")
+    parser.add_argument('--serve-workers', type=int, metavar='N', help="Nombre de threads du serveur HTTP qui accèdent au coffre (défaut: 8)")
+    parser.add_argument('--calibrate', nargs='?', const=0, type=int, metavar='MS', help="Choisir les paramètres de dérivation pour un déverrouillage en MS millisecondes (défaut: 250)")
+    parser.add_argument('--kdf', choices=['pbkdf2', 'scrypt', 'argon2id'], help='Algorithme utilisé par --calibrate (défaut: argon2id si disponible, sinon scrypt)')
+    parser.add_argument('--breach-file', metavar='PATH', help="Index des mots de passe compromis construit par breach.py (défaut: $PASSWORD_MANAGER_BREACH_FILE)")
+    parser.add_argument('--db', metavar='PATH', help='Chemin de la base SQLite, ou répertoire d\'un stockage partitionné (défaut: $PASSWORD_MANAGER_DB ou ../db/data.sqlite)')
+    parser.add_argument('--shards', type=int, metavar='N', help='Créer un stockage partitionné en N fichiers dans le répertoire --db (un catalogue + des partitions par utilisateur)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='Nombre de processus pour la dérivation de clés et le chiffrement des opérations multi-entrées')
+    parser.add_argument('--timings', nargs='?', const='table', choices=['table', 'json'], help='Afficher sur stderr le temps, le nombre d\'appels et de requêtes SQL par phase')
     parser.add_argument('-h', '--help', action='store_true', help="Afficher ce message d'aide")
     
     args = parser.parse_args()
@@ -370,6 +844,43 @@ def main():
         print_usage()
         return
     
+    # Instrumentation seulement si demandée : aucun surcoût sinon
+    if args.timings:
+        from timings import enable_timings, print_timings_report
+        enable_timings()
+        atexit.register(print_timings_report, args.timings)
+    
+    # Index des mots de passe compromis, ouvert (mmap) à la première vérification
+    if args.breach_file or os.getenv('PASSWORD_MANAGER_BREACH_FILE'):
+        from breach import configure_breach_file, get_breach_index, BreachIndexError
+        configure_breach_file(args.breach_file or os.getenv('PASSWORD_MANAGER_BREACH_FILE'))
+        try:
+            get_breach_index()
+        except (OSError, BreachIndexError) as e:
+            print_error(f"Index des mots de passe compromis illisible: {str(e)}")
+            return
+    
+    # Un agent actif sert la commande sans master password ni accès direct à la base, s'il a été
+    # déverrouillé sur la même base (--db ou $PASSWORD_MANAGER_DB)
+    configure_agent_db(args.db or os.getenv('PASSWORD_MANAGER_DB'))
+    if args.user and not args.agent and handle_with_agent(args):
+        return
+    
+    # Chargés seulement pour les commandes qui accèdent à la base
+    from crypto import set_workers, available_kdf_algorithms
+    from database import configure_db, init_db, register_user, add_password, get_password, get_passwords, update_password, delete_password, delete_user, iter_users_with_label_counts, get_users_summary, list_user_labels, search_labels
+    
+    set_workers(args.workers)
+    if args.shards and not args.db:
+        print_error("--shards exige --db RÉPERTOIRE")
+        return
+    if args.db:
+        if args.shards and os.path.isfile(args.db):
+            print_error(f"{args.db} est une base unique : --shards exige un répertoire")
+            return
+        configure_db(args.db, args.shards)
+    init_db()
+    
     # Mode inscription
     if args.register:
         print(f"\n{Colors.CYAN}{Colors.BOLD}📝 INSCRIPTION NOUVEL UTILISATEUR{Colors.END}")
@@ -385,12 +896,60 @@ def main():
         else:
             print_error("Erreur: Cet utilisateur existe déjà!")
     
+    # Mode agent : déverrouiller une fois et servir les invocations suivantes
+    elif args.user and args.agent:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            socket_path = start_agent(args.user, master_password, args.agent_timeout)
+            if socket_path:
+                print_success(f"Agent démarré pour {args.user} (verrouillage après {args.agent_timeout} minute(s) d'inactivité).")
+                print_info(f"Socket: {socket_path}")
+            else:
+                print_error("Erreur: Impossible de démarrer l'agent!")
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode shell interactif : session déverrouillée et index des labels en mémoire
+    elif args.user and args.shell:
+        from shell import run_shell
+        
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            run_shell(args.user, master_password, args.agent_timeout)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
     # Mode import de fichier
     elif args.user and args.import_file:
         master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
         
         if verify_user_with_lockout(args.user, master_password):
-            import_passwords_from_file(args.user, args.import_file, master_password, args.skip_duplicates)
+            import_passwords_from_file(args.user, args.import_file, master_password, args.skip_duplicates,
+                                       resume=args.resume, batch_size=args.batch_size)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode export du coffre
+    elif args.user and args.export:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            export_vault(args.user, args.export, master_password, args.format)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode restauration d'une sauvegarde
+    elif args.user and args.restore:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            archive_password = None
+            if args.archive_password:
+                archive_password = getpass.getpass(f"{Colors.YELLOW}🔑 Entrez le mot de passe de l'archive: {Colors.END}")
+            restore_vault(args.user, args.restore, master_password, archive_password,
+                          resume=args.resume, batch_size=args.batch_size)
         else:
             print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
     
@@ -405,7 +964,7 @@ def main():
         
         if verify_user_with_lockout(args.user, master_password):
             # Vérification de la réutilisation du mot de passe
-            if check_and_warn_password_reuse(args.user, password, master_password):
+            if check_and_warn_breached_password(password) and check_and_warn_password_reuse(args.user, password, master_password):
                 if add_password(args.user, label, password, master_password):
                     print_success(f"Mot de passe '{label}' sauvegardé avec succès!")
                 else:
@@ -434,7 +993,7 @@ def main():
             new_password = confirm_password_input('Entrez le nouveau mot de passe')
             
             # Vérification de la réutilisation du mot de passe
-            if check_and_warn_password_reuse(args.user, new_password, master_password, exclude_label=args.modify):
+            if check_and_warn_breached_password(new_password) and check_and_warn_password_reuse(args.user, new_password, master_password, exclude_label=args.modify):
                 if update_password(args.user, args.modify, new_password, master_password):
                     print_success(f"Mot de passe du label '{args.modify}' modifié avec succès!")
                 else:
@@ -448,16 +1007,12 @@ def main():
     elif args.user and args.show:
         print(f"\n{Colors.CYAN}{Colors.BOLD}🔍 RECHERCHE DE MOT DE PASSE{Colors.END}")
         print(f"{Colors.WHITE}Utilisateur: {Colors.BOLD}{args.user}{Colors.END}")
-        print(f"{Colors.WHITE}Label: {Colors.BOLD}{args.show}{Colors.END}")
+        print(f"{Colors.WHITE}Label: {Colors.BOLD}{', '.join(args.show)}{Colors.END}")
         
         master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
         
         if verify_user_with_lockout(args.user, master_password):
-            password = get_password(args.user, args.show, master_password)
-            if password:
-                print_password(args.show, password)
-            else:
-                print_error("Erreur: Aucun mot de passe trouvé pour ce label!")
+            print_passwords(args.show, get_passwords(args.user, args.show, master_password))
         else:
             print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
     
@@ -513,10 +1068,63 @@ def main():
         else:
             print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
     
+    # Mode script : commandes JSONL avec une seule authentification
+    elif args.user and args.batch:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}', stream=sys.stderr)
+        
+        if verify_user_with_lockout(args.user, master_password):
+            if not run_batch(args.user, args.batch, master_password, args.batch_size, args.skip_duplicates):
+                sys.exit(1)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+            sys.exit(1)
+    
+    # Mode changement du master password
+    elif args.user and args.change_master:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password actuel pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            change_master_password_interactive(args.user, master_password, args.batch_size)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode audit du coffre
+    elif args.user and args.audit is not None:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            audit_vault_report(args.user, master_password, args.audit)
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode liste des labels d'un utilisateur
+    elif args.user and args.list_labels:
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {args.user}: {Colors.END}')
+        
+        if verify_user_with_lockout(args.user, master_password):
+            print_labels(args.user, list_user_labels(args.user))
+        else:
+            print_error("Erreur: Master password invalide ou utilisateur non trouvé!")
+    
+    # Mode serveur HTTP/JSON local
+    elif args.serve is not None:
+        serve_vault(args.serve, args.serve_workers, args.agent_timeout)
+    
+    # Mode calibrage de la dérivation de clé
+    elif args.calibrate is not None:
+        if args.kdf and args.kdf not in available_kdf_algorithms():
+            print_error(f"Algorithme {args.kdf} non disponible avec cette version de cryptography.")
+        else:
+            calibrate_kdf_settings(args.calibrate, args.kdf)
+    
+    # Mode recherche de labels
+    elif args.search:
+        print_search_results(args.search, search_labels(args.search, args.user, args.limit or 20))
+    
     # Mode liste de tous les utilisateurs
     elif args.list:
-        users_data = get_all_users_with_labels()
-        print_users_table(users_data)
+        users_rows = iter_users_with_label_counts(args.limit, args.offset, args.after)
+        print_users_table(users_rows, get_users_summary(), args.limit)
     
     else:
         print_error("Commande invalide!")
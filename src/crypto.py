@@ -1,10 +1,16 @@
 import hashlib
+import hmac
 import base64
 import os
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import time
+import atexit
+
+# Les modules de cryptography sont importés dans les fonctions qui les utilisent :
+# les commandes qui ne chiffrent rien (-h, -l, agent) ne paient pas leur chargement
+
+# Nombre de processus pour les opérations multi-entrées (1 = pas de parallélisme)
+_workers = 1
+_executor = None
 
 def generate_salt():
     return os.urandom(16)
@@ -18,29 +24,175 @@ def hash_master_password(password, salt):
 # Dérivation de la clé AES à partir du master password
 def derive_aes_key(master_password, salt):
     # PBKDF2 avec 100000 itérations
-    kdf = PBKDF2HMAC(
+    return derive_key(master_password, salt, DEFAULT_KDF_PARAMS)
+
+# Paramètres de dérivation des comptes créés avant le choix de l'algorithme par utilisateur
+DEFAULT_KDF_PARAMS = {'algorithm': 'pbkdf2', 'iterations': 100000}
+
+# Latence de déverrouillage visée par --calibrate
+DEFAULT_UNLOCK_TARGET_MS = 250
+
+def available_kdf_algorithms():
+    from importlib.util import find_spec
+    
+    # Argon2id n'existe qu'à partir de cryptography 44
+    algorithms = ['pbkdf2', 'scrypt']
+    if find_spec('cryptography.hazmat.primitives.kdf.argon2'):
+        algorithms.append('argon2id')
+    return algorithms
+
+# Dérivation d'une clé de 32 octets selon l'algorithme et les paramètres enregistrés pour l'utilisateur
+def derive_key(master_password, salt, kdf_params):
+    algorithm = kdf_params['algorithm']
+    
+    if algorithm == 'pbkdf2':
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=kdf_params['iterations'])
+    elif algorithm == 'scrypt':
+        from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+        kdf = Scrypt(salt=salt, length=32, n=kdf_params['n'], r=kdf_params['r'], p=kdf_params['p'])
+    elif algorithm == 'argon2id':
+        from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+        kdf = Argon2id(salt=salt, length=32, iterations=kdf_params['iterations'],
+                       lanes=kdf_params['lanes'], memory_cost=kdf_params['memory_cost'])
+    else:
+        raise ValueError(f"Algorithme de dérivation inconnu: {algorithm}")
+    
+    return kdf.derive(master_password.encode())
+
+def _time_kdf_ms(kdf_params):
+    salt = generate_salt()
+    start = time.perf_counter()
+    derive_key('calibration', salt, kdf_params)
+    return (time.perf_counter() - start) * 1000
+
+# Mesurer la machine et choisir les paramètres atteignant la latence de déverrouillage visée
+def calibrate_kdf(algorithm=None, target_ms=DEFAULT_UNLOCK_TARGET_MS):
+    """Retourne (paramètres, durée mesurée en ms) ; par défaut Argon2id si disponible, sinon scrypt"""
+    if algorithm is None:
+        algorithm = available_kdf_algorithms()[-1]
+    
+    if algorithm == 'pbkdf2':
+        # Coût linéaire en nombre d'itérations : une mesure suffit
+        probe = {'algorithm': 'pbkdf2', 'iterations': 50000}
+        _time_kdf_ms(probe)  # première mesure écartée (chargement des modules)
+        iterations = int(probe['iterations'] * target_ms / _time_kdf_ms(probe))
+        params = {'algorithm': 'pbkdf2', 'iterations': max(iterations, DEFAULT_KDF_PARAMS['iterations'])}
+    
+    elif algorithm == 'scrypt':
+        # Doubler n (mémoire = 128 * r * n octets) jusqu'à dépasser la cible, plafonné à 1 Gio
+        params = {'algorithm': 'scrypt', 'n': 2 ** 14, 'r': 8, 'p': 1}
+        _time_kdf_ms(params)
+        while params['n'] < 2 ** 20 and _time_kdf_ms(params) * 2 <= target_ms:
+            params['n'] *= 2
+    
+    elif algorithm == 'argon2id':
+        # Mémoire fixe (64 Mio, réduite sur les petites machines), puis nombre de passes ajusté
+        params = {'algorithm': 'argon2id', 'iterations': 1, 'lanes': 4, 'memory_cost': 64 * 1024}
+        _time_kdf_ms(params)
+        elapsed = _time_kdf_ms(params)
+        while elapsed > target_ms and params['memory_cost'] > 8 * 1024:
+            params['memory_cost'] //= 2
+            elapsed = _time_kdf_ms(params)
+        params['iterations'] = max(1, round(target_ms / elapsed))
+    
+    else:
+        raise ValueError(f"Algorithme de dérivation inconnu: {algorithm}")
+    
+    return params, _time_kdf_ms(params)
+
+# Vérificateur du master password, calculé à partir de la clé dérivée (aucun calcul supplémentaire coûteux)
+def master_password_verifier(wrapping_key):
+    return base64.b64encode(hmac.new(wrapping_key, b'master-password-verifier', hashlib.sha256).digest())
+
+# Génération d'une clé de données aléatoire (AES-256) propre à l'utilisateur
+def generate_data_key():
+    return os.urandom(32)
+
+# Chiffrement de la clé de données avec la clé dérivée du master password
+def wrap_data_key(data_key, wrapping_key):
+    from cryptography.hazmat.primitives.keywrap import aes_key_wrap
+    from cryptography.hazmat.backends import default_backend
+    
+    # AES Key Wrap (RFC 3394)
+    return base64.b64encode(aes_key_wrap(wrapping_key, data_key, backend=default_backend()))
+
+# Déchiffrement de la clé de données, None si la clé d'enveloppe est incorrecte
+def unwrap_data_key(wrapped_key, wrapping_key):
+    from cryptography.hazmat.primitives.keywrap import aes_key_unwrap, InvalidUnwrap
+    from cryptography.hazmat.backends import default_backend
+    
+    try:
+        return aes_key_unwrap(wrapping_key, base64.b64decode(wrapped_key), backend=default_backend())
+    except InvalidUnwrap:
+        return None
+
+# Dérivation de la clé d'une entrée à partir de la clé de données
+def derive_entry_key(data_key, salt):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.backends import default_backend
+    
+    # HKDF-SHA256 : une seule passe, pas d'itérations
+    hkdf = HKDF(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
-        iterations=100000,
+        info=b'password-entry',
         backend=default_backend()
     )
-    return kdf.derive(master_password.encode())
+    return hkdf.derive(data_key)
 
-# Chiffrement des mots de passe
-def encrypt_password(password, aes_key):
-    # AES-256 encryption
-    iv = os.urandom(16)
-    cipher = Cipher(algorithms.AES(aes_key), modes.CBC(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
+# Dérivation de la clé secrète servant aux empreintes des mots de passe
+def derive_fingerprint_key(data_key):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.backends import default_backend
     
-    # Padding du mot de passe à 16 bytes
-    padded_password = password.encode().ljust(16, b'\0')
-    encrypted = encryptor.update(padded_password) + encryptor.finalize()
-    
-    return base64.b64encode(iv + encrypted)
-# Déchiffrement des mots de passe
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'password-fingerprint',
+        backend=default_backend()
+    )
+    return hkdf.derive(data_key)
+
+# Empreinte d'un mot de passe : HMAC-SHA256 sous la clé secrète de l'utilisateur
+def fingerprint_password(password, fingerprint_key):
+    return hmac.new(fingerprint_key, password.encode(), hashlib.sha256).hexdigest()
+
+# Format v2 des mots de passe chiffrés : octet de version + nonce (12 octets) + AES-256-GCM (tag inclus)
+# Le format v1 (base64 de IV + AES-256-CBC) reste lisible
+CIPHERTEXT_VERSION_2 = b'\x02'
+GCM_NONCE_SIZE = 12
+
+def is_ciphertext_v2(encrypted_data):
+    # Un chiffré v1 est du base64 : il ne commence jamais par l'octet 0x02
+    return isinstance(encrypted_data, bytes) and encrypted_data[:1] == CIPHERTEXT_VERSION_2
+
+# Chiffrement des mots de passe (format v2, longueur quelconque)
+def encrypt_password(password, aes_key):
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    # L'octet de version est authentifié avec les données
+    return CIPHERTEXT_VERSION_2 + nonce + aead_encrypt(aes_key, nonce, password.encode(), CIPHERTEXT_VERSION_2)
+
+# Déchiffrement des mots de passe, selon la version du format
 def decrypt_password(encrypted_data, aes_key):
+    if is_ciphertext_v2(encrypted_data):
+        nonce = encrypted_data[1:1 + GCM_NONCE_SIZE]
+        decrypted = aead_decrypt(aes_key, nonce, encrypted_data[1 + GCM_NONCE_SIZE:], CIPHERTEXT_VERSION_2)
+        if decrypted is None:
+            raise ValueError("Mot de passe chiffré altéré ou clé incorrecte")
+        return decrypted.decode()
+    return _decrypt_password_v1(encrypted_data, aes_key)
+
+# Déchiffrement du format v1 (AES-256-CBC, complété par des octets nuls)
+def _decrypt_password_v1(encrypted_data, aes_key):
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.backends import default_backend
+    
     # AES-256 decryption
     data = base64.b64decode(encrypted_data)
     iv = data[:16]
@@ -50,4 +202,65 @@ def decrypt_password(encrypted_data, aes_key):
     decryptor = cipher.decryptor()
     
     decrypted = decryptor.update(encrypted) + decryptor.finalize()
-    return decrypted.decode().rstrip('\0')
\ No newline at end of file
+    return decrypted.decode().rstrip('\0')
+
+# Chiffrement complet d'une entrée : sel, clé HKDF, AES et empreinte
+def encrypt_entry(password, data_key, fingerprint_key):
+    salt = generate_salt()
+    encrypted = encrypt_password(password, derive_entry_key(data_key, salt))
+    return encrypted, salt, fingerprint_password(password, fingerprint_key)
+
+# Déchiffrement d'une entrée héritée, dont la clé est dérivée du master password par PBKDF2
+def decrypt_legacy_entry(encrypted_data, salt, master_password):
+    return decrypt_password(encrypted_data, derive_aes_key(master_password, salt))
+
+# Déchiffrement d'une entrée, sans la migrer (utilisable par parallel_map)
+def decrypt_entry(encrypted_data, salt, data_key, legacy_master_password=None):
+    """legacy_master_password : entrée héritée, dont la clé est dérivée du master password par PBKDF2"""
+    if legacy_master_password is None:
+        return decrypt_password(encrypted_data, derive_entry_key(data_key, salt))
+    return decrypt_legacy_entry(encrypted_data, salt, legacy_master_password)
+
+# Re-chiffrement d'une entrée sous une nouvelle clé de données (changement de master password)
+def reencrypt_entry(encrypted_data, salt, old_data_key, new_data_key, fingerprint_key, legacy_master_password=None):
+    """legacy_master_password : entrée héritée, dont la clé est dérivée du master password par PBKDF2"""
+    password = decrypt_entry(encrypted_data, salt, old_data_key, legacy_master_password)
+    return encrypt_entry(password, new_data_key, fingerprint_key)
+
+# Configuration du pool de processus utilisé par parallel_map
+def set_workers(workers):
+    global _workers
+    _workers = max(1, workers or 1)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=_workers)
+        atexit.register(_executor.shutdown)
+    return _executor
+
+# Application de func en parallèle sur plusieurs processus, résultats dans l'ordre
+def parallel_map(func, *iterables):
+    """Équivalent de map() ; répartit le travail sur le pool de processus si --workers > 1"""
+    items = list(zip(*iterables))
+    if _workers <= 1 or len(items) < 2:
+        return [func(*args) for args in items]
+    
+    chunksize = max(1, len(items) // (_workers * 4))
+    return list(_get_executor().map(func, *zip(*items), chunksize=chunksize))
+
+# Chiffrement authentifié AES-256-GCM
+def aead_encrypt(key, nonce, data, associated_data=None):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM(key).encrypt(nonce, data, associated_data)
+
+# Déchiffrement authentifié, None si les données ont été altérées ou si la clé est incorrecte
+def aead_decrypt(key, nonce, data, associated_data=None):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+    
+    try:
+        return AESGCM(key).decrypt(nonce, data, associated_data)
+    except InvalidTag:
+        return None
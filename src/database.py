@@ -1,375 +1,1446 @@
 import sqlite3
 import os
 import base64
+import json
+import hashlib
+import difflib
+import heapq
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from crypto import hash_master_password, generate_salt, derive_aes_key, encrypt_password, decrypt_password
+from itertools import islice, repeat
+from crypto import DEFAULT_KDF_PARAMS, hash_master_password, generate_salt, derive_key, master_password_verifier, decrypt_password, generate_data_key, wrap_data_key, unwrap_data_key, derive_entry_key, derive_fingerprint_key, fingerprint_password, encrypt_entry, decrypt_entry, decrypt_legacy_entry, reencrypt_entry, parallel_map, is_ciphertext_v2
 
-def get_db_connection():
-    db_password = os.getenv('DB_PASSWORD', 'default_password')
-    conn = sqlite3.connect('../db/data.sqlite')
+# Versions de dérivation des clés d'entrée
+KEY_VERSION_LEGACY = 1     # PBKDF2(master password, sel de l'entrée)
+KEY_VERSION_DATA_KEY = 2   # HKDF(clé de données de l'utilisateur, sel de l'entrée)
+
+# Politique de blocage des connexions
+MAX_LOGIN_ATTEMPTS = 3
+LOCKOUT_DURATION_MINUTES = 15
+
+# Clés de données déverrouillées pendant la session (un seul PBKDF2 par utilisateur) :
+# (username, empreinte du master password) -> (enveloppe wrapped_key, clé de données,
+# enveloppe déjà re-dérivée avec les paramètres calibrés)
+_session_keys = {}
+# Le cache est partagé par les threads du serveur et des exécuteurs (jamais tenu pendant une dérivation)
+_session_keys_lock = threading.Lock()
+
+# Version du schéma, enregistrée dans PRAGMA user_version : le DDL n'est rejoué que si elle change
+SCHEMA_VERSION = 5
+
+# Chemin de la base, configurable par variable d'environnement ou configure_db()
+# Si c'est un répertoire, le stockage est partitionné : un catalogue (catalog.sqlite) associe
+# chaque utilisateur à un fichier de partition (shard-NN.sqlite) qui a le schéma complet
+DB_PATH = os.getenv('PASSWORD_MANAGER_DB', '../db/data.sqlite')
+
+CATALOG_FILE = 'catalog.sqlite'
+DEFAULT_SHARD_COUNT = 16
+
+# Nombre de partitions demandé pour un nouveau catalogue (configure_db), puis lu dans le catalogue
+_shard_count = None
+# Partition de chaque utilisateur déjà résolue : username -> chemin
+_user_shards = {}
+
+# Une connexion par thread et par fichier (sqlite3 ne partage pas une connexion entre threads)
+_local = threading.local()
+# Connexions de chaque thread (identifiant du thread -> {chemin: connexion}), pour pouvoir
+# fermer depuis un autre thread celles des threads d'un exécuteur arrêté
+_thread_connections = {}
+
+# Changer de base de données (les connexions ouvertes sur l'ancienne base sont fermées)
+def configure_db(path, shards=None):
+    """shards : crée un stockage partitionné en autant de fichiers dans le répertoire path"""
+    global DB_PATH, _shard_count
+    close_db()
+    DB_PATH = path
+    _shard_count = shards
+    _user_shards.clear()
+
+def is_sharded():
+    return _shard_count is not None or os.path.isdir(DB_PATH)
+
+def _catalog_path():
+    return os.path.join(DB_PATH, CATALOG_FILE) if is_sharded() else DB_PATH
+
+def _get_shard_count():
+    global _shard_count
+    if _shard_count is None:
+        row = get_db_connection(_catalog_path()).execute("SELECT value FROM settings WHERE key = 'shard_count'").fetchone()
+        _shard_count = int(row[0]) if row else DEFAULT_SHARD_COUNT
+    return _shard_count
+
+def _shard_paths():
+    if not is_sharded():
+        return [DB_PATH]
+    return [os.path.join(DB_PATH, f'shard-{index:02d}.sqlite') for index in range(_get_shard_count())]
+
+# Fichier contenant les données d'un utilisateur
+def _shard_path(username):
+    """Base unique : DB_PATH. Partitionné : partition enregistrée au catalogue, sinon
+    partition déterminée par le hachage du nom (utilisateurs inconnus, tentatives de connexion)"""
+    if not is_sharded():
+        return DB_PATH
+    if username in _user_shards:
+        return _user_shards[username]
+    
+    row = get_db_connection(_catalog_path()).execute('SELECT shard FROM user_shards WHERE username = ?', (username,)).fetchone()
+    if row:
+        _user_shards[username] = os.path.join(DB_PATH, row[0])
+        return _user_shards[username]
+    
+    bucket = int.from_bytes(hashlib.sha256(username.encode()).digest()[:8], 'big') % _get_shard_count()
+    return _shard_paths()[bucket]
+
+# Fichiers à parcourir pour les opérations sur tous les utilisateurs (partitions déjà créées)
+def _existing_shard_paths():
+    if not is_sharded():
+        return [DB_PATH]
+    return [path for path in _shard_paths() if os.path.exists(path)]
+
+# Obtenir la connexion du thread courant vers path (DB_PATH par défaut)
+def get_db_connection(path=None):
+    path = path or DB_PATH
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = _thread_connections[threading.get_ident()] = {}
+    
+    conn = connections.get(path)
+    if conn is None:
+        # La connexion n'est utilisée que par ce thread ; check_same_thread=False permet
+        # seulement à close_db de la fermer depuis un autre thread
+        conn = sqlite3.connect(path, timeout=30, cached_statements=256, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA busy_timeout = 30000')
+        connections[path] = conn
+        # Les partitions reçoivent leur schéma à leur première ouverture
+        if is_sharded() and path != _catalog_path():
+            _init_schema(path)
     return conn
 
+# Fermer les connexions du thread courant
+def close_db(thread_ids=None):
+    """thread_ids : fermer plutôt les connexions de ces threads (terminés ou inactifs) ; un thread
+    encore en vie rouvre une connexion à son prochain accès"""
+    if thread_ids is None:
+        thread_ids = [threading.get_ident()]
+    for thread_id in thread_ids:
+        connections = _thread_connections.get(thread_id) or {}
+        for conn in list(connections.values()):
+            conn.close()
+        connections.clear()
+
+# Curseur transactionnel : commit en sortie normale, rollback sur exception
+@contextmanager
+def db_cursor(path=None):
+    conn = get_db_connection(path)
+    cursor = conn.cursor()
+    try:
+        yield cursor
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
 # initialisation de la base de données
 def init_db():
-    os.makedirs('db', exist_ok=True)
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if is_sharded():
+        os.makedirs(DB_PATH, exist_ok=True)
+        _init_catalog()
+        return
+    
+    db_dir = os.path.dirname(DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    _init_schema(DB_PATH)
+
+# Catalogue du stockage partitionné : partition de chaque utilisateur et réglages globaux
+def _init_catalog():
+    global _shard_count
+    path = _catalog_path()
+    if get_db_connection(path).execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        with db_cursor(path) as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_shards (
+                    username TEXT PRIMARY KEY,
+                    shard TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+            # Le nombre de partitions est fixé à la création du catalogue
+            cursor.execute(
+                "INSERT OR IGNORE INTO settings (key, value) VALUES ('shard_count', ?)",
+                (str(_shard_count or DEFAULT_SHARD_COUNT),)
+            )
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    # Un catalogue existant garde son nombre de partitions
+    _shard_count = None
+    _get_shard_count()
+
+def _init_schema(path):
+    # Chemin rapide : schéma déjà à jour, aucune instruction DDL
+    if get_db_connection(path).execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+        return
+    
+    with db_cursor(path) as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                salt TEXT NOT NULL,
+                kdf_salt TEXT,
+                wrapped_key TEXT,
+                kdf_params TEXT
+            )
+        ''')
+    
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS passwords (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                encrypted_password BLOB NOT NULL,
+                encryption_salt BLOB NOT NULL,
+                key_version INTEGER NOT NULL DEFAULT 1,
+                fingerprint TEXT,
+                rotated_password BLOB,
+                rotated_salt BLOB,
+                rotated_fingerprint TEXT,
+                updated_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                UNIQUE(user_id, label)
+            )
+        ''')
+    
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS login_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                attempt_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                success INTEGER NOT NULL
+            )
+        ''')
+    
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                user_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                last_line INTEGER NOT NULL,
+                PRIMARY KEY (user_id, source)
+            )
+        ''')
+    
+        # Réglages globaux (paramètres de dérivation choisis par --calibrate)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+    
+        # Migration des bases créées avant la hiérarchie de clés
+        _add_column_if_missing(cursor, 'users', 'kdf_salt', 'TEXT')
+        _add_column_if_missing(cursor, 'users', 'wrapped_key', 'TEXT')
+        _add_column_if_missing(cursor, 'users', 'kdf_params', 'TEXT')
+        _add_column_if_missing(cursor, 'passwords', 'key_version', 'INTEGER NOT NULL DEFAULT 1')
+        _add_column_if_missing(cursor, 'passwords', 'fingerprint', 'TEXT')
+        
+        # Changement de master password : entrées re-chiffrées en attente de bascule
+        _add_column_if_missing(cursor, 'passwords', 'rotated_password', 'BLOB')
+        _add_column_if_missing(cursor, 'passwords', 'rotated_salt', 'BLOB')
+        _add_column_if_missing(cursor, 'passwords', 'rotated_fingerprint', 'TEXT')
+        # Date du dernier changement de chaque mot de passe (--audit), inconnue (NULL) pour les
+        # entrées antérieures à la colonne
+        _add_column_if_missing(cursor, 'passwords', 'updated_at', 'TIMESTAMP')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS key_rotations (
+                user_id INTEGER PRIMARY KEY,
+                wrapped_key TEXT NOT NULL
+            )
+        ''')
+    
+        # Index pour la détection de réutilisation par empreinte
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_passwords_fingerprint ON passwords (user_id, fingerprint)')
+        
+        # Index du contrôle de blocage et de la purge des anciennes tentatives
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_login_attempts_lookup ON login_attempts (username, success, attempt_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_login_attempts_time ON login_attempts (attempt_time)')
+        
+        _create_label_search_index(cursor)
+        
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+# Index plein texte (FTS5, tokenizer trigram) sur les labels, synchronisé par triggers
+def _create_label_search_index(cursor):
+    if _has_label_search_index(cursor):
+        return
+    
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE passwords_fts 
+            USING fts5(label, content='passwords', content_rowid='id', tokenize='trigram')
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite compilé sans FTS5 ou trop ancien pour le tokenizer trigram : repli sur LIKE
+        return
     
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            salt TEXT NOT NULL
-        )
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+            INSERT INTO passwords_fts (rowid, label) VALUES (new.id, new.label);
+        END
     ''')
-    
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            label TEXT NOT NULL,
-            encrypted_password TEXT NOT NULL,
-            encryption_salt TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, label)
-        )
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, label) VALUES ('delete', old.id, old.label);
+        END
     ''')
-    
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS login_attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            attempt_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            success INTEGER NOT NULL
-        )
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_update AFTER UPDATE OF label ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, label) VALUES ('delete', old.id, old.label);
+            INSERT INTO passwords_fts (rowid, label) VALUES (new.id, new.label);
+        END
     ''')
     
-    conn.commit()
-    conn.close()
+    # Indexer les labels existants
+    cursor.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('rebuild')")
 
-# Fonction pour enregistrer un nouvel utilisateur
-def register_user(username, master_password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    salt = generate_salt()
-    password_hash = hash_master_password(master_password, salt)
-    
-    try:
+def _has_label_search_index(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'")
+    return cursor.fetchone() is not None
+
+def _add_column_if_missing(cursor, table, column, definition):
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+# Vider le cache des clés déverrouillées
+def clear_session_keys():
+    with _session_keys_lock:
+        _session_keys.clear()
+
+# Paramètres de dérivation appliqués aux comptes (choisis par --calibrate, sinon PBKDF2 historique)
+# Les réglages sont dans le catalogue si le stockage est partitionné
+def get_kdf_params():
+    result = get_db_connection(_catalog_path()).execute("SELECT value FROM settings WHERE key = 'kdf_params'").fetchone()
+    return json.loads(result[0]) if result else DEFAULT_KDF_PARAMS
+
+def set_kdf_params(kdf_params):
+    """Les comptes existants sont re-dérivés avec ces paramètres à leur prochaine connexion"""
+    with db_cursor(_catalog_path()) as cursor:
         cursor.execute(
-            'INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)',
-            (username, password_hash.decode(), base64.b64encode(salt).decode())
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('kdf_params', ?)",
+            (json.dumps(kdf_params),)
         )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
 
-# Fonction pour vérifier les informations de connexion de l'utilisateur
-def verify_user(username, master_password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Envelopper la clé de données avec une clé dérivée du master password selon kdf_params
+def _wrap_user_key(master_password, data_key, kdf_params):
+    """Retourne les colonnes (password_hash, salt, kdf_salt, wrapped_key, kdf_params) du compte.
+    Le vérificateur stocké dans password_hash dérive de la même clé : plus de SHA-256 rapide en base"""
+    kdf_salt = generate_salt()
+    wrapping_key = derive_key(master_password, kdf_salt, kdf_params)
+    encoded_salt = base64.b64encode(kdf_salt).decode()
+    return (master_password_verifier(wrapping_key).decode(), encoded_salt, encoded_salt,
+            wrap_data_key(data_key, wrapping_key).decode(), json.dumps(kdf_params))
+
+# Récupérer la clé de données de l'utilisateur (dérivation coûteuse une seule fois par session)
+def _get_data_key(cursor, username, master_password, upgrade=True):
+    """Retourne (user_id, clé de données) ; la clé vaut None si le master password est faux.
+    Crée la clé de données des comptes antérieurs à la hiérarchie de clés et re-dérive
+    l'enveloppe si les paramètres du compte diffèrent des paramètres calibrés (l'appelant commit).
+    upgrade=False : lecture seule, ces écritures sont remises au prochain appel qui les autorise"""
+    cursor.execute('SELECT id, password_hash, salt, kdf_salt, wrapped_key, kdf_params FROM users WHERE username = ?', (username,))
+    user = cursor.fetchone()
+    if not user:
+        return None, None
     
-    cursor.execute('SELECT password_hash, salt FROM users WHERE username = ?', (username,))
-    result = cursor.fetchone()
-    conn.close()
+    user_id, password_hash, salt, kdf_salt, wrapped_key, kdf_params = user
+    # La clé gardée n'est valable que pour l'enveloppe avec laquelle elle a été ouverte : après un
+    # --change-master (même dans un autre processus), l'ancien master password ne doit plus passer
+    cache_key = (username, hashlib.sha256(master_password.encode()).digest())
+    with _session_keys_lock:
+        cached = _session_keys.get(cache_key)
+        if cached is not None and cached[0] != wrapped_key:
+            _session_keys.pop(cache_key, None)
+            cached = None
     
-    if not result:
-        return False
+    if cached is not None:
+        data_key = cached[1]
+        if cached[2] or not upgrade:
+            return user_id, data_key
+    elif wrapped_key is None:
+        # Compte existant sans clé de données : vérifier le master password puis en créer une
+        if hash_master_password(master_password, base64.b64decode(salt)).decode() != password_hash:
+            return user_id, None
+        data_key = generate_data_key()
+    else:
+        user_kdf_params = json.loads(kdf_params) if kdf_params else DEFAULT_KDF_PARAMS
+        wrapping_key = derive_key(master_password, base64.b64decode(kdf_salt), user_kdf_params)
+        data_key = unwrap_data_key(wrapped_key, wrapping_key)
+        if data_key is None:
+            return user_id, None
     
-    stored_hash, stored_salt = result
-    salt = base64.b64decode(stored_salt)
-    computed_hash = hash_master_password(master_password, salt)
+    # Re-dérivation transparente : la clé de données ne change pas, seule son enveloppe est refaite
+    upgraded = True
+    target_kdf_params = get_kdf_params()
+    if kdf_params is None or json.loads(kdf_params) != target_kdf_params:
+        if upgrade:
+            user_columns = _wrap_user_key(master_password, data_key, target_kdf_params)
+            cursor.execute(
+                'UPDATE users SET password_hash = ?, salt = ?, kdf_salt = ?, wrapped_key = ?, kdf_params = ? WHERE id = ?',
+                user_columns + (user_id,)
+            )
+            wrapped_key = user_columns[3]
+        else:
+            upgraded = False
     
-    return computed_hash.decode() == stored_hash
+    # Compte sans clé de données en lecture seule : la clé générée n'est pas enregistrée, donc pas gardée
+    if wrapped_key is not None:
+        with _session_keys_lock:
+            _session_keys[cache_key] = (wrapped_key, data_key, upgraded)
+    return user_id, data_key
 
-# Fonction pour ajouter un mot de passe chiffré
-def add_password(username, label, password, master_password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Chiffrer un mot de passe avec une clé d'entrée dérivée de la clé de données
+def _encrypt_entry(password, data_key, fingerprint_key=None):
+    """Retourne (mot de passe chiffré, sel de l'entrée, empreinte), chiffré et sel en octets bruts (BLOB)"""
+    if fingerprint_key is None:
+        fingerprint_key = derive_fingerprint_key(data_key)
+    return encrypt_entry(password, data_key, fingerprint_key)
+
+# Les sels des entrées au format v1 sont stockés en base64
+def _salt_bytes(encryption_salt):
+    return base64.b64decode(encryption_salt) if isinstance(encryption_salt, str) else encryption_salt
+
+# Déchiffrer une entrée, en migrant les entrées héritées vers la clé de données
+def _decrypt_entry(cursor, password_id, encrypted_password, encryption_salt, key_version, master_password, data_key, migrate=True):
+    """migrate=False : lecture seule, l'entrée héritée est laissée telle quelle"""
+    encryption_salt = _salt_bytes(encryption_salt)
+    if key_version == KEY_VERSION_DATA_KEY:
+        password = decrypt_password(encrypted_password, derive_entry_key(data_key, encryption_salt))
+        if is_ciphertext_v2(encrypted_password):
+            return password
+    else:
+        # Entrée héritée : dernier PBKDF2 pour cette entrée
+        password = decrypt_legacy_entry(encrypted_password, encryption_salt, master_password)
     
-    cursor.execute('SELECT id, salt FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    if not user:
-        conn.close()
-        return False
+    if not migrate:
+        return password
     
-    user_id, stored_salt = user
-    salt = base64.b64decode(stored_salt)
+    # Re-chiffrement au format v2 avec la clé de données (l'appelant commit)
+    new_encrypted_password, new_encryption_salt, fingerprint = _encrypt_entry(password, data_key)
+    cursor.execute(
+        'UPDATE passwords SET encrypted_password = ?, encryption_salt = ?, key_version = ?, fingerprint = ?, rotated_password = NULL WHERE id = ?',
+        (new_encrypted_password, new_encryption_salt, KEY_VERSION_DATA_KEY, fingerprint, password_id)
+    )
+    return password
+
+# Calculer les empreintes manquantes (entrées créées avant la colonne fingerprint)
+def _backfill_fingerprints(cursor, user_id, master_password, data_key):
+    cursor.execute('''
+        SELECT id, encrypted_password, encryption_salt, key_version 
+        FROM passwords 
+        WHERE user_id = ? AND fingerprint IS NULL
+    ''', (user_id,))
     
-    encryption_salt = generate_salt()
-    aes_key = derive_aes_key(master_password, encryption_salt)
-    encrypted_password = encrypt_password(password, aes_key)
+    entries = cursor.fetchall()
+    legacy = [entry for entry in entries if entry[3] != KEY_VERSION_DATA_KEY]
+    current = [entry for entry in entries if entry[3] == KEY_VERSION_DATA_KEY]
+    fingerprint_key = derive_fingerprint_key(data_key)
     
-    try:
+    # Entrées héritées : les PBKDF2 sont répartis sur le pool de processus (--workers)
+    passwords = parallel_map(
+        decrypt_legacy_entry,
+        [encrypted_password for _, encrypted_password, _, _ in legacy],
+        [_salt_bytes(encryption_salt) for _, _, encryption_salt, _ in legacy],
+        repeat(master_password)
+    )
+    new_entries = parallel_map(encrypt_entry, passwords, repeat(data_key), repeat(fingerprint_key))
+    cursor.executemany(
+        'UPDATE passwords SET encrypted_password = ?, encryption_salt = ?, key_version = ?, fingerprint = ?, rotated_password = NULL WHERE id = ?',
+        [(encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint, entry[0])
+         for entry, (encrypted_password, encryption_salt, fingerprint) in zip(legacy, new_entries)]
+    )
+    
+    for entry in current:
+        password = _decrypt_entry(cursor, *entry, master_password, data_key)
         cursor.execute(
-            'INSERT INTO passwords (user_id, label, encrypted_password, encryption_salt) VALUES (?, ?, ?, ?)',
-            (user_id, label, encrypted_password.decode(), base64.b64encode(encryption_salt).decode())
+            'UPDATE passwords SET fingerprint = ? WHERE id = ?',
+            (fingerprint_password(password, fingerprint_key), entry[0])
         )
-        conn.commit()
-        conn.close()
+
+# Clé de données d'un nouveau compte, enveloppée par une clé dérivée du master password
+def prepare_user_keys(master_password):
+    """Partie coûteuse de l'inscription (KDF), faite hors transaction ; à passer à insert_user"""
+    return _wrap_user_key(master_password, generate_data_key(), get_kdf_params())
+
+def insert_user(username, user_columns):
+    shard_path = _shard_path(username)
+    if is_sharded():
+        # Le catalogue garantit l'unicité du nom sur l'ensemble des partitions
+        try:
+            with db_cursor(_catalog_path()) as cursor:
+                cursor.execute('INSERT INTO user_shards (username, shard) VALUES (?, ?)', (username, os.path.basename(shard_path)))
+        except sqlite3.IntegrityError:
+            return False
+    
+    try:
+        with db_cursor(shard_path) as cursor:
+            cursor.execute(
+                'INSERT INTO users (username, password_hash, salt, kdf_salt, wrapped_key, kdf_params) VALUES (?, ?, ?, ?, ?, ?)',
+                (username,) + user_columns
+            )
         return True
     except sqlite3.IntegrityError:
-        conn.close()
+        _release_user_name(username)
         return False
+    except BaseException:
+        _release_user_name(username)
+        raise
+
+# Partition non écrite : libérer le nom réservé au catalogue, sinon il bloquerait toute
+# nouvelle inscription sous ce nom
+def _release_user_name(username):
+    if not is_sharded():
+        return
+    with db_cursor(_catalog_path()) as cursor:
+        cursor.execute('DELETE FROM user_shards WHERE username = ?', (username,))
+    _user_shards.pop(username, None)
+
+# Fonction pour enregistrer un nouvel utilisateur
+def register_user(username, master_password):
+    return insert_user(username, prepare_user_keys(master_password))
+
+# Fonction pour vérifier les informations de connexion de l'utilisateur
+def verify_user(username, master_password, upgrade=True):
+    """Le master password est vérifié en déverrouillant la clé de données, gardée pour la session.
+    upgrade=False : aucune écriture (voir _get_data_key)"""
+    with db_cursor(_shard_path(username)) as cursor:
+        _, data_key = _get_data_key(cursor, username, master_password, upgrade)
+        return data_key is not None
+
+# Fonction pour ajouter un mot de passe chiffré
+def add_password(username, label, password, master_password):
+    with db_cursor(_shard_path(username)) as cursor:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return False
+    
+        encrypted_password, encryption_salt, fingerprint = _encrypt_entry(password, data_key)
+    
+        try:
+            cursor.execute(
+                'INSERT INTO passwords (user_id, label, encrypted_password, encryption_salt, key_version, fingerprint, updated_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)',
+                (user_id, label, encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint)
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
 
 # Fonction pour récupérer et déchiffrer un mot de passe
-def get_password(username, label, master_password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def get_password(username, label, master_password, migrate=True):
+    """migrate=False : lecture seule, sans migration de l'entrée ni re-dérivation de l'enveloppe"""
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('''
+            SELECT p.id, p.encrypted_password, p.encryption_salt, p.key_version 
+            FROM passwords p 
+            JOIN users u ON p.user_id = u.id 
+            WHERE u.username = ? AND p.label = ?
+        ''', (username, label))
     
-    cursor.execute('''
-        SELECT p.encrypted_password, p.encryption_salt 
-        FROM passwords p 
-        JOIN users u ON p.user_id = u.id 
-        WHERE u.username = ? AND p.label = ?
-    ''', (username, label))
+        result = cursor.fetchone()
+        if not result:
+            return None
+    
+        user_id, data_key = _get_data_key(cursor, username, master_password, migrate)
+        if data_key is None:
+            return None
+    
+        password = _decrypt_entry(cursor, *result, master_password, data_key, migrate)
+    
+        return password
+
+# Un label contenant *, ? ou [ est traité comme un motif glob, sauf si un label identique existe
+# (« key[prod] » reste accessible tel quel)
+def is_label_pattern(label):
+    return any(char in label for char in '*?[')
+
+# Condition SQL d'un motif sur la table passwords (paramètres : motif, user_id, motif, motif)
+_LABEL_PATTERN_CONDITION = '''label = ? OR (NOT EXISTS (SELECT 1 FROM passwords exact WHERE exact.user_id = ? AND exact.label = ?)
+                                AND label GLOB ?)'''
+
+# Récupérer et déchiffrer plusieurs labels (ou motifs glob) en une seule requête
+def get_passwords(username, labels_or_pattern, master_password):
+    """Génère les tuples (label, mot de passe) triés par label.
+    labels_or_pattern est un label, un motif glob (ex: 'prod-*') ou une liste des deux"""
+    if isinstance(labels_or_pattern, str):
+        labels_or_pattern = [labels_or_pattern]
+    labels = [label for label in labels_or_pattern if not is_label_pattern(label)]
+    patterns = [label for label in labels_or_pattern if is_label_pattern(label)]
+    if not labels and not patterns:
+        return
     
-    result = cursor.fetchone()
-    conn.close()
+    with db_cursor(_shard_path(username)) as cursor:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return
+        
+        conditions = []
+        params = [user_id]
+        if labels:
+            conditions.append(f"label IN ({','.join('?' * len(labels))})")
+            params.extend(labels)
+        for pattern in patterns:
+            conditions.append(_LABEL_PATTERN_CONDITION)
+            params.extend((pattern, user_id, pattern, pattern))
+        
+        # Requête indexée sur (user_id, label), lue par blocs pour ne pas tout charger
+        rows = get_db_connection(_shard_path(username)).cursor()
+        try:
+            rows.execute(f'''
+                SELECT label, id, encrypted_password, encryption_salt, key_version 
+                FROM passwords 
+                WHERE user_id = ? AND ({' OR '.join(conditions)})
+                ORDER BY label
+            ''', params)
+            
+            while True:
+                chunk = rows.fetchmany(256)
+                if not chunk:
+                    break
+                for label, *entry in chunk:
+                    yield label, _decrypt_entry(cursor, *entry, master_password, data_key)
+        finally:
+            rows.close()
+
+# Lire tout le coffre en une passe pour l'audit, sans migrer ni modifier les entrées
+def iter_vault_entries(username, master_password, chunk_size=500):
+    """Génère (label, mot de passe, date du dernier changement ou None) pour chaque entrée.
+    Les entrées sont lues par blocs et chaque bloc est déchiffré sur le pool de processus
+    si --workers > 1. Ne génère rien si le master password est invalide"""
+    with db_cursor(_shard_path(username)) as cursor:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return
+        
+        cursor.execute('''
+            SELECT label, encrypted_password, encryption_salt, key_version, updated_at 
+            FROM passwords 
+            WHERE user_id = ? 
+            ORDER BY label
+        ''', (user_id,))
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            passwords = parallel_map(
+                decrypt_entry,
+                [encrypted_password for _, encrypted_password, _, _, _ in chunk],
+                [_salt_bytes(encryption_salt) for _, _, encryption_salt, _, _ in chunk],
+                repeat(data_key),
+                [None if key_version == KEY_VERSION_DATA_KEY else master_password for _, _, _, key_version, _ in chunk]
+            )
+            for (label, _, _, _, updated_at), password in zip(chunk, passwords):
+                yield label, password, updated_at
+
+# Similarité minimale (difflib) d'une correspondance approchée
+FUZZY_MIN_SIMILARITY = 0.5
+
+# Labels d'un utilisateur examinés au plus par le calcul de distance sans index (recherche avec -u)
+FUZZY_SCAN_LIMIT = 2000
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Trigrammes des variantes de la requête à deux caractères voisins inversés : la faute de frappe
+# la plus courante (« gihtub ») ne partage souvent aucun trigramme avec le label
+def _transposition_trigrams(query):
+    return set().union(*(_trigrams(query[:i] + query[i + 1] + query[i] + query[i + 2:]) for i in range(len(query) - 1)))
+
+# Fautes de frappe tolérées (distance de Damerau-Levenshtein) : 1 jusqu'à 5 caractères, 2 au-delà
+def _max_edit_distance(query):
+    return 1 if len(query) <= 5 else 2
+
+# Distance de Damerau-Levenshtein (transpositions adjacentes), bornée : max_distance + 1 dès que
+# toute la ligne de la matrice dépasse la borne
+def _edit_distance(a, b, max_distance):
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_row[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_row, row = row, current
+    return min(row[-1], max_distance + 1)
+
+# Distance d'un label à la requête : le label entier ou son début (« gihtub » trouve « github.com »)
+def _label_distance(query, label, max_distance):
+    # Chaque opération corrige au plus un caractère de la requête absent du label : rejet sans calcul
+    window = label[:len(query) + max_distance]
+    if len(set(query).difference(window)) > max_distance or sum(max(0, query.count(char) - window.count(char)) for char in set(query)) > max_distance:
+        return max_distance + 1
+    return min(_edit_distance(query, label, max_distance), _edit_distance(query, label[:len(query)], max_distance))
+
+# Échapper les jokers de LIKE
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Rechercher des labels : sous-chaîne et préfixe via FTS5, puis correspondances approchées
+def search_labels(query, username=None, limit=20):
+    """Retourne au plus limit tuples (username, label), les labels commençant par la
+    requête en premier, puis par pertinence (bm25), puis les correspondances approchées"""
+    query = query.strip()
+    if not query:
+        return []
     
-    if not result:
-        return None
+    paths = [_shard_path(username)] if username else _existing_shard_paths()
+    if len(paths) == 1:
+        return _search_shard_labels(paths[0], query, username, limit)
     
-    encrypted_password, encryption_salt = result
-    encryption_salt = base64.b64decode(encryption_salt)
-    aes_key = derive_aes_key(master_password, encryption_salt)
+    # Stockage partitionné : meilleurs résultats de chaque partition, reclassés ensemble
+    results = [row for path in paths for row in _search_shard_labels(path, query, username, limit)]
+    results.sort(key=lambda row: _label_rank(query, row[1]))
+    return results[:limit]
+
+# Préfixe, puis sous-chaîne, puis distance d'édition croissante et similarité décroissante
+def _label_rank(query, label):
+    query, label = query.lower(), label.lower()
+    if label.startswith(query):
+        return 0, len(label), label
+    if query in label:
+        return 1, len(label), label
+    return 2, _label_distance(query, label, _max_edit_distance(query)), -difflib.SequenceMatcher(None, query, label).ratio(), label
+
+def _search_shard_labels(path, query, username, limit):
+    user_filter = 'AND u.username = ?' if username else ''
+    user_params = [username] if username else []
+    prefix = _escape_like(query) + '%'
     
-    return decrypt_password(encrypted_password, aes_key)
+    with db_cursor(path) as cursor:
+        # Le tokenizer trigram ne sait pas chercher moins de 3 caractères
+        if len(query) < 3 or not _has_label_search_index(cursor):
+            cursor.execute(f'''
+                SELECT u.username, p.label 
+                FROM passwords p 
+                JOIN users u ON p.user_id = u.id 
+                WHERE p.label LIKE ? ESCAPE '\\' {user_filter}
+                ORDER BY (p.label LIKE ? ESCAPE '\\') DESC, length(p.label), p.label
+                LIMIT ?
+            ''', ['%' + _escape_like(query) + '%'] + user_params + [prefix, limit])
+            return cursor.fetchall()
+        
+        # Sous-chaîne exacte (insensible à la casse)
+        phrase = '"' + query.replace('"', '""') + '"'
+        cursor.execute(f'''
+            SELECT u.username, p.label 
+            FROM passwords_fts f 
+            JOIN passwords p ON p.id = f.rowid 
+            JOIN users u ON p.user_id = u.id 
+            WHERE passwords_fts MATCH ? {user_filter}
+            ORDER BY (p.label LIKE ? ESCAPE '\\') DESC, f.rank, p.label
+            LIMIT ?
+        ''', [phrase] + user_params + [prefix, limit])
+        results = cursor.fetchall()
+        if len(results) >= limit:
+            return results
+        
+        # Correspondances approchées : labels partageant des trigrammes, reclassés par distance
+        # d'édition puis par similarité
+        lowered = query.lower()
+        
+        def trigram_rows(trigrams):
+            cursor.execute(f'''
+                SELECT u.username, p.label 
+                FROM passwords_fts f 
+                JOIN passwords p ON p.id = f.rowid 
+                JOIN users u ON p.user_id = u.id 
+                WHERE passwords_fts MATCH ? {user_filter}
+                ORDER BY f.rank
+                LIMIT ?
+            ''', [' OR '.join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)] + user_params + [limit * 5])
+            return cursor.fetchall()
+        
+        max_distance = _max_edit_distance(lowered)
+        found = set(results)
+        candidates = {}
+        
+        def consider(rows, scanned):
+            for row in rows:
+                if row in found or row in candidates:
+                    continue
+                label = row[1].lower()
+                distance = _label_distance(lowered, label, max_distance)
+                if scanned and distance > max_distance:
+                    continue
+                similarity = difflib.SequenceMatcher(None, lowered, label).ratio()
+                if distance <= max_distance or similarity >= FUZZY_MIN_SIMILARITY:
+                    candidates[row] = (distance, -similarity, row[1])
+        
+        def missing_close_matches():
+            return sum(rank[0] <= max_distance for rank in candidates.values()) < limit - len(results)
+        
+        trigrams = _trigrams(lowered)
+        consider(trigram_rows(trigrams), False)
+        # Variantes à transposition, interrogées seulement si la requête telle quelle ne suffit pas
+        transposed = _transposition_trigrams(lowered) - trigrams
+        if transposed and missing_close_matches():
+            consider(trigram_rows(transposed), False)
+        if username and missing_close_matches():
+            # Autres fautes sans trigramme commun : distance bornée sur un nombre limité de labels
+            # de l'utilisateur (jamais sur toute la partition)
+            cursor.execute('''
+                SELECT u.username, p.label 
+                FROM passwords p 
+                JOIN users u ON p.user_id = u.id 
+                WHERE u.username = ? AND length(p.label) >= ?
+                LIMIT ?
+            ''', (username, len(query) - max_distance, FUZZY_SCAN_LIMIT))
+            consider(cursor.fetchall(), True)
+        
+        ranked = sorted(candidates, key=candidates.get)
+        return results + ranked[:limit - len(results)]
 
 # Modifier un mot de passe existant
 def update_password(username, label, new_password, master_password):
     """Met à jour le mot de passe d'un label existant"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_cursor(_shard_path(username)) as cursor:
+        # Vérifier que l'utilisateur et le label existent
+        cursor.execute('''
+            SELECT p.id 
+            FROM passwords p 
+            JOIN users u ON p.user_id = u.id 
+            WHERE u.username = ? AND p.label = ?
+        ''', (username, label))
     
-    # Vérifier que l'utilisateur et le label existent
-    cursor.execute('''
-        SELECT p.id 
-        FROM passwords p 
-        JOIN users u ON p.user_id = u.id 
-        WHERE u.username = ? AND p.label = ?
-    ''', (username, label))
-    
-    result = cursor.fetchone()
-    if not result:
-        conn.close()
-        return False
+        result = cursor.fetchone()
+        if not result:
+            return False
     
-    password_id = result[0]
+        password_id = result[0]
     
-    # Générer une nouvelle clé AES et chiffrer le nouveau mot de passe
-    encryption_salt = generate_salt()
-    aes_key = derive_aes_key(master_password, encryption_salt)
-    encrypted_password = encrypt_password(new_password, aes_key)
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return False
     
-    cursor.execute(
-        'UPDATE passwords SET encrypted_password = ?, encryption_salt = ? WHERE id = ?',
-        (encrypted_password.decode(), base64.b64encode(encryption_salt).decode(), password_id)
-    )
-    conn.commit()
-    conn.close()
-    return True
+        # Chiffrer le nouveau mot de passe avec une nouvelle clé d'entrée
+        encrypted_password, encryption_salt, fingerprint = _encrypt_entry(new_password, data_key)
+    
+        cursor.execute(
+            'UPDATE passwords SET encrypted_password = ?, encryption_salt = ?, key_version = ?, fingerprint = ?, rotated_password = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint, password_id)
+        )
+        return True
 
 # Vérifier si un mot de passe existe déjà pour un autre label
 def check_password_reuse(username, new_password, master_password, exclude_label=None):
     """Vérifie si le mot de passe est déjà utilisé pour un autre label
     Retourne la liste des labels qui utilisent ce mot de passe"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_cursor(_shard_path(username)) as cursor:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return []
     
-    cursor.execute('''
-        SELECT p.label, p.encrypted_password, p.encryption_salt 
-        FROM passwords p 
-        JOIN users u ON p.user_id = u.id 
-        WHERE u.username = ?
-    ''', (username,))
+        _backfill_fingerprints(cursor, user_id, master_password, data_key)
     
-    results = cursor.fetchall()
-    conn.close()
+        # Recherche indexée sur (user_id, fingerprint)
+        fingerprint = fingerprint_password(new_password, derive_fingerprint_key(data_key))
+        cursor.execute('''
+            SELECT label 
+            FROM passwords 
+            WHERE user_id = ? AND fingerprint = ? AND label IS NOT ?
+            ORDER BY label
+        ''', (user_id, fingerprint, exclude_label))
     
-    duplicate_labels = []
+        duplicate_labels = [row[0] for row in cursor.fetchall()]
+        return duplicate_labels
+
+# Dernière ligne importée (et commitée) d'un fichier, pour reprendre un import interrompu
+def get_import_checkpoint(username, source):
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('''
+            SELECT c.last_line 
+            FROM import_checkpoints c 
+            JOIN users u ON c.user_id = u.id 
+            WHERE u.username = ? AND c.source = ?
+        ''', (username, source))
     
-    for label, encrypted_password, encryption_salt in results:
-        # Exclure le label actuel si on modifie un mot de passe
-        if exclude_label and label == exclude_label:
-            continue
+        result = cursor.fetchone()
+    
+        return result[0] if result else 0
+
+# Import en masse : une transaction par lot, commit et point de reprise tous les batch_size lignes
+def bulk_add_passwords(username, rows, master_password, skip_duplicates=False, batch_size=500, source=None, resume=False):
+    """Importe un flux de tuples (label, password, line_num).
+    Génère un tuple (line_num, label, statut, labels_réutilisés) par ligne, statut parmi
+    'added', 'exists' (label déjà présent) et 'reused' (mot de passe déjà utilisé)"""
+    conn = get_db_connection(_shard_path(username))
+    cursor = conn.cursor()
+    
+    try:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return
+        
+        fingerprint_key = derive_fingerprint_key(data_key)
+        if not skip_duplicates:
+            _backfill_fingerprints(cursor, user_id, master_password, data_key)
+        conn.commit()
+        
+        start_line = 0
+        if resume and source:
+            cursor.execute('SELECT last_line FROM import_checkpoints WHERE user_id = ? AND source = ?', (user_id, source))
+            result = cursor.fetchone()
+            start_line = result[0] if result else 0
+        
+        # Déduplication dans le fichier lui-même
+        seen_labels = set()
+        seen_fingerprints = {}
+        
+        rows = (row for row in rows if row[2] > start_line)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
             
-        encryption_salt = base64.b64decode(encryption_salt)
-        aes_key = derive_aes_key(master_password, encryption_salt)
-        stored_password = decrypt_password(encrypted_password, aes_key)
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(
+                f'SELECT label FROM passwords WHERE user_id = ? AND label IN ({placeholders})',
+                [user_id] + [label for label, _, _ in batch]
+            )
+            existing_labels = {row[0] for row in cursor.fetchall()}
+            
+            fingerprints = [fingerprint_password(password, fingerprint_key) for _, password, _ in batch]
+            existing_fingerprints = {}
+            if not skip_duplicates:
+                cursor.execute(
+                    f'SELECT fingerprint, label FROM passwords WHERE user_id = ? AND fingerprint IN ({placeholders})',
+                    [user_id] + fingerprints
+                )
+                for fingerprint, label in cursor.fetchall():
+                    existing_fingerprints.setdefault(fingerprint, []).append(label)
+            
+            results = []
+            accepted = []
+            for (label, password, line_num), fingerprint in zip(batch, fingerprints):
+                if label in existing_labels or label in seen_labels:
+                    results.append((line_num, label, 'exists', None))
+                    continue
+                
+                if not skip_duplicates:
+                    reused = existing_fingerprints.get(fingerprint, []) + seen_fingerprints.get(fingerprint, [])
+                    if reused:
+                        results.append((line_num, label, 'reused', reused))
+                        continue
+                
+                accepted.append((label, password))
+                seen_labels.add(label)
+                seen_fingerprints.setdefault(fingerprint, []).append(label)
+                results.append((line_num, label, 'added', None))
+            
+            # Chiffrement du lot, réparti sur le pool de processus si --workers > 1
+            encrypted = parallel_map(encrypt_entry, [password for _, password in accepted], repeat(data_key), repeat(fingerprint_key))
+            new_rows = [
+                (user_id, label, encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint)
+                for (label, _), (encrypted_password, encryption_salt, fingerprint) in zip(accepted, encrypted)
+            ]
+            cursor.executemany(
+                'INSERT INTO passwords (user_id, label, encrypted_password, encryption_salt, key_version, fingerprint, updated_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)',
+                new_rows
+            )
+            if source:
+                cursor.execute(
+                    'INSERT OR REPLACE INTO import_checkpoints (user_id, source, last_line) VALUES (?, ?, ?)',
+                    (user_id, source, batch[-1][2])
+                )
+            conn.commit()
+            
+            yield from results
         
-        if stored_password == new_password:
-            duplicate_labels.append(label)
+        # Import terminé : le point de reprise n'est plus utile
+        if source:
+            cursor.execute('DELETE FROM import_checkpoints WHERE user_id = ? AND source = ?', (user_id, source))
+            conn.commit()
+    finally:
+        # Un lot interrompu est annulé ; les lots précédents restent validés
+        conn.rollback()
+        cursor.close()
+
+# Opérations acceptées par execute_batch
+BATCH_OPERATIONS = ('add', 'modify', 'show', 'delete', 'import-row')
+
+# Exécuter un flux de commandes (--batch) avec un seul déverrouillage, une transaction par lot
+def execute_batch(username, commands, master_password, batch_size=500, skip_duplicates=False):
+    """commands : flux de tuples (line_num, commande), la commande étant un dict
+    {"op", "label", "password", "labels", "force"} ou None si la ligne n'est pas du JSON valide.
+    Génère (line_num, réponse) après le commit de chaque lot, avec les réponses et codes d'erreur
+    de l'agent. Une commande en erreur n'annule pas les autres commandes du lot.
+    Ne génère rien si le master password est invalide"""
+    conn = get_db_connection(_shard_path(username))
+    cursor = conn.cursor()
+    
+    try:
+        user_id, data_key = _get_data_key(cursor, username, master_password)
+        if data_key is None:
+            return
+        
+        fingerprint_key = derive_fingerprint_key(data_key)
+        _backfill_fingerprints(cursor, user_id, master_password, data_key)
+        conn.commit()
+        
+        commands = iter(commands)
+        while True:
+            batch = list(islice(commands, batch_size))
+            if not batch:
+                break
+            
+            results = []
+            for line_num, command in batch:
+                try:
+                    response = _execute_command(cursor, user_id, data_key, fingerprint_key, master_password, command, skip_duplicates)
+                except Exception as e:
+                    response = {'ok': False, 'error': 'internal', 'message': str(e)}
+                results.append((line_num, response))
+            conn.commit()
+            
+            yield from results
+    finally:
+        # Un lot interrompu est annulé ; les lots précédents restent validés
+        conn.rollback()
+        cursor.close()
+
+# Une commande de execute_batch, dans la transaction du lot
+def _execute_command(cursor, user_id, data_key, fingerprint_key, master_password, command, skip_duplicates):
+    if command is None:
+        return {'ok': False, 'error': 'invalid_json'}
+    if not isinstance(command, dict):
+        return {'ok': False, 'error': 'invalid_command'}
+    
+    op = command.get('op')
+    label = command.get('label')
+    password = command.get('password')
+    labels = command.get('labels')
+    if op not in BATCH_OPERATIONS:
+        return {'ok': False, 'error': 'unknown_op'}
+    if op == 'show' and labels is not None:
+        if not isinstance(labels, list) or not all(isinstance(item, str) for item in labels):
+            return {'ok': False, 'error': 'invalid_command'}
+    elif not isinstance(label, str):
+        return {'ok': False, 'error': 'invalid_command'}
+    if op in ('add', 'modify', 'import-row') and not isinstance(password, str):
+        return {'ok': False, 'error': 'invalid_command'}
+    
+    if op == 'show':
+        # Labels et motifs glob, comme get_passwords
+        requested = labels if labels is not None else [label]
+        if not requested:
+            return {'ok': True, 'entries': []}
+        conditions = ' OR '.join(f'({_LABEL_PATTERN_CONDITION})' if is_label_pattern(item) else 'label = ?' for item in requested)
+        params = [param for item in requested for param in ((item, user_id, item, item) if is_label_pattern(item) else (item,))]
+        cursor.execute(f'''
+            SELECT label, id, encrypted_password, encryption_salt, key_version
+            FROM passwords
+            WHERE user_id = ? AND ({conditions})
+            ORDER BY label
+        ''', [user_id] + params)
+        entries = [{'label': found, 'password': _decrypt_entry(cursor, *entry, master_password, data_key)}
+                   for found, *entry in cursor.fetchall()]
+        if labels is not None:
+            return {'ok': True, 'entries': entries}
+        if not entries:
+            return {'ok': False, 'error': 'not_found'}
+        return {'ok': True, 'password': entries[0]['password']}
+    
+    if op == 'delete':
+        cursor.execute('DELETE FROM passwords WHERE user_id = ? AND label = ?', (user_id, label))
+        if cursor.rowcount == 0:
+            return {'ok': False, 'error': 'not_found'}
+        return {'ok': True}
+    
+    password_id = None
+    if op == 'modify':
+        cursor.execute('SELECT id FROM passwords WHERE user_id = ? AND label = ?', (user_id, label))
+        result = cursor.fetchone()
+        if not result:
+            return {'ok': False, 'error': 'not_found'}
+        password_id = result[0]
+    
+    # add, modify et import-row : même vérification de réutilisation que la CLI
+    # (force pour add/modify, --skip-duplicates pour import-row comme pour -i)
+    check_reuse = not skip_duplicates if op == 'import-row' else not command.get('force')
+    if check_reuse:
+        cursor.execute('''
+            SELECT label
+            FROM passwords
+            WHERE user_id = ? AND fingerprint = ? AND label IS NOT ?
+            ORDER BY label
+        ''', (user_id, fingerprint_password(password, fingerprint_key), label if op == 'modify' else None))
+        duplicate_labels = [row[0] for row in cursor.fetchall()]
+        if duplicate_labels:
+            return {'ok': False, 'error': 'reused', 'labels': duplicate_labels}
+    
+    encrypted_password, encryption_salt, fingerprint = encrypt_entry(password, data_key, fingerprint_key)
+    if op == 'modify':
+        cursor.execute(
+            'UPDATE passwords SET encrypted_password = ?, encryption_salt = ?, key_version = ?, fingerprint = ?, rotated_password = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint, password_id)
+        )
+        return {'ok': True}
+    
+    try:
+        cursor.execute(
+            'INSERT INTO passwords (user_id, label, encrypted_password, encryption_salt, key_version, fingerprint, updated_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)',
+            (user_id, label, encrypted_password, encryption_salt, KEY_VERSION_DATA_KEY, fingerprint)
+        )
+    except sqlite3.IntegrityError:
+        return {'ok': False, 'error': 'exists'}
+    return {'ok': True}
+
+# Changement de master password interrompu à reprendre ?
+def has_pending_master_change(username):
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('''
+            SELECT 1 
+            FROM key_rotations r 
+            JOIN users u ON r.user_id = u.id 
+            WHERE u.username = ?
+        ''', (username,))
+        return cursor.fetchone() is not None
+
+# Changer le master password : nouvelle clé de données et re-chiffrement de toutes les entrées
+def change_master_password(username, old_master_password, new_master_password, batch_size=500):
+    """Génère (entrées re-chiffrées, total) après chaque lot commité.
+    Les entrées re-chiffrées sont préparées dans les colonnes rotated_* : le coffre reste lisible
+    avec l'ancien master password jusqu'à la bascule finale, faite en une seule transaction.
+    La nouvelle clé de données est enveloppée par l'ancienne (table key_rotations) ; un changement
+    interrompu reprend au premier lot non commité avec l'ancien master password.
+    Ne génère rien si l'ancien master password est invalide"""
+    conn = get_db_connection(_shard_path(username))
+    cursor = conn.cursor()
     
-    return duplicate_labels
+    try:
+        user_id, old_data_key = _get_data_key(cursor, username, old_master_password)
+        if old_data_key is None:
+            return
+        
+        cursor.execute('SELECT wrapped_key FROM key_rotations WHERE user_id = ?', (user_id,))
+        result = cursor.fetchone()
+        if result:
+            new_data_key = unwrap_data_key(result[0], old_data_key)
+        else:
+            new_data_key = generate_data_key()
+            cursor.execute(
+                'INSERT INTO key_rotations (user_id, wrapped_key) VALUES (?, ?)',
+                (user_id, wrap_data_key(new_data_key, old_data_key).decode())
+            )
+        conn.commit()
+        
+        fingerprint_key = derive_fingerprint_key(new_data_key)
+        # Dérivation du nouveau master password hors de la transaction finale
+        new_user_columns = _wrap_user_key(new_master_password, new_data_key, get_kdf_params())
+        
+        cursor.execute('SELECT COUNT(*), COUNT(rotated_password) FROM passwords WHERE user_id = ?', (user_id,))
+        total, done = cursor.fetchone()
+        yield done, total
+        
+        while True:
+            cursor.execute('''
+                SELECT id, encrypted_password, encryption_salt, key_version 
+                FROM passwords 
+                WHERE user_id = ? AND rotated_password IS NULL 
+                LIMIT ?
+            ''', (user_id, batch_size))
+            batch = cursor.fetchall()
+            
+            if batch:
+                # Déchiffrement et chiffrement du lot, répartis sur le pool de processus si --workers > 1
+                reencrypted = parallel_map(
+                    reencrypt_entry,
+                    [encrypted_password for _, encrypted_password, _, _ in batch],
+                    [_salt_bytes(encryption_salt) for _, _, encryption_salt, _ in batch],
+                    repeat(old_data_key),
+                    repeat(new_data_key),
+                    repeat(fingerprint_key),
+                    [None if key_version == KEY_VERSION_DATA_KEY else old_master_password for _, _, _, key_version in batch]
+                )
+                cursor.executemany(
+                    'UPDATE passwords SET rotated_password = ?, rotated_salt = ?, rotated_fingerprint = ? WHERE id = ?',
+                    [(encrypted_password, encryption_salt, fingerprint, entry[0])
+                     for entry, (encrypted_password, encryption_salt, fingerprint) in zip(batch, reencrypted)]
+                )
+                conn.commit()
+                done += len(batch)
+                yield done, max(total, done)
+                continue
+            
+            # Bascule : verrou d'écriture pris avant la dernière vérification, pour qu'aucune
+            # entrée ajoutée ou modifiée entre-temps ne reste chiffrée avec l'ancienne clé
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT 1 FROM passwords WHERE user_id = ? AND rotated_password IS NULL LIMIT 1', (user_id,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+            
+            cursor.execute('''
+                UPDATE passwords 
+                SET encrypted_password = rotated_password, encryption_salt = rotated_salt, 
+                    fingerprint = rotated_fingerprint, key_version = ?, 
+                    rotated_password = NULL, rotated_salt = NULL, rotated_fingerprint = NULL 
+                WHERE user_id = ?
+            ''', (KEY_VERSION_DATA_KEY, user_id))
+            cursor.execute(
+                'UPDATE users SET password_hash = ?, salt = ?, kdf_salt = ?, wrapped_key = ?, kdf_params = ? WHERE id = ?',
+                new_user_columns + (user_id,)
+            )
+            cursor.execute('DELETE FROM key_rotations WHERE user_id = ?', (user_id,))
+            conn.commit()
+            break
+        
+        # L'ancienne clé de données ne doit plus servir
+        clear_session_keys()
+    finally:
+        # Un lot interrompu est annulé ; les lots précédents restent préparés
+        conn.rollback()
+        cursor.close()
 
 # Supprimer un label (et son mot de passe associé)
 def delete_password(username, label):
     """Supprime un mot de passe associé à un label"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        DELETE FROM passwords 
-        WHERE user_id = (SELECT id FROM users WHERE username = ?) 
-        AND label = ?
-    ''', (username, label))
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('''
+            DELETE FROM passwords 
+            WHERE user_id = (SELECT id FROM users WHERE username = ?) 
+            AND label = ?
+        ''', (username, label))
     
-    rows_deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
+        rows_deleted = cursor.rowcount
     
-    return rows_deleted > 0
+        return rows_deleted > 0
 
 # Supprimer un utilisateur et tous ses mots de passe
 def delete_user(username):
     """Supprime un utilisateur et tous ses mots de passe associés"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Récupérer l'ID de l'utilisateur
-        cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
+        with db_cursor(_shard_path(username)) as cursor:
+            # Récupérer l'ID de l'utilisateur
+            cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
+            user = cursor.fetchone()
         
-        if not user:
-            conn.close()
-            return False
+            if not user:
+                return False
         
-        user_id = user[0]
+            user_id = user[0]
         
-        # Supprimer tous les mots de passe de l'utilisateur
-        cursor.execute('DELETE FROM passwords WHERE user_id = ?', (user_id,))
+            # Supprimer tous les mots de passe de l'utilisateur
+            cursor.execute('DELETE FROM passwords WHERE user_id = ?', (user_id,))
         
-        # Supprimer les tentatives de connexion
-        cursor.execute('DELETE FROM login_attempts WHERE username = ?', (username,))
+            # Supprimer les points de reprise d'import
+            cursor.execute('DELETE FROM import_checkpoints WHERE user_id = ?', (user_id,))
+            
+            # Supprimer un changement de master password interrompu
+            cursor.execute('DELETE FROM key_rotations WHERE user_id = ?', (user_id,))
         
-        # Supprimer l'utilisateur
-        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            # Supprimer les tentatives de connexion
+            cursor.execute('DELETE FROM login_attempts WHERE username = ?', (username,))
+        
+            # Supprimer l'utilisateur
+            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        
+        if is_sharded():
+            with db_cursor(_catalog_path()) as cursor:
+                cursor.execute('DELETE FROM user_shards WHERE username = ?', (username,))
+            _user_shards.pop(username, None)
         
-        conn.commit()
-        conn.close()
         return True
     except Exception as e:
-        conn.close()
         return False
 
 # Lister tous les utilisateurs
 def list_all_users():
-    """Récupère la liste de tous les utilisateurs"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT username FROM users ORDER BY username')
-    users = cursor.fetchall()
-    conn.close()
+    """Récupère la liste de tous les utilisateurs (toutes partitions confondues)"""
+    shard_users = []
+    for path in _existing_shard_paths():
+        with db_cursor(path) as cursor:
+            cursor.execute('SELECT username FROM users ORDER BY username')
+            shard_users.append([user[0] for user in cursor.fetchall()])
     
-    return [user[0] for user in users]
+    return list(heapq.merge(*shard_users))
 
 # Lister tous les labels d'un utilisateur
 def list_user_labels(username):
     """Récupère tous les labels associés à un utilisateur"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT p.label 
-        FROM passwords p 
-        JOIN users u ON p.user_id = u.id 
-        WHERE u.username = ?
-        ORDER BY p.label
-    ''', (username,))
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('''
+            SELECT p.label 
+            FROM passwords p 
+            JOIN users u ON p.user_id = u.id 
+            WHERE u.username = ?
+            ORDER BY p.label
+        ''', (username,))
     
-    labels = cursor.fetchall()
-    conn.close()
+        labels = cursor.fetchall()
     
-    return [label[0] for label in labels]
+        return [label[0] for label in labels]
 
 # Obtenir toutes les données pour l'affichage tableau
 def get_all_users_with_labels():
     """Récupère tous les utilisateurs avec leurs labels pour affichage en tableau"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    shard_results = []
+    for path in _existing_shard_paths():
+        with db_cursor(path) as cursor:
+            cursor.execute('''
+                SELECT u.username, GROUP_CONCAT(p.label, ', ') as labels
+                FROM users u
+                LEFT JOIN passwords p ON u.id = p.user_id
+                GROUP BY u.username
+                ORDER BY u.username
+            ''')
+            shard_results.append(cursor.fetchall())
     
-    cursor.execute('''
-        SELECT u.username, GROUP_CONCAT(p.label, ', ') as labels
-        FROM users u
-        LEFT JOIN passwords p ON u.id = p.user_id
-        GROUP BY u.username
-        ORDER BY u.username
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
-    return results
+    return list(heapq.merge(*shard_results, key=lambda row: row[0]))
 
-# Vérifier si l'utilisateur est bloqué
-def is_user_locked(username, max_attempts=3, lockout_duration_minutes=15):
-    """Vérifie si l'utilisateur est temporairement bloqué après plusieurs tentatives échouées"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Calculer le moment à partir duquel les tentatives comptent
-    lockout_time = datetime.now() - timedelta(minutes=lockout_duration_minutes)
+# Nombre de labels affichés par utilisateur dans la liste paginée
+LABELS_PREVIEW_SIZE = 5
+
+# Parcourir les utilisateurs page par page, avec le nombre de labels calculé en SQL
+def iter_users_with_label_counts(limit=None, offset=0, after=None, preview_size=LABELS_PREVIEW_SIZE):
+    """Génère les tuples (username, nombre de labels, aperçu des premiers labels) triés par username.
+    after est le dernier username déjà affiché (pagination par curseur, sans parcourir les lignes sautées)"""
+    paths = _existing_shard_paths()
+    if len(paths) == 1:
+        yield from _iter_shard_users(paths[0], limit, offset, after, preview_size)
+        return
     
-    cursor.execute('''
-        SELECT COUNT(*) 
-        FROM login_attempts 
-        WHERE username = ? 
-        AND success = 0 
-        AND attempt_time > ?
-    ''', (username, lockout_time))
+    # Stockage partitionné : fusion des partitions triées, chacune lue au plus jusqu'à offset + limit
+    shard_limit = None if limit is None else offset + limit
+    merged = heapq.merge(*(_iter_shard_users(path, shard_limit, 0, after, preview_size) for path in paths),
+                         key=lambda row: row[0])
+    yield from islice(merged, offset, shard_limit)
+
+def _iter_shard_users(path, limit, offset, after, preview_size):
+    query = '''
+        SELECT u.username,
+               (SELECT COUNT(*) FROM passwords p WHERE p.user_id = u.id),
+               (SELECT GROUP_CONCAT(label, ', ') FROM (
+                    SELECT p.label FROM passwords p WHERE p.user_id = u.id ORDER BY p.label LIMIT ?
+               ))
+        FROM users u
+    '''
+    params = [preview_size]
+    if after is not None:
+        query += ' WHERE u.username > ?'
+        params.append(after)
+    query += ' ORDER BY u.username LIMIT ? OFFSET ?'
+    params.extend([-1 if limit is None else limit, offset])
     
-    failed_attempts = cursor.fetchone()[0]
+    with db_cursor(path) as cursor:
+        cursor.execute(query, params)
+        while True:
+            chunk = cursor.fetchmany(256)
+            if not chunk:
+                break
+            yield from chunk
+
+# Statistiques globales calculées par agrégats SQL
+def get_users_summary():
+    """Retourne (nombre d'utilisateurs, utilisateurs avec au moins un label, nombre total de labels)"""
+    totals = (0, 0, 0)
+    for path in _existing_shard_paths():
+        with db_cursor(path) as cursor:
+            cursor.execute('''
+                SELECT (SELECT COUNT(*) FROM users),
+                       (SELECT COUNT(*) FROM users u WHERE EXISTS (SELECT 1 FROM passwords p WHERE p.user_id = u.id)),
+                       (SELECT COUNT(*) FROM passwords)
+            ''')
+            totals = tuple(total + count for total, count in zip(totals, cursor.fetchone()))
+    return totals
+
+# Vérifier l'état de blocage en une seule requête indexée
+def get_lockout_status(username, max_attempts=MAX_LOGIN_ATTEMPTS, lockout_duration_minutes=LOCKOUT_DURATION_MINUTES):
+    """Retourne (bloqué, tentatives restantes, heure de déblocage ou None)"""
+    window_start = datetime.now() - timedelta(minutes=lockout_duration_minutes)
     
-    # Si l'utilisateur a atteint le max de tentatives, vérifier s'il est encore bloqué
-    if failed_attempts >= max_attempts:
+    with db_cursor(_shard_path(username)) as cursor:
         cursor.execute('''
-            SELECT attempt_time 
+            SELECT COUNT(*), MAX(attempt_time) 
             FROM login_attempts 
             WHERE username = ? 
             AND success = 0 
-            ORDER BY attempt_time DESC 
-            LIMIT 1
-        ''', (username,))
+            AND attempt_time > ?
+        ''', (username, window_start.isoformat(' ')))
         
-        last_attempt = cursor.fetchone()
-        if last_attempt:
-            last_attempt_time = datetime.strptime(last_attempt[0], '%Y-%m-%d %H:%M:%S')
-            time_since_last = datetime.now() - last_attempt_time
-            
-            if time_since_last < timedelta(minutes=lockout_duration_minutes):
-                remaining_time = timedelta(minutes=lockout_duration_minutes) - time_since_last
-                conn.close()
-                return True, int(remaining_time.total_seconds() / 60) + 1
+        failed_attempts, last_attempt = cursor.fetchone()
+    
+    if failed_attempts >= max_attempts:
+        unlock_time = datetime.fromisoformat(last_attempt) + timedelta(minutes=lockout_duration_minutes)
+        return True, 0, unlock_time
+    
+    return False, max_attempts - failed_attempts, None
+
+# Minutes restantes avant le déblocage (arrondi supérieur)
+def _minutes_until(unlock_time):
+    return int((unlock_time - datetime.now()).total_seconds() / 60) + 1
+
+# Vérifier si l'utilisateur est bloqué
+def is_user_locked(username, max_attempts=MAX_LOGIN_ATTEMPTS, lockout_duration_minutes=LOCKOUT_DURATION_MINUTES):
+    """Vérifie si l'utilisateur est temporairement bloqué après plusieurs tentatives échouées"""
+    is_locked, _, unlock_time = get_lockout_status(username, max_attempts, lockout_duration_minutes)
+    if is_locked:
+        return True, _minutes_until(unlock_time)
     
-    conn.close()
     return False, 0
 
+# Vérification du master password avec protection contre les tentatives multiples,
+# commune à tous les frontaux (CLI, shell, serveur, AsyncVault)
+def verify_user_with_lockout(username, master_password):
+    """Retourne (valide, tentatives restantes, minutes de blocage restantes, 0 si non bloqué)"""
+    is_locked, remaining_minutes = is_user_locked(username)
+    if is_locked:
+        return False, 0, remaining_minutes
+    
+    return record_login_result(username, verify_user(username, master_password))
+
+# Enregistrer le résultat d'une vérification du master password
+def record_login_result(username, is_valid):
+    """Retourne le même triplet que verify_user_with_lockout"""
+    record_login_attempt(username, is_valid)
+    if is_valid:
+        reset_login_attempts(username)
+        return True, MAX_LOGIN_ATTEMPTS, 0
+    
+    is_locked, remaining, unlock_time = get_lockout_status(username)
+    return False, remaining, _minutes_until(unlock_time) if is_locked else 0
+
 # Enregistrer une tentative de connexion
-def record_login_attempt(username, success):
-    """Enregistre une tentative de connexion (réussie ou échouée)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def record_login_attempt(username, success, lockout_duration_minutes=LOCKOUT_DURATION_MINUTES):
+    """Enregistre une tentative de connexion (réussie ou échouée) et purge les tentatives
+    sorties de la fenêtre de blocage, qui ne servent plus à rien"""
+    now = datetime.now()
+    window_start = now - timedelta(minutes=lockout_duration_minutes)
     
-    cursor.execute(
-        'INSERT INTO login_attempts (username, attempt_time, success) VALUES (?, ?, ?)',
-        (username, datetime.now(), 1 if success else 0)
-    )
-    conn.commit()
-    conn.close()
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('DELETE FROM login_attempts WHERE attempt_time <= ?', (window_start.isoformat(' '),))
+        cursor.execute(
+            'INSERT INTO login_attempts (username, attempt_time, success) VALUES (?, ?, ?)',
+            (username, now.isoformat(' '), 1 if success else 0)
+        )
 
 # Réinitialiser les tentatives après une connexion réussie
 def reset_login_attempts(username):
     """Efface les tentatives échouées après une connexion réussie"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM login_attempts WHERE username = ? AND success = 0', (username,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with db_cursor(_shard_path(username)) as cursor:
+        cursor.execute('DELETE FROM login_attempts WHERE username = ? AND success = 0', (username,))
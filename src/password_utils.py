@@ -1,17 +1,618 @@
+import os
 import re
+import sys
+import math
+import functools
+import struct
+import time
+
+# Score minimal (0 à 4) exigé pour un master password
+MIN_PASSWORD_SCORE = 3
+# Mots de passe distincts récents dont estimate_strength_batch garde le score
+STRENGTH_BATCH_CACHE_SIZE = 256
+
+SPECIAL_CHARS = frozenset("!@#$%^&*()_+-=[]{}|;:,.<>?/")
 
 def validate_password_strength(password):
     """
     Vérifie si le mot de passe respecte les critères de sécurité :
     - Au moins 8 caractères
     - Au moins un caractère spécial
+    - Difficile à deviner (estimate_strength, score >= MIN_PASSWORD_SCORE)
+    - Absent de la liste des mots de passe compromis (breach.py)
     """
     if len(password) < 8:
         return False, "Le mot de passe doit contenir au moins 8 caractères."
     
     # Vérifier la présence d'un caractère spécial
-    special_chars = "!@#$%^&*()_+-=[]{}|;:,.<>?/"
-    if not any(char in special_chars for char in password):
+    if SPECIAL_CHARS.isdisjoint(password):
         return False, "Le mot de passe doit contenir au moins un caractère spécial (!@#$%^&*()_+-=[]{}|;:,.<>?/)."
     
-    return True, "Mot de passe valide."
\ No newline at end of file
+    strength = estimate_strength(password)
+    if strength['score'] < MIN_PASSWORD_SCORE:
+        return False, f"Le mot de passe est trop facile à deviner (score {strength['score']}/4). {strength['warning']}".strip()
+    
+    # Liste hors ligne de mots de passe compromis, si un index est configuré (--breach-file)
+    from breach import is_breached_password
+    if is_breached_password(password):
+        return False, "Ce mot de passe figure dans une liste de mots de passe compromis."
+    
+    return True, "Mot de passe valide."
+
+# Estimation de la robustesse (approche zxcvbn) : le mot de passe est découpé en motifs (mots de
+# dictionnaire, suites de touches, répétitions, suites, dates) et le nombre d'essais retenu est
+# celui du découpage le plus favorable à l'attaquant ; les caractères hors motif sont en force brute
+
+# Dictionnaires classés par fréquence, construits par `python password_utils.py`
+DICTIONARIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'dictionaries.dat')
+WORDLISTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wordlists')
+
+# Format : MAGIC | version (1 octet) | nombre de dictionnaires (1 octet), puis pour chaque
+# dictionnaire : longueur du nom (1 octet) | nom | longueur des mots (4 octets) | mots séparés par \n
+DICTIONARIES_MAGIC = b'PMDW'
+DICTIONARIES_VERSION = 1
+
+MIN_WORD_LENGTH = 3
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_YEAR_SPACE = 20
+REFERENCE_YEAR = time.localtime().tm_year
+
+# Seuils du score 0 à 4 (nombre d'essais)
+SCORE_THRESHOLDS = (1e3, 1e6, 1e8, 1e10)
+
+L33T_TABLE = str.maketrans({
+    '4': 'a', '@': 'a', '8': 'b', '(': 'c', '{': 'c', '[': 'c', '<': 'c', '3': 'e', '6': 'g', '9': 'g',
+    '1': 'i', '!': 'i', '|': 'i', '0': 'o', '$': 's', '5': 's', '7': 't', '+': 't', '%': 'x', '2': 'z',
+})
+
+# Claviers : rangées sans puis avec Maj (même touche = même position)
+KEYBOARD_LAYOUTS = {
+    'qwerty': (
+        ('`1234567890-=', 'qwertyuiop[]\\', "asdfghjkl;'", 'zxcvbnm,./'),
+        ('~!@#$%^&*()_+', 'QWERTYUIOP{}|', 'ASDFGHJKL:"', 'ZXCVBNM<>?'),
+    ),
+    'azerty': (
+        ('²&é"\'(-è_çà)=', 'azertyuiop^$', 'qsdfghjklmù*', '<wxcvbn,;:!'),
+        (' 1234567890°+', 'AZERTYUIOP¨£', 'QSDFGHJKLM%µ', '>WXCVBN?./§'),
+    ),
+}
+KEYPAD_ROWS = ('/*-', '789+', '456', '123', '0.')
+
+_dictionaries = None
+_index = None
+_graphs = None
+
+# Construire le fichier compact des dictionnaires à partir de listes de mots
+def build_dictionaries(sources, output_path=DICTIONARIES_PATH):
+    """sources : chemins de fichiers texte, un mot par ligne du plus au moins fréquent,
+    ou "mot<espace>nombre" (trié alors par nombre décroissant). Le nom du dictionnaire
+    est celui du fichier. Retourne {nom: nombre de mots}"""
+    dictionaries = []
+    for path in sources:
+        entries = []
+        with open(path, encoding='utf-8') as file:
+            for position, line in enumerate(file):
+                parts = line.split()
+                if not parts:
+                    continue
+                count = float(parts[1]) if len(parts) > 1 else -position
+                entries.append((count, parts[0].lower()))
+        entries.sort(key=lambda entry: -entry[0])
+        
+        # Un mot garde son meilleur rang
+        words = list(dict.fromkeys(word for _, word in entries if len(word) >= MIN_WORD_LENGTH))
+        dictionaries.append((os.path.splitext(os.path.basename(path))[0], words))
+    
+    with open(output_path, 'wb') as file:
+        file.write(DICTIONARIES_MAGIC + bytes([DICTIONARIES_VERSION, len(dictionaries)]))
+        for name, words in dictionaries:
+            encoded_name = name.encode()
+            data = '\n'.join(words).encode()
+            file.write(bytes([len(encoded_name)]) + encoded_name + struct.pack('>I', len(data)) + data)
+    return {name: len(words) for name, words in dictionaries}
+
+# Dictionnaires chargés au premier appel puis gardés : {nom: {mot: rang}}
+def load_dictionaries():
+    global _dictionaries
+    if _dictionaries is None:
+        dictionaries = {}
+        if os.path.exists(DICTIONARIES_PATH):
+            with open(DICTIONARIES_PATH, 'rb') as file:
+                data = file.read()
+            if data[:4] != DICTIONARIES_MAGIC or data[4] != DICTIONARIES_VERSION:
+                raise ValueError(f"{DICTIONARIES_PATH}: fichier de dictionnaires invalide")
+            offset = 6
+            for _ in range(data[5]):
+                name_length = data[offset]
+                name = data[offset + 1:offset + 1 + name_length].decode()
+                offset += 1 + name_length
+                size = struct.unpack_from('>I', data, offset)[0]
+                words = data[offset + 4:offset + 4 + size].decode().split('\n')
+                offset += 4 + size
+                dictionaries[name] = dict(zip(words, range(1, len(words) + 1)))
+        _dictionaries = dictionaries
+    return _dictionaries
+
+# Graphes d'adjacence des claviers : {nom: ({caractère: {voisin: direction}}, touches, degré moyen)}
+def _keyboard_graphs():
+    global _graphs
+    if _graphs is None:
+        # Clavier décalé : chaque rangée est décalée d'une demi-touche vers la droite
+        staggered = ((0, -1), (0, 1), (-1, 0), (-1, 1), (1, -1), (1, 0))
+        grid = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)
+        layouts = {name: (rows, staggered) for name, rows in KEYBOARD_LAYOUTS.items()}
+        layouts['keypad'] = ((KEYPAD_ROWS,), grid)
+        
+        _graphs = {}
+        for name, (layers, offsets) in layouts.items():
+            positions = {}
+            for layer in layers:
+                for r, row in enumerate(layer):
+                    for c, char in enumerate(row):
+                        if char != ' ':
+                            positions.setdefault((r, c), []).append(char)
+            
+            graph = {}
+            for (r, c), chars in positions.items():
+                neighbors = {}
+                for direction, (dr, dc) in enumerate(offsets):
+                    for neighbor in positions.get((r + dr, c + dc), ()):
+                        neighbors[neighbor] = direction
+                for char in chars:
+                    graph[char] = neighbors
+            degree = sum(1 for r, c in positions for dr, dc in offsets if (r + dr, c + dc) in positions) / len(positions)
+            _graphs[name] = (graph, len(positions), degree, ''.join(layers[1]) if len(layers) > 1 else '')
+    return _graphs
+
+def _n_choose_k(n, k):
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+def _uppercase_variations(token):
+    if token.islower() or not any(char.isalpha() for char in token):
+        return 1
+    if token[0].isupper() and token[1:].islower() or token.isupper() or token[-1].isupper() and token[:-1].islower():
+        return 2
+    upper = sum(1 for char in token if char.isupper())
+    lower = sum(1 for char in token if char.islower())
+    return sum(_n_choose_k(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+def _l33t_variations(token, translated):
+    variations = 1
+    for subbed_char, letter in set((char, plain) for char, plain in zip(token.lower(), translated) if char != plain):
+        subbed = token.lower().count(subbed_char)
+        unsubbed = token.lower().count(letter)
+        if unsubbed == 0:
+            variations *= 2
+        else:
+            variations *= sum(_n_choose_k(subbed + unsubbed, i) for i in range(1, min(subbed, unsubbed) + 1))
+    return variations
+
+# Index de recherche : meilleur (rang, dictionnaire) de chaque mot et préfixes de tous les mots,
+# pour abandonner une position dès que le début de la sous-chaîne ne commence aucun mot
+def _dictionary_index(dictionaries):
+    global _index
+    if _index is None or _index[0] is not dictionaries:
+        words = {}
+        for name, ranks in dictionaries.items():
+            for word, rank in ranks.items():
+                if word not in words or rank < words[word][0]:
+                    words[word] = (rank, name)
+        prefixes = {word[:length] for word in words for length in range(MIN_WORD_LENGTH, len(word) + 1)}
+        _index = (dictionaries, words, prefixes)
+    return _index[1], _index[2]
+
+def _find_words(text, words, prefixes):
+    """Génère (i, j, rang, dictionnaire) pour chaque mot text[i:j]"""
+    n = len(text)
+    get_word = words.get
+    for i in range(n - MIN_WORD_LENGTH + 1):
+        for j in range(i + MIN_WORD_LENGTH, n + 1):
+            token = text[i:j]
+            if token not in prefixes:
+                break
+            found = get_word(token)
+            if found:
+                yield i, j, found[0], found[1]
+
+def _find_user_inputs(text, user_inputs):
+    for word, rank in user_inputs.items():
+        i = text.find(word)
+        while i != -1:
+            yield i, i + len(word), rank, 'user_inputs'
+            i = text.find(word, i + 1)
+
+# Chaque motif est un tuple (début, fin incluse, essais, type, détails)
+def _dictionary_matches(password, dictionaries, user_inputs=None):
+    words, prefixes = _dictionary_index(dictionaries)
+    matches = []
+    lower = password.lower()
+    n = len(password)
+    candidates = [(lower, False, None)]
+    reversed_lower = lower[::-1]
+    if reversed_lower != lower:
+        candidates.append((reversed_lower, True, None))
+    translated = lower.translate(L33T_TABLE)
+    if translated != lower:
+        candidates.append((translated, False, lower))
+    
+    for text, is_reversed, original in candidates:
+        found = _find_words(text, words, prefixes)
+        if user_inputs:
+            found = list(found) + list(_find_user_inputs(text, user_inputs))
+        for i, j, rank, name in found:
+            if is_reversed:
+                start, end = n - j, n - 1 - i
+                guesses = rank * _uppercase_variations(password[start:end + 1]) * 2
+            elif original is not None:
+                # Motif l33t : au moins une substitution dans le mot
+                if original[i:j] == text[i:j]:
+                    continue
+                start, end = i, j - 1
+                guesses = rank * _uppercase_variations(password[i:j]) * _l33t_variations(password[i:j], text[i:j])
+            else:
+                start, end = i, j - 1
+                guesses = rank * _uppercase_variations(password[i:j])
+            matches.append((start, end, max(guesses, 1), 'dictionary', name, rank))
+    return matches
+
+def _spatial_matches(password):
+    matches = []
+    n = len(password)
+    for name, (graph, keys, degree, shifted_chars) in _keyboard_graphs().items():
+        i = 0
+        while i < n - 2:
+            j = i
+            turns = 0
+            last_direction = None
+            while j + 1 < n:
+                direction = graph.get(password[j], {}).get(password[j + 1])
+                if direction is None:
+                    break
+                if direction != last_direction:
+                    turns += 1
+                    last_direction = direction
+                j += 1
+            if j - i + 1 >= 3:
+                token = password[i:j + 1]
+                shifted = sum(1 for char in token if char in shifted_chars)
+                matches.append((i, j, _spatial_guesses(len(token), turns, shifted, keys, degree), 'spatial', name, turns))
+            i = j + 1 if j > i else i + 1
+    return matches
+
+def _spatial_guesses(length, turns, shifted, keys, degree):
+    guesses = 0
+    for i in range(2, length + 1):
+        for j in range(1, min(turns, i - 1) + 1):
+            guesses += _n_choose_k(i - 1, j - 1) * keys * degree ** j
+    unshifted = length - shifted
+    if shifted and unshifted:
+        guesses *= sum(_n_choose_k(shifted + unshifted, i) for i in range(1, min(shifted, unshifted) + 1))
+    elif shifted:
+        guesses *= 2
+    # Essais entiers : les produits de la programmation dynamique restent exacts
+    return max(1, round(guesses))
+
+_REPEAT_GREEDY = re.compile(r'(.+)\1+')
+_REPEAT_LAZY = re.compile(r'(.+?)\1+')
+
+# Les bases répétées sont courtes et reviennent souvent ("12", "ab") : estimées une seule fois
+@functools.lru_cache(maxsize=4096)
+def _repeat_base_guesses(base):
+    return _estimate(base, _dictionaries)[0]
+
+def _repeat_matches(password, dictionaries):
+    matches = []
+    position = 0
+    while position < len(password):
+        greedy = _REPEAT_GREEDY.search(password, position)
+        if not greedy:
+            break
+        lazy = _REPEAT_LAZY.search(password, position)
+        # Le motif le plus long l'emporte ; à longueur égale, la plus petite base
+        if len(greedy.group(0)) > len(lazy.group(0)):
+            match = greedy
+            base = _REPEAT_LAZY.fullmatch(match.group(0)).group(1)
+        else:
+            match, base = lazy, lazy.group(1)
+        base_guesses = _repeat_base_guesses(base) if dictionaries is _dictionaries else _estimate(base, dictionaries)[0]
+        count = len(match.group(0)) // len(base)
+        matches.append((match.start(), match.end() - 1, base_guesses * count, 'repeat', base, count))
+        position = match.end()
+    return matches
+
+def _sequence_matches(password):
+    matches = []
+    n = len(password)
+    if n < 3:
+        return matches
+    
+    def add(i, j, delta):
+        if j - i < 2 or abs(delta) > 5:
+            return
+        token = password[i:j + 1]
+        first = token[0]
+        if first in 'aAzZ019':
+            base = 4
+        elif first.isdigit():
+            base = 10
+        else:
+            base = 26
+        matches.append((i, j, base * len(token) * (1 if delta > 0 else 2), 'sequence', delta, len(token)))
+    
+    i = 0
+    last_delta = None
+    for k in range(1, n):
+        delta = ord(password[k]) - ord(password[k - 1])
+        if last_delta is None:
+            last_delta = delta
+        if delta != last_delta or delta == 0:
+            if last_delta != 0:
+                add(i, k - 1, last_delta)
+            i = k - 1
+            last_delta = delta
+    if last_delta:
+        add(i, n - 1, last_delta)
+    return matches
+
+# Découpages jour/mois/année possibles d'une suite de 4 à 8 chiffres (comme zxcvbn)
+DATE_SPLITS = {4: ((1, 2), (2, 3)), 5: ((1, 3), (2, 3)), 6: ((1, 2), (2, 4), (4, 5)),
+               7: ((1, 3), (2, 3), (4, 5), (4, 6)), 8: ((2, 4), (4, 6))}
+_DATE_WITH_SEPARATOR = re.compile(r'(?=(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4}))')
+# Seules les suites isolées de 4 à 8 chiffres, prises en entier, sont des dates candidates : une
+# suite plus longue (numéro, 64 chiffres aléatoires) n'est pas une date, et y essayer toutes les
+# fenêtres multipliait les motifs à examiner
+_DIGITS = re.compile(r'(?<!\d)\d{4,8}(?!\d)')
+_RECENT_YEAR = re.compile(r'19\d\d|20\d\d')
+
+def _to_date(a, b, c):
+    """(jour, mois, année) le plus plausible pour trois nombres, None sinon"""
+    best = None
+    for year, first, second in ((c, a, b), (a, b, c)):
+        if year < 100:
+            year += 1900 if year > 50 else 2000
+        elif not 1000 <= year <= 2050:
+            continue
+        if best is not None and abs(year - REFERENCE_YEAR) >= abs(best[2] - REFERENCE_YEAR):
+            continue
+        if 1 <= first <= 31 and 1 <= second <= 12:
+            best = (first, second, year)
+        elif 1 <= second <= 31 and 1 <= first <= 12:
+            best = (second, first, year)
+    return best
+
+def _date_guesses(year, separator):
+    return max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE) * 365 * (4 if separator else 1)
+
+# Date sans séparateur la plus plausible pour une suite de chiffres entière, calculée une seule
+# fois par suite (les mêmes reviennent souvent : années, dates de naissance)
+@functools.lru_cache(maxsize=4096)
+def _digit_run_date(text):
+    best = None
+    for k, l in DATE_SPLITS[len(text)]:
+        middle = int(text[k:l])
+        if not 1 <= middle <= 31:
+            continue
+        date = _to_date(int(text[:k]), middle, int(text[l:]))
+        if date and (best is None or abs(date[2] - REFERENCE_YEAR) < abs(best[2] - REFERENCE_YEAR)):
+            best = date
+    return best
+
+def _date_matches(password):
+    matches = []
+    for digits in _DIGITS.finditer(password):
+        date = _digit_run_date(digits.group(0))
+        if date:
+            matches.append((digits.start(), digits.end() - 1, _date_guesses(date[2], False), 'date', date, ''))
+    
+    for match in _DATE_WITH_SEPARATOR.finditer(password):
+        first, separator, second, third = match.groups()
+        date = _to_date(int(first), int(second), int(third))
+        if date:
+            length = len(first) + len(second) + len(third) + 2
+            matches.append((match.start(), match.start() + length - 1, _date_guesses(date[2], True), 'date', date, separator))
+    
+    for match in _RECENT_YEAR.finditer(password):
+        year = int(match.group(0))
+        matches.append((match.start(), match.end() - 1, max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE), 'year', year, ''))
+    return matches
+
+# Découpage le plus facile à deviner (programmation dynamique sur les positions)
+def _estimate(password, dictionaries, user_inputs=None):
+    """Retourne (essais, motifs retenus)"""
+    n = len(password)
+    if n == 0:
+        return 1, []
+    
+    matches = (_dictionary_matches(password, dictionaries, user_inputs) + _spatial_matches(password)
+               + _repeat_matches(password, dictionaries) + _sequence_matches(password) + _date_matches(password))
+    # Un seul motif par intervalle (le moins coûteux) : les dates et claviers se recouvrent beaucoup.
+    # Un motif plus coûteux que la force brute sur le même intervalle ne peut pas être retenu
+    best_by_span = {}
+    for match in matches:
+        if match[2] >= BRUTEFORCE_CARDINALITY ** (match[1] - match[0] + 1):
+            continue
+        span = (match[0], match[1])
+        current = best_by_span.get(span)
+        if current is None or match[2] < current[2]:
+            best_by_span[span] = match
+    by_end = [[] for _ in range(n)]
+    for match in best_by_span.values():
+        by_end[match[1]].append(match)
+    
+    # Au-delà de n/4 motifs, la pénalité 10000^(l-1) dépasse la force brute pure
+    max_sequence_length = n // 4 + 2
+    factorials = [math.factorial(length) for length in range(max_sequence_length + 2)]
+    penalties = [0] + [MIN_GUESSES_BEFORE_GROWING_SEQUENCE ** (length - 1) for length in range(1, max_sequence_length + 2)]
+    
+    # suffix_products[k] : plus petit produit d'essais couvrant password[k:], sans pénalité de longueur.
+    # Le découpage correspondant donne une borne supérieure, et l! * produit * suffix_products[k + 1]
+    # une borne inférieure de tout découpage prolongeant un état
+    by_start = [[] for _ in range(n)]
+    for match in best_by_span.values():
+        by_start[match[0]].append(match)
+    suffix_products = [1] * (n + 1)
+    suffix_choices = [None] * n
+    for k in range(n - 1, -1, -1):
+        suffix_products[k] = BRUTEFORCE_CARDINALITY * suffix_products[k + 1]
+        for match in by_start[k]:
+            product = match[2] * suffix_products[match[1] + 1]
+            if product < suffix_products[k]:
+                suffix_products[k] = product
+                suffix_choices[k] = match
+    length = 0
+    k = 0
+    bruteforce = False
+    while k < n:
+        match = suffix_choices[k]
+        if match is None:
+            length += not bruteforce
+            bruteforce = True
+            k += 1
+        else:
+            length += 1
+            bruteforce = False
+            k = match[1] + 1
+    upper_bound = BRUTEFORCE_CARDINALITY ** n + penalties[1]
+    if length <= max_sequence_length:
+        upper_bound = min(upper_bound, factorials[length] * suffix_products[0] + penalties[length])
+    
+    # bruteforce_states[k] / match_states[k] : découpages de password[:k + 1] finissant par un segment
+    # de force brute / par un motif, en liste (nombre de motifs, produit des essais, motifs chaînés)
+    # où seuls subsistent les états non dominés : un état est écarté si un autre a moins de motifs et
+    # un l! * produit inférieur (le rapport des factorielles ne fait que croître avec les motifs suivants)
+    bruteforce_states = [()] * n
+    match_states = [()] * n
+    any_states = [((0, 1, None),)] + [()] * n
+    
+    def frontier(candidates, k):
+        kept = []
+        best = None
+        remaining = suffix_products[k + 1]
+        for length in sorted(candidates):
+            product, sequence = candidates[length]
+            weighted = factorials[length] * product
+            if (best is None or weighted < best) and weighted * remaining + penalties[length] <= upper_bound:
+                best = weighted
+                kept.append((length, product, sequence))
+        return kept
+    
+    for k in range(n):
+        # Caractère k en force brute : prolonge un segment de force brute ou en commence un
+        candidates = {}
+        if k == 0:
+            candidates[1] = (BRUTEFORCE_CARDINALITY, None)
+        elif not match_states[k - 1]:
+            # Aucun motif ne finit en k - 1 : les états restent non dominés, seul le produit change
+            bruteforce_states[k] = [(length, product * BRUTEFORCE_CARDINALITY, sequence)
+                                    for length, product, sequence in bruteforce_states[k - 1]]
+        else:
+            for length, product, sequence in bruteforce_states[k - 1]:
+                candidates[length] = (product * BRUTEFORCE_CARDINALITY, sequence)
+            for length, product, sequence in match_states[k - 1]:
+                if length < max_sequence_length:
+                    current = candidates.get(length + 1)
+                    product *= BRUTEFORCE_CARDINALITY
+                    if current is None or product < current[0]:
+                        candidates[length + 1] = (product, sequence)
+        if candidates:
+            bruteforce_states[k] = frontier(candidates, k)
+        
+        candidates = {}
+        for match in by_end[k]:
+            guesses = match[2]
+            for length, product, sequence in any_states[match[0]]:
+                if length < max_sequence_length:
+                    current = candidates.get(length + 1)
+                    product *= guesses
+                    if current is None or product < current[0]:
+                        candidates[length + 1] = (product, (match, sequence))
+        if not candidates:
+            # Cas le plus fréquent : aucun motif ne finit en k
+            any_states[k + 1] = bruteforce_states[k]
+            continue
+        match_states[k] = frontier(candidates, k)
+        
+        # Un motif qui commence en k + 1 peut suivre l'un ou l'autre type d'état
+        merged = {}
+        for length, product, sequence in bruteforce_states[k] + match_states[k]:
+            current = merged.get(length)
+            if current is None or product < current[0]:
+                merged[length] = (product, sequence)
+        any_states[k + 1] = frontier(merged, k)
+    
+    best = None
+    for length, product, sequence in any_states[n]:
+        guesses = factorials[length] * product + penalties[length]
+        if best is None or guesses < best[0]:
+            best = (guesses, sequence)
+    
+    guesses, chained = best
+    sequence = []
+    while chained is not None:
+        match, chained = chained
+        sequence.append(match)
+    return guesses, sequence[::-1]
+
+_WARNINGS = {
+    'passwords': "Ce mot de passe fait partie des plus courants.",
+    'dictionary': "Un mot du dictionnaire ou un prénom est facile à deviner.",
+    'user_inputs': "Évitez d'utiliser votre nom d'utilisateur ou le nom du service.",
+    'spatial': "Les suites de touches du clavier (azerty, qsdf...) sont faciles à deviner.",
+    'repeat': "Les répétitions comme « aaa » ou « abcabc » sont faciles à deviner.",
+    'sequence': "Les suites comme « abc » ou « 6543 » sont faciles à deviner.",
+    'date': "Les dates et les années sont faciles à deviner.",
+}
+
+def _warning(sequence):
+    if not sequence:
+        return ''
+    # Le motif qui couvre le plus de caractères explique l'essentiel du score
+    match = max(sequence, key=lambda match: match[1] - match[0])
+    if match[3] == 'dictionary':
+        return _WARNINGS.get(match[4], _WARNINGS['dictionary'])
+    return _WARNINGS['date' if match[3] == 'year' else match[3]]
+
+def estimate_strength(password, user_inputs=()):
+    """Estime le nombre d'essais nécessaires pour deviner le mot de passe.
+    user_inputs : mots propres au contexte (nom d'utilisateur, label...) traités comme un dictionnaire.
+    Retourne {'guesses', 'guesses_log10', 'score' (0 à 4), 'sequence', 'warning'}"""
+    ranks = {word.lower(): rank for rank, word in enumerate(user_inputs, 1) if len(word) >= MIN_WORD_LENGTH}
+    guesses, sequence = _estimate(password, load_dictionaries(), ranks)
+    return {
+        'guesses': guesses,
+        'guesses_log10': round(math.log10(guesses), 2),
+        'score': sum(1 for threshold in SCORE_THRESHOLDS if guesses >= threshold + 5),
+        'sequence': [{'pattern': match[3], 'token': password[match[0]:match[1] + 1], 'guesses': match[2]} for match in sequence],
+        'warning': _warning(sequence),
+    }
+
+def estimate_strength_batch(passwords, user_inputs=()):
+    """Score d'un flux de mots de passe (ex: toutes les lignes d'un import) ; génère les résultats
+    dans l'ordre. Les dictionnaires ne sont chargés qu'une fois ; un mot de passe répété parmi les
+    STRENGTH_BATCH_CACHE_SIZE derniers distincts n'est pas réévalué, sans garder en mémoire tous
+    les mots de passe en clair du flux"""
+    load_dictionaries()
+    estimate = functools.lru_cache(maxsize=STRENGTH_BATCH_CACHE_SIZE)(
+        lambda password: estimate_strength(password, user_inputs))
+    try:
+        for password in passwords:
+            yield estimate(password)
+    finally:
+        estimate.cache_clear()
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Construire le fichier des dictionnaires de l'estimateur de robustesse")
+    parser.add_argument('sources', nargs='*', help='Listes de mots (une par dictionnaire, du plus au moins fréquent, ou "mot nombre")')
+    parser.add_argument('-o', '--output', default=DICTIONARIES_PATH, help=f'Fichier à créer (défaut: {DICTIONARIES_PATH})')
+    args = parser.parse_args()
+    
+    sources = args.sources or sorted(os.path.join(WORDLISTS_DIR, name) for name in os.listdir(WORDLISTS_DIR) if name.endswith('.txt'))
+    for name, count in build_dictionaries(sources, args.output).items():
+        print(f"{name}: {count} mots")
+    print(f"Dictionnaires écrits dans {args.output} ({os.path.getsize(args.output)} octets)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import signal
+import socket
+import secrets
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import unquote, urlsplit, parse_qs
+
+from agent import handle_request, DEFAULT_IDLE_TIMEOUT_MINUTES
+
+DEFAULT_SERVE_ADDRESS = '127.0.0.1:8765'
+DEFAULT_SERVE_WORKERS = 8
+
+# Seules les adresses locales sont acceptées : les mots de passe circulent en clair dans HTTP
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# Codes HTTP des erreurs renvoyées par handle_request
+ERROR_STATUS = {
+    'not_found': 404,
+    'exists': 409,
+    'reused': 409,
+    'unknown_op': 400,
+    'internal': 500,
+}
+
+# Sessions ouvertes : jeton -> [username, master password, dernière utilisation]
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def parse_serve_address(address):
+    """'HOST:PORT' ou 'unix:CHEMIN' -> (famille, adresse) ; ValueError si l'adresse n'est pas locale"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+
+    host, _, port = address.rpartition(':')
+    host = host.strip('[]') or '127.0.0.1'
+    if host not in LOOPBACK_HOSTS:
+        raise ValueError(f"Adresse non locale refusée: {host}")
+    return socket.AF_INET6 if ':' in host else socket.AF_INET, (host, int(port))
+
+def open_session(username, master_password):
+    token = secrets.token_urlsafe(32)
+    with _sessions_lock:
+        _sessions[token] = [username, master_password, time.monotonic()]
+    return token
+
+def get_session(token, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES):
+    """Retourne (username, master password), None si le jeton est inconnu ou expiré"""
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None:
+            return None
+        if time.monotonic() - session[2] > idle_timeout_minutes * 60:
+            del _sessions[token]
+            return None
+        session[2] = time.monotonic()
+        return session[0], session[1]
+
+def close_session(token):
+    with _sessions_lock:
+        return _sessions.pop(token, None) is not None
+
+class VaultRequestHandler(BaseHTTPRequestHandler):
+    """API JSON :
+        POST   /session              {"username", "master_password"} -> {"token"}
+        DELETE /session              fermer la session
+        GET    /labels               labels de l'utilisateur
+        GET    /passwords?label=a&label=prod-*   plusieurs entrées (labels ou motifs)
+        GET    /passwords/LABEL      un mot de passe
+        POST   /passwords/LABEL      {"password", "force"} ajouter
+        PUT    /passwords/LABEL      {"password", "force"} modifier
+        DELETE /passwords/LABEL      supprimer
+    Les routes autres que POST /session exigent l'en-tête "Authorization: Bearer JETON"."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'PasswordManager'
+    # Une connexion inactive ferme son thread après ce délai (elle n'occupe aucun thread du pool)
+    timeout = 10
+
+    def setup(self):
+        # En-têtes et corps sont écrits séparément : sans TCP_NODELAY, Nagle et l'ACK retardé
+        # ajoutent ~40 ms par réponse (option inexistante sur un socket Unix)
+        self.disable_nagle_algorithm = self.server.address_family != socket.AF_UNIX
+        super().setup()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def address_string(self):
+        # Socket Unix : pas d'adresse client
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _session(self):
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            return None
+        return get_session(authorization[len('Bearer '):], self.server.idle_timeout_minutes)
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+
+        try:
+            body = self._read_json() if method in ('POST', 'PUT') else {}
+        except ValueError:
+            return self._send_json(400, {'ok': False, 'error': 'invalid_json'})
+
+        if parts == ['session'] and method == 'POST':
+            return self._login(body)
+
+        session = self._session()
+        if session is None:
+            return self._send_json(401, {'ok': False, 'error': 'unauthorized'})
+        username, master_password = session
+
+        if parts == ['session'] and method == 'DELETE':
+            close_session(self.headers['Authorization'][len('Bearer '):])
+            return self._send_json(200, {'ok': True})
+
+        if parts == ['labels'] and method == 'GET':
+            request = {'op': 'list-labels'}
+        elif parts == ['passwords'] and method == 'GET':
+            request = {'op': 'show', 'labels': parse_qs(url.query).get('label', [])}
+        elif len(parts) == 2 and parts[0] == 'passwords':
+            op = {'GET': 'show', 'POST': 'add', 'PUT': 'modify', 'DELETE': 'delete'}[method]
+            request = {'op': op, 'label': parts[1], 'password': body.get('password'), 'force': body.get('force', False)}
+            if op in ('add', 'modify') and not isinstance(request['password'], str):
+                return self._send_json(400, {'ok': False, 'error': 'missing_password'})
+        else:
+            return self._send_json(404, {'ok': False, 'error': 'unknown_route'})
+
+        try:
+            response, _ = self.server.run_vault_work(handle_request, username, master_password, request)
+        except Exception as e:
+            response = {'ok': False, 'error': 'internal', 'message': str(e)}
+
+        status = 200 if response['ok'] else ERROR_STATUS.get(response['error'], 400)
+        if status == 200 and method == 'POST':
+            status = 201
+        self._send_json(status, response)
+
+    # Ouverture de session : même vérification et même blocage que la CLI
+    def _login(self, body):
+        from database import verify_user_with_lockout
+
+        username = body.get('username')
+        master_password = body.get('master_password')
+        if not isinstance(username, str) or not isinstance(master_password, str):
+            return self._send_json(400, {'ok': False, 'error': 'missing_credentials'})
+
+        is_valid, _, remaining_minutes = self.server.run_vault_work(verify_user_with_lockout, username, master_password)
+        if is_valid:
+            return self._send_json(201, {'ok': True, 'token': open_session(username, master_password)})
+
+        if remaining_minutes:
+            return self._send_json(423, {'ok': False, 'error': 'locked', 'retry_after_minutes': remaining_minutes})
+        self._send_json(401, {'ok': False, 'error': 'invalid_credentials'})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+# Chaque connexion a son propre thread (une connexion keep-alive inactive ne bloque personne) ;
+# seul le travail sur le coffre passe par le pool de taille fixe (une connexion SQLite par thread)
+class _VaultWorkMixIn:
+    daemon_threads = True
+
+    def run_vault_work(self, func, *args):
+        return self.pool.submit(func, *args).result()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class VaultHTTPServer(_VaultWorkMixIn, ThreadingHTTPServer):
+    pass
+
+class UnixVaultHTTPServer(_VaultWorkMixIn, ThreadingMixIn, UnixStreamServer):
+    pass
+
+def create_server(address=DEFAULT_SERVE_ADDRESS, workers=DEFAULT_SERVE_WORKERS,
+                  idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES, verbose=False):
+    family, server_address = parse_serve_address(address)
+
+    if family == socket.AF_UNIX:
+        if os.path.exists(server_address):
+            os.unlink(server_address)
+        # Socket accessible au seul propriétaire
+        old_umask = os.umask(0o177)
+        try:
+            server = UnixVaultHTTPServer(server_address, VaultRequestHandler)
+        finally:
+            os.umask(old_umask)
+    else:
+        VaultHTTPServer.address_family = family
+        server = VaultHTTPServer(server_address, VaultRequestHandler)
+
+    server.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vault-http')
+    server.idle_timeout_minutes = idle_timeout_minutes
+    server.verbose = verbose
+    return server
+
+# Servir l'API jusqu'à Ctrl+C, puis fermer le socket et oublier les sessions
+def run_server(server):
+    # SIGTERM (arrêt du service) passe aussi par le nettoyage
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if server.address_family == socket.AF_UNIX and os.path.exists(server.server_address):
+            os.unlink(server.server_address)
+        with _sessions_lock:
+            _sessions.clear()
@@ -0,0 +1,232 @@
+import cmd
+import getpass
+import shlex
+import threading
+from bisect import bisect_left, insort
+
+from agent import DEFAULT_IDLE_TIMEOUT_MINUTES
+from cli import (Colors, print_success, print_error, print_info, print_passwords, print_labels,
+                 print_search_results, confirm_password_input, check_and_warn_password_reuse, check_and_warn_breached_password,
+                 verify_user_with_lockout)
+import database
+
+try:
+    import readline
+except ImportError:
+    # Pas de complétion (Windows sans pyreadline) : le shell reste utilisable
+    readline = None
+
+class VaultShell(cmd.Cmd):
+    """Shell interactif : une seule authentification, clé de données et labels gardés en mémoire.
+    La session se verrouille après idle_timeout_minutes d'inactivité (master password redemandé)."""
+
+    intro = f"{Colors.CYAN}Tapez help pour la liste des commandes, quit pour sortir.{Colors.END}"
+
+    def __init__(self, username, master_password, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES):
+        super().__init__()
+        self.username = username
+        self.master_password = master_password
+        self.idle_timeout_minutes = idle_timeout_minutes
+        # Séquences \001 \002 : readline ne compte pas les couleurs dans la largeur du prompt
+        self.prompt = f"\001{Colors.GREEN}{Colors.BOLD}\002{username}>\001{Colors.END}\002 "
+        self.labels = sorted(database.list_user_labels(username))
+        self._lock_timer = None
+        self._lock = threading.Lock()
+
+    # Verrouillage automatique : le minuteur est réarmé après chaque commande
+    def _arm_lock_timer(self):
+        timer = threading.Timer(self.idle_timeout_minutes * 60, self._auto_lock)
+        timer.daemon = True
+        with self._lock:
+            self._disarm_lock_timer()
+            self._lock_timer = timer
+        timer.start()
+
+    # Appelé avec self._lock : un minuteur déjà déclenché ne verrouillera plus la session
+    def _disarm_lock_timer(self):
+        if self._lock_timer:
+            self._lock_timer.cancel()
+            self._lock_timer = None
+
+    def _auto_lock(self):
+        with self._lock:
+            # Une commande a commencé entre l'expiration et la prise du verrou : elle garde la session
+            if threading.current_thread() is not self._lock_timer:
+                return
+            self._lock_timer = None
+            self._clear_session()
+        print(f"\n{Colors.YELLOW}⚠️  Session verrouillée après {self.idle_timeout_minutes} minute(s) d'inactivité.{Colors.END}")
+
+    def lock(self):
+        with self._lock:
+            self._clear_session()
+
+    def _clear_session(self):
+        self.master_password = None
+        database.clear_session_keys()
+
+    def _unlock(self):
+        master_password = getpass.getpass(f'{Colors.YELLOW}🔑 Entrez le master password pour {self.username}: {Colors.END}')
+        if not verify_user_with_lockout(self.username, master_password):
+            return False
+        with self._lock:
+            self.master_password = master_password
+        return True
+
+    def preloop(self):
+        if readline:
+            # Les labels contiennent souvent '-' ou '.' : seul l'espace sépare les mots
+            readline.set_completer_delims(' \t\n')
+        self._arm_lock_timer()
+
+    def postloop(self):
+        with self._lock:
+            self._disarm_lock_timer()
+            self._clear_session()
+
+    def precmd(self, line):
+        # Minuteur désarmé et session lue sous le verrou : le verrouillage automatique ne peut plus
+        # effacer le master password pendant la commande
+        with self._lock:
+            self._disarm_lock_timer()
+            locked = self.master_password is None
+        if locked and line.strip() not in ('', 'quit', 'exit', 'EOF'):
+            if not self._unlock():
+                print_error("Erreur: Master password invalide!")
+                return 'quit'
+        return line
+
+    def postcmd(self, stop, line):
+        if not stop:
+            self._arm_lock_timer()
+        return stop
+
+    def emptyline(self):
+        # Par défaut, cmd répète la dernière commande
+        pass
+
+    def default(self, line):
+        print_error(f"Commande inconnue: {line.split()[0]} (tapez help)")
+
+    def _args(self, arg):
+        try:
+            return shlex.split(arg)
+        except ValueError as e:
+            print_error(f"Arguments invalides: {str(e)}")
+            return None
+
+    # Complétion sur l'index des labels en mémoire (recherche dichotomique du préfixe)
+    def _complete_label(self, text, line, begidx, endidx):
+        start = bisect_left(self.labels, text)
+        matches = []
+        for label in self.labels[start:]:
+            if not label.startswith(text):
+                break
+            matches.append(label)
+        return matches
+
+    complete_show = complete_modify = complete_delete = _complete_label
+
+    def do_show(self, arg):
+        """show LABEL [LABEL ...] : afficher des mots de passe (motifs glob acceptés, ex: 'prod-*')"""
+        labels = self._args(arg)
+        if not labels:
+            print_error("Usage: show LABEL [LABEL ...]")
+            return
+        print_passwords(labels, database.get_passwords(self.username, labels, self.master_password))
+
+    def do_add(self, arg):
+        """add LABEL : ajouter un mot de passe (saisi sans écho, jamais dans l'historique)"""
+        args = self._args(arg)
+        if not args or len(args) != 1:
+            print_error("Usage: add LABEL")
+            return
+        label = args[0]
+        if self._has_label(label):
+            print_error(f"Erreur: Le label '{label}' existe déjà (utilisez modify)!")
+            return
+
+        password = confirm_password_input('Entrez le mot de passe')
+        if not (check_and_warn_breached_password(password) and check_and_warn_password_reuse(self.username, password, self.master_password)):
+            print_info("Opération annulée.")
+        elif database.add_password(self.username, label, password, self.master_password):
+            insort(self.labels, label)
+            print_success(f"Mot de passe '{label}' sauvegardé avec succès!")
+        else:
+            print_error("Erreur: Impossible de sauvegarder le mot de passe!")
+
+    def do_modify(self, arg):
+        """modify LABEL : modifier un mot de passe existant"""
+        args = self._args(arg)
+        if not args or len(args) != 1:
+            print_error("Usage: modify LABEL")
+            return
+        label = args[0]
+        if not self._has_label(label):
+            print_error("Erreur: Aucun mot de passe trouvé pour ce label!")
+            return
+
+        new_password = confirm_password_input('Entrez le nouveau mot de passe')
+        if not (check_and_warn_breached_password(new_password)
+                and check_and_warn_password_reuse(self.username, new_password, self.master_password, exclude_label=label)):
+            print_info("Opération annulée.")
+        elif database.update_password(self.username, label, new_password, self.master_password):
+            print_success(f"Mot de passe du label '{label}' modifié avec succès!")
+        else:
+            print_error("Erreur: Impossible de modifier le mot de passe!")
+
+    def do_delete(self, arg):
+        """delete LABEL : supprimer un mot de passe"""
+        args = self._args(arg)
+        if not args or len(args) != 1:
+            print_error("Usage: delete LABEL")
+            return
+        label = args[0]
+
+        confirmation = input(f"{Colors.YELLOW}Supprimer '{label}'? (y/n): {Colors.END}").lower().strip()
+        if confirmation != 'y' and confirmation != 'yes':
+            print_info("Opération annulée.")
+        elif database.delete_password(self.username, label):
+            self._forget_label(label)
+            print_success(f"LE mot de passe et le label '{label}' ont été supprimés avec succès!")
+        else:
+            print_error("Erreur: Aucun mot de passe trouvé pour ce label!")
+
+    def do_search(self, arg):
+        """search TEXTE : rechercher un label (sous-chaîne, préfixe, approché)"""
+        if not arg.strip():
+            print_error("Usage: search TEXTE")
+            return
+        print_search_results(arg.strip(), database.search_labels(arg.strip(), self.username))
+
+    def do_labels(self, arg):
+        """labels : lister les labels"""
+        print_labels(self.username, self.labels)
+
+    def do_lock(self, arg):
+        """lock : verrouiller la session (le master password sera redemandé)"""
+        self.lock()
+        print_success("Session verrouillée.")
+
+    def do_quit(self, arg):
+        """quit : quitter le shell"""
+        return True
+
+    do_exit = do_quit
+
+    def do_EOF(self, arg):
+        print()
+        return True
+
+    # Recherche dichotomique dans l'index trié des labels
+    def _has_label(self, label):
+        position = bisect_left(self.labels, label)
+        return position < len(self.labels) and self.labels[position] == label
+
+    def _forget_label(self, label):
+        if self._has_label(label):
+            del self.labels[bisect_left(self.labels, label)]
+
+# Ouvrir le shell après une seule vérification du master password
+def run_shell(username, master_password, idle_timeout_minutes=DEFAULT_IDLE_TIMEOUT_MINUTES):
+    VaultShell(username, master_password, idle_timeout_minutes).cmdloop()
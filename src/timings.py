@@ -0,0 +1,133 @@
+import sys
+import json
+import time
+import inspect
+from functools import wraps
+
+# Statistiques par phase : nom -> [appels, secondes cumulées, requêtes SQL]
+_stats = {}
+# Phases en cours (la dernière reçoit les requêtes SQL exécutées)
+_stack = []
+_start_time = None
+
+# Fonctions non instrumentées (gestionnaires de contexte, configuration)
+_SKIPPED = {'db_cursor', 'set_workers', 'configure_db', 'close_db'}
+
+OUTSIDE_PHASE = '(hors phase)'
+
+def _record(name, elapsed, calls=1):
+    stat = _stats.setdefault(name, [0, 0.0, 0])
+    stat[0] += calls
+    stat[1] += elapsed
+
+def _wrap_function(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _stack.append(name)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _stack.pop()
+            _record(name, time.perf_counter() - start)
+    return wrapper
+
+# Les générateurs sont chronométrés pendant leur exécution seulement, pas pendant celle du consommateur
+def _wrap_generator(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _record(name, 0.0)
+        iterator = func(*args, **kwargs)
+        try:
+            while True:
+                _stack.append(name)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _stack.pop()
+                    _record(name, time.perf_counter() - start, calls=0)
+                yield item
+        finally:
+            # Consommateur arrêté avant la fin : fermer le générateur interne (son with db_cursor
+            # se termine tout de suite, et non au ramasse-miettes), temps compté dans la phase
+            _stack.append(name)
+            start = time.perf_counter()
+            try:
+                iterator.close()
+            finally:
+                _stack.pop()
+                _record(name, time.perf_counter() - start, calls=0)
+    return wrapper
+
+def _count_statement(statement):
+    phase = _stack[-1] if _stack else OUTSIDE_PHASE
+    _stats.setdefault(phase, [0, 0.0, 0])[2] += 1
+
+# Instrumenter toutes les fonctions de crypto.py et database.py
+def enable_timings():
+    """Remplace les fonctions des modules par des versions chronométrées.
+    Rien n'est modifié tant que cette fonction n'est pas appelée : aucun surcoût sans --timings"""
+    global _start_time
+    import crypto
+    import database
+
+    modules = [crypto, database]
+    wrappers = {}
+    for module in modules:
+        for attr, func in list(vars(module).items()):
+            if not inspect.isfunction(func) or func.__module__ != module.__name__ or attr in _SKIPPED:
+                continue
+            name = f'{module.__name__}.{attr}'
+            if inspect.isgeneratorfunction(func):
+                wrappers[func] = _wrap_generator(name, func)
+            else:
+                wrappers[func] = _wrap_function(name, func)
+
+    # Remplacer aussi les noms importés avec "from crypto import ..."
+    for module in modules:
+        for attr, value in list(vars(module).items()):
+            if inspect.isfunction(value) and value in wrappers:
+                setattr(module, attr, wrappers[value])
+
+    # Compter les requêtes SQL de chaque nouvelle connexion
+    open_connection = database.get_db_connection
+    traced = set()
+
+    def get_db_connection(*args, **kwargs):
+        conn = open_connection(*args, **kwargs)
+        if id(conn) not in traced:
+            conn.set_trace_callback(_count_statement)
+            traced.add(id(conn))
+        return conn
+
+    database.get_db_connection = get_db_connection
+    _start_time = time.perf_counter()
+
+# Rapport des temps par phase sur la sortie d'erreur
+def print_timings_report(output_format='table'):
+    total = time.perf_counter() - _start_time if _start_time else 0.0
+    phases = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+
+    if output_format == 'json':
+        report = {
+            'total_ms': round(total * 1000, 3),
+            'sql_statements': sum(stat[2] for _, stat in phases),
+            'phases': [
+                {'phase': name, 'calls': calls, 'total_ms': round(seconds * 1000, 3), 'sql_statements': statements}
+                for name, (calls, seconds, statements) in phases
+            ],
+        }
+        print(json.dumps(report), file=sys.stderr)
+        return
+
+    width = max([len('PHASE')] + [len(name) for name, _ in phases])
+    print(f"\n{'PHASE'.ljust(width)} | {'APPELS':>7} | {'TEMPS (ms)':>11} | {'SQL':>6}", file=sys.stderr)
+    print('-' * (width + 35), file=sys.stderr)
+    for name, (calls, seconds, statements) in phases:
+        print(f"{name.ljust(width)} | {calls:>7} | {seconds * 1000:>11.3f} | {statements:>6}", file=sys.stderr)
+    print('-' * (width + 35), file=sys.stderr)
+    print(f"{'TOTAL'.ljust(width)} | {'':>7} | {total * 1000:>11.3f} | {sum(stat[2] for _, stat in phases):>6}", file=sys.stderr)
+    print("Les temps sont cumulés : une phase inclut celles qu'elle appelle.", file=sys.stderr)
@@ -0,0 +1,42 @@
+"""Aller-retour des archives chiffrées (backup.py).
+
+    python -m unittest discover tests
+"""
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+from backup import ArchiveError, iter_archive, write_archive  # noqa: E402
+
+class ArchiveRoundTripTest(unittest.TestCase):
+    def roundtrip(self, entries, passphrase='pw', **kwargs):
+        file = io.BytesIO()
+        self.assertEqual(write_archive(entries, file, passphrase, **kwargs), len(entries))
+        file.seek(0)
+        return [(label, password) for label, password, _ in iter_archive(file, passphrase)]
+
+    def test_unicode_line_separators(self):
+        # U+0085, U+2028 et U+2029 sont écrits tels quels (ensure_ascii=False) : ce ne sont pas des fins de ligne
+        entries = [('a', 'pass word'), ('b', 'x\x85y'), ('c ', 'z'), ('d', 'ligne\nsuivante\r')]
+        self.assertEqual(self.roundtrip(entries), entries)
+
+    def test_several_chunks(self):
+        entries = [(f'label-{i}', f'secret-{i}') for i in range(25)]
+        self.assertEqual(self.roundtrip(entries, chunk_entries=10), entries)
+
+    def test_empty_archive(self):
+        self.assertEqual(self.roundtrip([]), [])
+
+    def test_wrong_passphrase(self):
+        file = io.BytesIO()
+        write_archive([('a', 'b')], file, 'pw')
+        file.seek(0)
+        with self.assertRaises(ArchiveError):
+            list(iter_archive(file, 'autre'))
+
+if __name__ == '__main__':
+    unittest.main()